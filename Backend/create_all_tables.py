@@ -31,6 +31,9 @@ def create_all_tables():
             
             # Drop all tables if they exist (in reverse dependency order)
             drop_tables = [
+                "DROP TABLE IF EXISTS daily_recommendations CASCADE;",
+                "DROP TABLE IF EXISTS user_locations CASCADE;",
+                "DROP TABLE IF EXISTS item_compatibility CASCADE;",
                 "DROP TABLE IF EXISTS user_preferences CASCADE;",
                 "DROP TABLE IF EXISTS image_processing_cache CASCADE;",
                 "DROP TABLE IF EXISTS weather_cache CASCADE;",
@@ -114,7 +117,15 @@ def create_all_tables():
                     -- Additional columns for compatibility with current service
                     confidence DECIMAL(5,3),
                     analysis_method VARCHAR(100),
-                    last_worn TIMESTAMP
+                    last_worn TIMESTAMP,
+                    
+                    -- Derived scoring attributes computed at write time (see services/item_features.py)
+                    temp_min INTEGER,
+                    temp_max INTEGER,
+                    formality_score INTEGER,
+                    comfort_score INTEGER,
+                    weather_compatibility JSONB,
+                    features_version INTEGER
                 );
                 
                 CREATE INDEX idx_wardrobe_items_user_id ON wardrobe_items(user_id);
@@ -218,6 +229,7 @@ def create_all_tables():
             cursor.execute("""
                 CREATE TABLE weather_cache (
                     id SERIAL PRIMARY KEY,
+                    cell_key VARCHAR(64),
                     latitude DECIMAL(10,8) NOT NULL,
                     longitude DECIMAL(11,8) NOT NULL,
                     weather_data JSONB NOT NULL,
@@ -225,6 +237,7 @@ def create_all_tables():
                     expires_at TIMESTAMP NOT NULL
                 );
                 
+                CREATE UNIQUE INDEX idx_weather_cache_cell_key ON weather_cache(cell_key);
                 CREATE INDEX idx_weather_cache_location ON weather_cache(latitude, longitude);
                 CREATE INDEX idx_weather_cache_expires ON weather_cache(expires_at);
             """)
@@ -261,6 +274,47 @@ def create_all_tables():
                 CREATE INDEX idx_user_preferences_user_id ON user_preferences(user_id);
             """)
             
+            # 12. Item Compatibility table (depends on users)
+            print("Creating item_compatibility table...")
+            cursor.execute("""
+                CREATE TABLE item_compatibility (
+                    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+                    item_features JSONB NOT NULL,
+                    scores BYTEA NOT NULL,
+                    rules_version INTEGER NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+            
+            # 13. User Locations table (depends on users)
+            print("Creating user_locations table...")
+            cursor.execute("""
+                CREATE TABLE user_locations (
+                    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+                    latitude DOUBLE PRECISION NOT NULL,
+                    longitude DOUBLE PRECISION NOT NULL,
+                    geo_cell VARCHAR(32) NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+            
+            # 14. Daily Recommendations table (depends on users)
+            print("Creating daily_recommendations table...")
+            cursor.execute("""
+                CREATE TABLE daily_recommendations (
+                    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                    recommendation_date DATE NOT NULL,
+                    occasion VARCHAR(50) NOT NULL,
+                    geo_cell VARCHAR(32),
+                    weather JSONB NOT NULL,
+                    recommendation JSONB NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (user_id, recommendation_date, occasion)
+                );
+                
+                CREATE INDEX idx_daily_recommendations_date ON daily_recommendations(recommendation_date);
+            """)
+            
             # Create update triggers for updated_at columns
             print("Creating update triggers...")
             
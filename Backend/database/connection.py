@@ -95,5 +95,29 @@ class DatabaseConnection:
             if conn:
                 conn.close()
 
+    def iter_query(self, query, params=None, chunk_size=500, cursor_name='styra_batch'):
+        """Stream a large SELECT in chunks through a server-side (named) cursor"""
+        conn = None
+        try:
+            conn = self._create_connection()
+            with conn.cursor(name=cursor_name) as cursor:
+                cursor.itersize = chunk_size
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+            conn.commit()
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Streaming query failed: {e}")
+            logger.error(f"Query: {query}")
+            raise
+        finally:
+            if conn:
+                conn.close()
+
 # Global instance
 db = DatabaseConnection()
\ No newline at end of file
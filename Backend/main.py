@@ -1,7 +1,7 @@
 from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from contextlib import asynccontextmanager
 import psycopg2
 import os
@@ -16,14 +16,21 @@ from services.outfit_history_service import OutfitHistoryService
 from services.ai_enhanced_outfit_service import ai_enhanced_outfit_service as enhanced_outfit_service
 from services.favorite_outfit_service import favorite_outfit_service
 from services.weather_service import weather_service
+from services.weather_prefetcher import weather_prefetcher
+from services.wardrobe_cache import wardrobe_cache
+from services.compatibility_matrix import compatibility_service
+from services.recommendation_cache import recommendation_cache
+from services.wear_history import wear_history
+from services.daily_recommendations import daily_recommendation_service
+from utils.geo import geo_cell
 from database.connection import DatabaseConnection
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 import json
 import glob
-import uuid
-import random
+import asyncio
+import threading
 from pathlib import Path
 from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Depends, Request  # Add Request here
 import re
@@ -43,7 +50,8 @@ logger = logging.getLogger(__name__)
 db = DatabaseConnection()
 
 # JWT and Auth imports
-from utils.jwt_utils import verify_password, get_password_hash, create_access_token
+from utils.jwt_utils import create_access_token
+from utils.password_hasher import password_hasher, HasherBusy
 from utils.auth_dependencies import get_current_user, get_current_user_optional
 
 # Initialize services
@@ -92,6 +100,28 @@ async def lifespan(app: FastAPI):
             logger.warning("DATABASE_URL not found in environment variables")
             outfit_history_service = None
         
+        # Re-featurize wardrobe rows written under older rule tables without blocking startup
+        threading.Thread(
+            target=wardrobe_service.refeaturize_stale_items,
+            name="wardrobe-refeaturize",
+            daemon=True
+        ).start()
+        
+        # Warm the in-process weather caches with hot cells from the shared weather_cache table
+        threading.Thread(
+            target=weather_service.preload,
+            args=(int(os.getenv('WEATHER_CACHE_PRELOAD', 2000)),),
+            name="weather-cache-preload",
+            daemon=True
+        ).start()
+        
+        # Warm the hashing pool and report whether BCRYPT_ROUNDS suits this hardware
+        await password_hasher.calibrate()
+        
+        # Keep weather for active users' cells refreshed ahead of expiry
+        if os.getenv('WEATHER_PREFETCH', '1') != '0':
+            weather_prefetcher.start()
+        
         logger.info("Styra AI Backend started successfully!")
         
     except Exception as e:
@@ -101,6 +131,9 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Styra AI Backend shutting down...")
+    await weather_prefetcher.stop()
+    await weather_service.aclose()
+    password_hasher.shutdown()
 
 app = FastAPI(
     title="Styra AI Wardrobe Backend",
@@ -215,6 +248,15 @@ async def health_check():
         }
         health_status["status"] = "degraded"
     
+    # Report wardrobe cache metrics
+    health_status["services"]["wardrobe_cache"] = wardrobe_cache.stats()
+    health_status["services"]["compatibility_matrices"] = compatibility_service.stats()
+    health_status["services"]["recommendation_cache"] = recommendation_cache.stats()
+    health_status["services"]["wear_history"] = wear_history.stats()
+    health_status["services"]["weather"] = weather_service.stats()
+    health_status["services"]["weather_prefetch"] = weather_prefetcher.stats()
+    health_status["services"]["password_hashing"] = password_hasher.stats()
+    
     # Check authentication
     try:
         health_status["services"]["authentication"] = {
@@ -266,8 +308,11 @@ async def signup(user_data: dict):
         except Exception as e:
             logger.error(f"Database check error: {e}")
         
-        # Hash password
-        hashed_password = get_password_hash(password)
+        # Hash password (process pool, off the event loop)
+        try:
+            hashed_password = await password_hasher.hash(password)
+        except HasherBusy:
+            raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
         
         # Create user in database
         try:
@@ -362,10 +407,24 @@ async def login(credentials: dict):
             if not user.get('is_active', True):
                 raise HTTPException(status_code=401, detail="Account is deactivated")
             
-            # Verify password
-            if not verify_password(password, user['hashed_password']):
+            # Verify password (process pool, off the event loop)
+            try:
+                valid, new_hash = await password_hasher.verify(password, user['hashed_password'])
+            except HasherBusy:
+                raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+            if not valid:
                 raise HTTPException(status_code=401, detail="Invalid email or password")
             
+            # Stored hash used a different bcrypt cost: upgrade it transparently
+            if new_hash:
+                try:
+                    db.execute_query(
+                        "UPDATE users SET hashed_password = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s;",
+                        (new_hash, user['id'])
+                    )
+                except Exception as e:
+                    logger.warning(f"Failed to rehash password for user {user['id']}: {e}")
+            
             # Create JWT token
             access_token_expires = timedelta(minutes=60 * 24 * 7)  # 7 days
             access_token = create_access_token(
@@ -828,6 +887,8 @@ async def wear_favorite_outfit(favorite_id: int, current_user: dict = Depends(ge
         
         result = favorite_outfit_service.wear_favorite_outfit(favorite_id)
         if result['success']:
+            wardrobe_cache.invalidate(user_id)
+            recommendation_cache.invalidate(user_id)
             return {
                 "status": "success",
                 "message": result['message']
@@ -947,6 +1008,29 @@ async def get_ai_outfit_recommendation(request_data: dict, current_user: dict =
         location = request_data.get('location', {})
         demo_weather = request_data.get('demo_weather')
         occasion = request_data.get('occasion', 'casual')
+        has_location = bool(location.get('latitude') and location.get('longitude'))
+        
+        # Determine if a variation / alternative-generation is requested
+        variation = bool(request_data.get('variation') or request_data.get('nonce'))
+        nonce = request_data.get('nonce')
+        
+        if has_location:
+            daily_recommendation_service.record_location(user_id, location['latitude'], location['longitude'])
+            weather_prefetcher.record(location['latitude'], location['longitude'])
+        
+        # Morning peak: serve the nightly precomputed outfit (in-process copy, refreshed from the DB per TTL)
+        if not demo_weather and not variation:
+            cell = geo_cell(location['latitude'], location['longitude']) if has_location else None
+            daily = daily_recommendation_service.get(user_id, occasion, cell)
+            if daily:
+                return {
+                    "status": "success",
+                    "outfit": daily['recommendation'],
+                    "weather": daily['weather'],
+                    "message": "AI recommendation generated from your wardrobe",
+                    "user_id": user_id,
+                    "precomputed": True
+                }
         
         # Check if demo weather is provided
         if demo_weather:
@@ -962,9 +1046,9 @@ async def get_ai_outfit_recommendation(request_data: dict, current_user: dict =
             logger.info(f"Using demo weather data: {weather_data}")
             
         # Get real weather data if location is provided
-        elif location.get('latitude') and location.get('longitude'):
+        elif has_location:
             try:
-                weather_data = weather_service.get_current_weather(
+                weather_data = await weather_service.get_current_weather_async(
                     location['latitude'], 
                     location['longitude']
                 )
@@ -991,15 +1075,13 @@ async def get_ai_outfit_recommendation(request_data: dict, current_user: dict =
                 'location': 'Default Location'
             }
         
-        # Determine if a variation / alternative-generation is requested
-        variation = bool(request_data.get('variation') or request_data.get('nonce'))
-
         # Generate AI recommendation using user's actual wardrobe
         outfit_recommendation = enhanced_outfit_service.generate_outfit_recommendation(
             user_id=user_id,
             weather_data=weather_data,
             occasion=occasion,
-            variation=variation
+            variation=variation,
+            seed=str(nonce) if nonce is not None else None
         )
         
         return {
@@ -1123,6 +1205,77 @@ async def analyze_user_wardrobe(user_id: int, current_user: dict = Depends(get_c
 
 # Additional protected endpoints following the same pattern...
 
+def _multi_occasion_weather(demo_weather: dict = None) -> dict:
+    """Weather context for multi-occasion requests (demo weather or defaults)"""
+    if demo_weather:
+        return {
+            'temperature': demo_weather.get('temperature', 25),
+            'condition': demo_weather.get('condition', 'sunny'),
+            'humidity': demo_weather.get('humidity', 60),
+            'windSpeed': demo_weather.get('windSpeed', 10),
+            'precipitation': demo_weather.get('precipitation', 0),
+            'location': demo_weather.get('location', 'Demo Location')
+        }
+    return {
+        'temperature': 22,
+        'condition': 'partly cloudy',
+        'humidity': 55,
+        'windSpeed': 12,
+        'precipitation': 0
+    }
+
+
+def _sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.post("/api/outfit/multiple-recommendations/stream")
+async def stream_multiple_outfit_recommendations(request_data: dict, current_user: dict = Depends(get_current_user)):
+    """Stream one server-sent event per occasion as soon as its outfit is ready (protected)"""
+    user_id = current_user["user_id"]
+    occasions = request_data.get('occasions', ['casual', 'work', 'formal', 'workout', 'datenight'])
+    weather_data = _multi_occasion_weather(request_data.get('demo_weather'))
+    
+    async def event_stream():
+        try:
+            loop = asyncio.get_running_loop()
+            wardrobe, score_matrix = await loop.run_in_executor(
+                enhanced_outfit_service.executor,
+                enhanced_outfit_service.prepare_occasion_scores, user_id, weather_data, occasions
+            )
+            if score_matrix is None:
+                yield _sse_event('error', {
+                    'error': 'No wardrobe items found',
+                    'message': 'Please add some clothes to your wardrobe first!'
+                })
+                return
+            
+            yield _sse_event('start', {'occasions': occasions, 'weather': weather_data, 'user_id': user_id})
+            
+            submitted = enhanced_outfit_service.submit_occasion_recommendations(
+                user_id, wardrobe, score_matrix, weather_data, occasions
+            )
+            
+            async def labelled(occasion, future):
+                return occasion, await asyncio.wrap_future(future)
+            
+            for next_done in asyncio.as_completed([labelled(occasion, future) for occasion, future in submitted]):
+                occasion, outfit = await next_done
+                yield _sse_event('outfit', {'occasion': occasion, 'outfit': outfit})
+            
+            yield _sse_event('done', {'count': len(occasions)})
+            
+        except Exception as e:
+            logger.error(f"Streaming recommendations error: {e}")
+            yield _sse_event('error', {'error': 'Failed to generate recommendations', 'message': str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/api/outfit/multiple-recommendations")
 async def get_multiple_outfit_recommendations(request_data: dict, current_user: dict = Depends(get_current_user)):
     """Generate multiple AI outfit recommendations for different occasions (protected)"""
@@ -1130,31 +1283,13 @@ async def get_multiple_outfit_recommendations(request_data: dict, current_user:
         user_id = current_user["user_id"]
         location = request_data.get('location', {})
         occasions = request_data.get('occasions', ['casual', 'work', 'formal', 'workout', 'datenight'])
-        demo_weather = request_data.get('demo_weather')
-        
-        # Weather data processing (same as above)
-        if demo_weather:
-            weather_data = {
-                'temperature': demo_weather.get('temperature', 25),
-                'condition': demo_weather.get('condition', 'sunny'),
-                'humidity': demo_weather.get('humidity', 60),
-                'windSpeed': demo_weather.get('windSpeed', 10),
-                'precipitation': demo_weather.get('precipitation', 0),
-                'location': demo_weather.get('location', 'Demo Location')
-            }
-        else:
-            weather_data = {
-                'temperature': 22,
-                'condition': 'partly cloudy',
-                'humidity': 55,
-                'windSpeed': 12,
-                'precipitation': 0
-            }
+        weather_data = _multi_occasion_weather(request_data.get('demo_weather'))
         
         # Use the enhanced multi-occasion service
         result = enhanced_outfit_service.generate_multi_occasion_recommendations(
             user_id=user_id,
-            weather_data=weather_data
+            weather_data=weather_data,
+            occasions=occasions
         )
         
         if result.get('error'):
@@ -1167,7 +1302,7 @@ async def get_multiple_outfit_recommendations(request_data: dict, current_user:
         return {
             "status": "success",
             "recommendations": result['recommendations'],
-            "wardrobe_analysis": result['wardrobe_analysis'],
+            "wardrobe_analysis": result.get('wardrobe_analysis', {}),
             "weather": weather_data,
             "message": f"Generated outfit recommendations for all occasions",
             "user_id": user_id
@@ -1178,6 +1313,78 @@ async def get_multiple_outfit_recommendations(request_data: dict, current_user:
         raise HTTPException(status_code=500, detail="Failed to generate multiple recommendations")
 
 
+# Longest trip /api/outfit/plan accepts (forecasts cover the first WEATHER_FORECAST_DAYS)
+MAX_PLAN_DAYS = int(os.getenv('MAX_PLAN_DAYS', 14))
+
+
+@app.post("/api/outfit/plan")
+async def plan_outfits(request_data: dict, current_user: dict = Depends(get_current_user)):
+    """Plan one outfit per day for a date range from the cached forecast, without repeating items (protected)"""
+    try:
+        user_id = current_user["user_id"]
+        location = request_data.get('location', {})
+        occasion = request_data.get('occasion', 'casual')
+        has_location = bool(location.get('latitude') and location.get('longitude'))
+
+        try:
+            start_date = datetime.strptime(request_data['start_date'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(request_data.get('end_date', request_data['start_date']), '%Y-%m-%d').date()
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="start_date (and optional end_date) must be YYYY-MM-DD")
+
+        try:
+            hour = int(request_data.get('hour', 12))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="hour must be an integer between 0 and 23")
+
+        day_count = (end_date - start_date).days + 1
+        if day_count < 1:
+            raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+        if day_count > MAX_PLAN_DAYS:
+            raise HTTPException(status_code=400, detail=f"Plans are limited to {MAX_PLAN_DAYS} days")
+        if not 0 <= hour <= 23:
+            raise HTTPException(status_code=400, detail="hour must be an integer between 0 and 23")
+
+        days = [start_date + timedelta(days=offset) for offset in range(day_count)]
+
+        # One forecast lookup for the whole trip; demo weather applies to every day
+        if request_data.get('demo_weather') or not has_location:
+            weathers = [_multi_occasion_weather(request_data.get('demo_weather'))] * day_count
+        else:
+            weathers = await weather_service.get_weather_for_days_async(
+                location['latitude'], location['longitude'], days, hour
+            )
+
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            enhanced_outfit_service.executor,
+            enhanced_outfit_service.plan_outfits,
+            user_id, [(day.isoformat(), weather) for day, weather in zip(days, weathers)], occasion
+        )
+
+        if result.get('error'):
+            return {
+                "status": "error",
+                "message": result['message'],
+                "plan": []
+            }
+
+        return {
+            "status": "success",
+            "plan": result['plan'],
+            "occasion": occasion,
+            "repeated_items": result['repeated_items'],
+            "message": f"Planned outfits for {day_count} day(s)",
+            "user_id": user_id
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Outfit plan error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to plan outfits")
+
+
 @app.post("/api/outfit/regenerate-item")
 async def regenerate_outfit_item(request_data: dict, current_user: dict = Depends(get_current_user)):
     """Regenerate/swap one item in the provided outfit (protected)"""
@@ -1196,16 +1403,15 @@ async def regenerate_outfit_item(request_data: dict, current_user: dict = Depend
             'condition': 'partly cloudy'
         }
 
-        # Get wardrobe items and find candidates in the requested category
-        wardrobe_items = enhanced_outfit_service.get_user_wardrobe_items(user_id)
-        candidates = [w for w in wardrobe_items if w.get('category') and w.get('category').lower() == item_category]
-
-        # Exclude the current item if provided
-        filtered = [c for c in candidates if not current_item_id or c.get('id') != current_item_id]
-
-        alternatives_available = len(candidates)
+        # Swap from the cached featurized wardrobe's category index (no DB round trip)
+        result = enhanced_outfit_service.regenerate_outfit_item(
+            user_id, current_outfit, item_category, current_item_id, weather_ctx, occasion
+        )
+        alternatives_available = result['alternatives_available']
+        replaced_item = result['replaced_item']
+        new_outfit = result['outfit']
 
-        if not filtered:
+        if replaced_item is None:
             # No alternative other than current available
             logger.warning(f'No alternative items found in category {item_category} excluding current item')
             return {
@@ -1215,64 +1421,7 @@ async def regenerate_outfit_item(request_data: dict, current_user: dict = Depend
                 'replaced_item': None
             }
 
-        # Score candidates using the service scoring function
-        scored = []
-        for cand in filtered:
-            try:
-                score = enhanced_outfit_service.calculate_item_compatibility_score(cand, weather_ctx, occasion)
-            except Exception:
-                score = 0
-            scored.append((cand, score))
-
-        # Sort by score descending
-        scored.sort(key=lambda x: x[1], reverse=True)
-
-        # Choose replacement from top-N to add variation on repeated regenerates
-        top_n = min(3, len(scored))
-        top_candidates = [c for c, s in scored[:top_n]]
-        replaced_item = random.choice(top_candidates)
-        logger.info(f"Regenerate candidates (top {top_n}): {[c.get('id') for c in top_candidates]}; chosen: {replaced_item.get('id')}")
-
-        # Build new outfit by replacing the first matching category item in current_outfit
-        new_items = []
-        replaced = False
-        current_items = current_outfit.get('items', []) if isinstance(current_outfit.get('items', []), list) else []
-        for it in current_items:
-            if not replaced and it.get('category') and it.get('category').lower() == item_category:
-                new_items.append(replaced_item)
-                replaced = True
-            else:
-                new_items.append(it)
-
-        if not replaced:
-            # If current outfit did not have that category, append the replacement
-            new_items.append(replaced_item)
-
-        # Recompute a simple confidence as average of item compatibility scores
-        total_score = 0
-        count = 0
-        for it in new_items:
-            try:
-                s = enhanced_outfit_service.calculate_item_compatibility_score(it, weather_ctx, occasion)
-            except Exception:
-                s = 50
-            total_score += s
-            count += 1
-
-        confidence = int(total_score / count) if count > 0 else 50
-
-        reason = enhanced_outfit_service._generate_outfit_reason(new_items, weather_ctx, occasion)
-
-        new_outfit = {
-            'id': f'user_outfit_{uuid.uuid4().hex[:8]}',
-            'items': new_items,
-            'confidence': confidence,
-            'reason': reason,
-            'weather_context': weather_ctx,
-            'occasion': occasion,
-            'ai_enhanced': enhanced_outfit_service.ai_loaded,
-            'generated_at': datetime.now().isoformat()
-        }
+        logger.info(f"Regenerated {item_category}: chosen {replaced_item.get('id')}, confidence {new_outfit['confidence']}")
 
         response = {
             'status': 'success',
@@ -1336,6 +1485,14 @@ async def record_worn_outfit(request_data: dict, current_user: dict = Depends(ge
                 
                 if result:
                     logger.info(f"Successfully recorded outfit with ID: {result.get('outfit_id')}")
+                    if not result.get('duplicate'):
+                        # Recency feeds scoring: bump the wardrobe version so cached recommendations miss
+                        version = wardrobe_cache.invalidate(user_id)
+                        recommendation_cache.invalidate(user_id)
+                        wear_history.record_wear(
+                            user_id, [item.get('id') for item in items if isinstance(item, dict) and item.get('id') is not None],
+                            worn_date, version
+                        )
                     if result.get('duplicate'):
                         return {
                             "status": "success",
@@ -1397,7 +1554,8 @@ async def get_weather_data(lat: float, lon: float):
     """Get weather data for coordinates (public endpoint)"""
     try:
         # Use the real weather service
-        weather_data = weather_service.get_current_weather(lat, lon)
+        weather_prefetcher.record(lat, lon)
+        weather_data = await weather_service.get_current_weather_async(lat, lon)
         
         return {
             "status": "success",
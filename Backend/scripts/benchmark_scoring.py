@@ -0,0 +1,82 @@
+"""
+Benchmark the vectorized outfit scoring engine against the scalar per-item path.
+
+Usage: python scripts/benchmark_scoring.py [sizes...]   (default: 1000 5000 10000)
+Checks that both paths produce identical scores for every occasion.
+"""
+import os
+import sys
+import random
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.outfit_rules import create_outfit_rules, extract_weather_conditions
+from services.outfit_scoring_engine import OutfitScoringEngine
+
+OCCASIONS = ['casual', 'work', 'formal', 'workout', 'datenight', 'party']
+NAMES = ['Blue T-Shirt', 'Gray Sweater', 'Black Jeans', 'Sequin Party Dress', 'Dress Shoes',
+         'White Sneakers', 'Office Trousers', 'Gold Heels', 'Leather Jacket', 'Tank Top']
+COLORS = ['blue', 'black', 'white', 'gold', 'silver', 'red', 'gray', 'navy']
+CONDITIONS = ['sunny', 'cloudy', 'cold', 'cool', 'windy', 'rainy', 'hot', 'warm', 'mild', 'casual']
+
+
+def make_wardrobe(size, seed=42):
+    """Synthetic items in the format returned by get_user_wardrobe_items"""
+    rnd = random.Random(seed)
+    now = datetime.now()
+    items = []
+    for i in range(size):
+        low = rnd.randint(-5, 25)
+        last_worn = None
+        if rnd.random() < 0.3:
+            last_worn = (now - timedelta(hours=rnd.randint(0, 120))).isoformat()
+        items.append({
+            'id': i + 1,
+            'name': rnd.choice(NAMES),
+            'category': rnd.choice(['tops', 'bottoms', 'shoes', 'outerwear', 'dress']),
+            'color': rnd.choice(COLORS),
+            'last_worn': last_worn,
+            'temp_range': [low, low + rnd.randint(5, 20)],
+            'formality_score': rnd.randint(1, 10),
+            'weather_compatibility': rnd.sample(CONDITIONS, 2)
+        })
+    return items
+
+
+def run(size, weather):
+    engine = OutfitScoringEngine(create_outfit_rules(), extract_weather_conditions)
+    items = make_wardrobe(size)
+    now = datetime.now()
+
+    start = time.perf_counter()
+    scalar = np.array([[engine.score_item(item, weather, occasion, now=now) for item in items]
+                       for occasion in OCCASIONS])
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    wardrobe = engine.featurize(items)
+    featurize_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    partials = engine.weather_partials(wardrobe, weather)
+    vectorized = engine.score_occasions(wardrobe, partials, OCCASIONS, now=now)
+    score_time = time.perf_counter() - start
+
+    identical = np.array_equal(scalar, vectorized)
+    print(f"{size:>6} items | scalar {scalar_time * 1000:8.1f} ms | featurize {featurize_time * 1000:7.1f} ms | "
+          f"vectorized {score_time * 1000:6.2f} ms | speedup {scalar_time / score_time:7.1f}x "
+          f"(incl. featurize {scalar_time / (score_time + featurize_time):5.1f}x) | identical={identical}")
+    return identical
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 5000, 10000]
+    ok = True
+    for weather in ({'temperature': 12, 'condition': 'light rain'}, {'temperature': 27.5, 'condition': 'sunny'}):
+        print(f"Weather: {weather}")
+        for size in sizes:
+            ok = run(size, weather) and ok
+    sys.exit(0 if ok else 1)
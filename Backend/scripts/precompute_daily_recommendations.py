@@ -0,0 +1,48 @@
+"""
+Nightly precomputation of "today's outfit" for every user.
+
+Usage: python scripts/precompute_daily_recommendations.py [--date YYYY-MM-DD] [--occasions casual,work]
+                                                          [--chunk-size 500]
+Schedule shortly before the morning peak (e.g. cron `30 4 * * *`). Results land in
+daily_recommendations and are served by /api/outfit/ai-recommendation.
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+from datetime import date
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.ai_enhanced_outfit_service import ai_enhanced_outfit_service
+from services.daily_recommendations import daily_recommendation_service, DEFAULT_OCCASIONS
+from services.weather_service import weather_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--date', type=date.fromisoformat, default=date.today())
+    parser.add_argument('--occasions', default=','.join(DEFAULT_OCCASIONS))
+    parser.add_argument('--chunk-size', type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    occasions = [occasion.strip() for occasion in args.occasions.split(',') if occasion.strip()]
+
+    started = time.perf_counter()
+    stats = daily_recommendation_service.run_batch(
+        ai_enhanced_outfit_service,
+        # Midday forecast for the target date, from the cell's cached hourly forecast
+        lambda lat, lon: weather_service.get_weather_at(lat, lon, args.date, hour=12),
+        occasions=occasions,
+        recommendation_date=args.date,
+        chunk_size=args.chunk_size
+    )
+    elapsed = time.perf_counter() - started
+    print(f"{stats['users']} users | {stats['stored']} recommendations stored | "
+          f"{stats['weather_lookups']} weather lookups | {stats['failed']} failed | {elapsed:.1f}s")
+    return 1 if stats['failed'] and not stats['stored'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
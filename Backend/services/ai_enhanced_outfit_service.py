@@ -1,121 +1,72 @@
 # services/ai_enhanced_outfit_service.py
 import numpy as np
 from transformers import CLIPProcessor, CLIPModel
-from PIL import Image
-import torch
-import io
+import os
 import logging
-from typing import Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from database.connection import db
-import requests
-import json
+from services.wardrobe_cache import wardrobe_cache
+from services.outfit_scoring_engine import OutfitScoringEngine
+from services.outfit_search import OutfitSearchEngine
+from services.compatibility_matrix import compatibility_service
+from services.clip_cohesion import ClipCohesionScorer
+from services.recommendation_cache import recommendation_cache
+from services.variation_engine import variation_engine, outfit_signature
+from services.wear_history import wear_history
+from utils.lru_cache import LRUCache
+from services.item_features import (
+    FEATURE_RULES_VERSION, get_temp_range_for_item, get_formality_score,
+    get_comfort_score, get_weather_compatibility
+)
+from services.outfit_rules import (
+    create_weather_compatibility_matrix, create_color_harmony_rules,
+    create_outfit_rules, extract_weather_conditions
+)
 import uuid
 from datetime import datetime
 import random
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_OCCASIONS = ['casual', 'work', 'formal', 'workout', 'datenight', 'party']
+
 class AIEnhancedOutfitService:
+    # Alternates kept per category for regenerate-item swaps
+    ALTERNATES_PER_CATEGORY = 10
+    
     def __init__(self):
+        # Worker pool for per-occasion outfit assembly (NumPy and torch release the GIL)
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('OUTFIT_WORKERS', min(4, os.cpu_count() or 1))),
+            thread_name_prefix='outfit'
+        )
+        
         # Base functionality
         self.weather_compatibility_matrix = self._create_weather_compatibility_matrix()
         self.color_harmony_rules = self._create_color_harmony_rules()
         self.outfit_rules = self._create_outfit_rules()
+        self.scoring_engine = OutfitScoringEngine(self.outfit_rules, self._extract_weather_conditions)
+        self.outfit_search = OutfitSearchEngine(compatibility_service.scorer)
         
         # AI components
         self.clip_model = None
         self.clip_processor = None
+        self.cohesion_scorer = None
         self.ai_loaded = False
         self._load_ai_models()
     
     def _create_weather_compatibility_matrix(self):
         """Weather compatibility scoring matrix"""
-        return {
-            'temperature_ranges': {
-                'very_cold': (-20, 5),
-                'cold': (5, 15),
-                'cool': (15, 22),
-                'mild': (22, 28),
-                'warm': (28, 35),
-                'hot': (35, 50)
-            },
-            'category_weather_scores': {
-                'tops': {
-                    'very_cold': {'sweater': 9, 'hoodie': 8, 'long_sleeve': 7, 't_shirt': 2},
-                    'cold': {'sweater': 8, 'hoodie': 9, 'long_sleeve': 8, 't_shirt': 3},
-                    'cool': {'hoodie': 7, 'long_sleeve': 8, 'light_sweater': 8, 't_shirt': 6},
-                    'mild': {'t_shirt': 9, 'blouse': 8, 'light_sweater': 6, 'tank_top': 7},
-                    'warm': {'t_shirt': 8, 'tank_top': 9, 'blouse': 7, 'light_shirt': 8},
-                    'hot': {'tank_top': 10, 'light_shirt': 8, 't_shirt': 6, 'sleeveless': 9}
-                }
-            }
-        }
+        return create_weather_compatibility_matrix()
     
     def _create_color_harmony_rules(self):
         """Color harmony and compatibility rules"""
-        return {
-            'complementary_pairs': [
-                ('blue', 'orange'), ('red', 'green'), ('purple', 'yellow'),
-                ('navy', 'cream'), ('black', 'white'), ('gray', 'pink')
-            ],
-            'neutral_colors': ['black', 'white', 'gray', 'beige', 'cream', 'navy', 'brown'],
-            'warm_colors': ['red', 'orange', 'yellow', 'pink', 'coral', 'burgundy'],
-            'cool_colors': ['blue', 'green', 'purple', 'teal', 'navy', 'turquoise']
-        }
+        return create_color_harmony_rules()
     
     def _create_outfit_rules(self):
         """Enhanced outfit combination rules with occasion-specific guidelines"""
-        return {
-            'occasion_formality': {
-                'casual': (1, 4),
-                'work': (5, 7),
-                'business': (5, 7),
-                'formal': (8, 10),
-                'workout': (1, 3),
-                'date': (6, 9),
-                'datenight': (6, 9),
-                # Party outfits should be dressy but allow statement/shiny pieces
-                'party': (6, 9)
-            },
-            'occasion_specific_rules': {
-                'casual': {
-                    'preferred_categories': ['tops', 'bottoms', 'shoes'],
-                    'preferred_items': ['t-shirt', 'jeans', 'sneakers', 'hoodie', 'shorts'],
-                    'color_preferences': ['blue', 'white', 'gray', 'black'],
-                    'avoid_items': ['suit', 'blazer', 'formal dress', 'heels']
-                },
-                'work': {
-                    'preferred_categories': ['tops', 'bottoms', 'shoes', 'outerwear'],
-                    'preferred_items': ['button shirt', 'blouse', 'dress pants', 'blazer', 'dress shoes'],
-                    'color_preferences': ['navy', 'black', 'white', 'gray', 'brown'],
-                    'avoid_items': ['tank top', 'shorts', 'sneakers', 'flip-flops']
-                },
-                'datenight': {
-                    'preferred_categories': ['dresses', 'tops', 'bottoms', 'shoes', 'accessories'],
-                    'preferred_items': ['dress', 'frock', 'nice top', 'blouse', 'crop top', 'denim', 'jeans', 'cute pants', 'heels', 'flats', 'boots'],
-                    'color_preferences': ['red', 'black', 'blue', 'white', 'pink', 'burgundy', 'navy'],
-                    'avoid_items': ['workout', 'athletic', 'gym clothes', 'office trousers', 'formal pants', 'dress pants', 'blazer', 'business shirt']
-                },
-                'party': {
-                    'preferred_categories': ['dresses', 'tops', 'bottoms', 'shoes', 'accessories'],
-                    'preferred_items': ['sequined dress', 'sequin top', 'metallic top', 'leather jacket', 'statement dress', 'sparkly top', 'sequin skirt', 'glitter top', 'lamé dress', 'shiny blouse', 'bold accessories', 'heels', 'boots'],
-                    'color_preferences': ['gold', 'silver', 'black', 'red', 'burgundy', 'navy', 'metallic'],
-                    'avoid_items': ['plain activewear', 'workout clothes', 'very casual lounge wear']
-                },
-                'formal': {
-                    'preferred_categories': ['tops', 'bottoms', 'shoes', 'accessories'],
-                    'preferred_items': ['dress shirt', 'suit', 'dress', 'formal dress', 'dress shoes', 'heels'],
-                    'color_preferences': ['black', 'navy', 'white', 'gray'],
-                    'avoid_items': ['t-shirt', 'jeans', 'sneakers', 'shorts']
-                },
-                'workout': {
-                    'preferred_categories': ['tops', 'bottoms', 'shoes'],
-                    'preferred_items': ['athletic', 'gym', 'sports', 'workout', 'running', 'yoga'],
-                    'color_preferences': ['black', 'gray', 'blue', 'white'],
-                    'avoid_items': ['dress', 'suit', 'formal', 'heels']
-                }
-            }
-        }
+        return create_outfit_rules()
     
     def _load_ai_models(self):
         """Load CLIP model for advanced outfit analysis"""
@@ -123,6 +74,13 @@ class AIEnhancedOutfitService:
             logger.info("Loading CLIP model for outfit analysis...")
             self.clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
             self.clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
+            self.clip_model.eval()
+            self.cohesion_scorer = ClipCohesionScorer(
+                self.clip_model, self.clip_processor, compatibility_service.scorer,
+                list(self.outfit_rules['occasion_formality'])
+            )
+            # Stored pair scores gain a CLIP affinity term (matrices rebuild in the background)
+            compatibility_service.set_embedding_provider(self.cohesion_scorer.embed_items)
             self.ai_loaded = True
             logger.info("AI models loaded successfully for outfit generation!")
         except Exception as e:
@@ -130,11 +88,23 @@ class AIEnhancedOutfitService:
             self.ai_loaded = False
     
     def get_user_wardrobe_items(self, user_id: int = 1) -> List[Dict]:
-        """Get user's wardrobe items from database"""
+        """Get user's wardrobe items, served from the wardrobe cache when current.
+        
+        Callers get their own item dicts: recommendations annotate items in place,
+        which must not leak into the cached entry shared by later requests.
+        """
         try:
+            # Read the version before querying so a concurrent write can't be cached as current
+            version = wardrobe_cache.get_version(user_id)
+            cached_items = wardrobe_cache.get(user_id, version)
+            if cached_items is not None:
+                return [dict(item) for item in cached_items]
+            
             query = """
                 SELECT id, name, category, color, season, image_path, 
-                       confidence, times_worn, last_worn, created_at
+                       confidence, times_worn, last_worn, created_at,
+                       temp_min, temp_max, formality_score, comfort_score,
+                       weather_compatibility, features_version
                 FROM wardrobe_items 
                 WHERE user_id = %s
                 ORDER BY created_at DESC
@@ -143,6 +113,7 @@ class AIEnhancedOutfitService:
             items = db.execute_query(query, (user_id,))
             
             if not items:
+                wardrobe_cache.put(user_id, version, [])
                 return []
             
             # Convert to format expected by AI algorithm
@@ -159,231 +130,137 @@ class AIEnhancedOutfitService:
                     'times_worn': item['times_worn'] or 0,
                     'last_worn': item['last_worn'].isoformat() if item['last_worn'] else None,
                     'created_at': item['created_at'].isoformat() if item['created_at'] else None,
-                    
-                    # Add AI scoring attributes
-                    'temp_range': self._get_temp_range_for_item(item['category'], item['season']),
-                    'formality_score': self._get_formality_score(item['category'], item['name']),
-                    'comfort_score': self._get_comfort_score(item['category']),
-                    'weather_compatibility': self._get_weather_compatibility(item['category'])
                 }
+                
+                # AI scoring attributes are persisted at write time; only recompute stale rows
+                if item.get('features_version') == FEATURE_RULES_VERSION:
+                    formatted_item['temp_range'] = [item['temp_min'], item['temp_max']]
+                    formatted_item['formality_score'] = item['formality_score']
+                    formatted_item['comfort_score'] = item['comfort_score']
+                    formatted_item['weather_compatibility'] = list(item['weather_compatibility'] or [])
+                else:
+                    formatted_item['temp_range'] = self._get_temp_range_for_item(item['category'], item['season'])
+                    formatted_item['formality_score'] = self._get_formality_score(item['category'], item['name'])
+                    formatted_item['comfort_score'] = self._get_comfort_score(item['category'])
+                    formatted_item['weather_compatibility'] = self._get_weather_compatibility(item['category'])
                 formatted_items.append(formatted_item)
             
-            return formatted_items
+            wardrobe_cache.put(user_id, version, formatted_items)
+            return [dict(item) for item in formatted_items]
             
         except Exception as e:
             logger.error(f"Error getting wardrobe items: {e}")
             return []
     
+    def get_featurized_wardrobe(self, user_id: int):
+        """Columnar NumPy features for the user's wardrobe, cached per wardrobe version"""
+        version = wardrobe_cache.get_version(user_id)
+        features = wardrobe_cache.get_features(user_id, version)
+        if features is None:
+            features = self.scoring_engine.featurize(self.get_user_wardrobe_items(user_id))
+            # Pair scores become lookups into the user's precomputed compatibility matrix
+            compatibility_service.attach(user_id, features)
+            # Freshness reads wear timestamps from the in-memory recency index (no per-request query)
+            features.wear_times = wear_history.wear_matrix(user_id, version, features)
+            wardrobe_cache.put_features(user_id, version, features)
+        elif getattr(features, 'compatibility', None) is None:
+            # The matrix may have finished building since these features were cached
+            compatibility_service.attach(user_id, features)
+        return features
+    
     def _get_temp_range_for_item(self, category: str, season: str) -> List[int]:
         """Estimate temperature range for clothing item"""
-        base_ranges = {
-            'tank_top': [25, 40], 't_shirt': [18, 35], 'blouse': [16, 30],
-            'sweater': [5, 20], 'hoodie': [8, 25], 'jacket': [0, 18],
-            'shorts': [22, 40], 'pants': [5, 30], 'jeans': [8, 25],
-            'skirt': [20, 35], 'dress': [15, 32]
-        }
-        
-        season_adjustments = {
-            'winter': [-5, -10], 'summer': [5, 10],
-            'spring': [0, 5], 'fall': [-2, -5]
-        }
-        
-        category_lower = category.lower()
-        base_range = base_ranges.get(category_lower, [10, 30])
-        
-        if season in season_adjustments:
-            adj = season_adjustments[season]
-            base_range = [base_range[0] + adj[0], base_range[1] + adj[1]]
-        
-        return base_range
+        return get_temp_range_for_item(category, season)
     
     def _get_formality_score(self, category: str, name: str) -> int:
         """Enhanced formality score calculation 1-10"""
-        formal_keywords = {
-            'suit': 10, 'tuxedo': 10, 'formal dress': 9, 'evening gown': 9,
-            'dress shirt': 8, 'blazer': 8, 'dress pants': 8, 'dress shoes': 8,
-            'business': 7, 'office': 7, 'professional': 7, 'blouse': 7
-        }
-        
-        datenight_keywords = {
-            'dress': 6, 'frock': 6, 'nice dress': 7, 'party dress': 6,
-            'denim': 5, 'jeans': 5, 'cute top': 5, 'nice top': 6,
-            'crop top': 4, 'heels': 7, 'boots': 5, 'flats': 5
-        }
-        
-        casual_keywords = {
-            't-shirt': 2, 'tank top': 1, 'hoodie': 2, 'sweatshirt': 2,
-            'shorts': 2, 'athletic': 1, 'gym': 1, 'workout': 1,
-            'sneakers': 3, 'flip-flops': 1, 'sandals': 2
-        }
-        
-        name_lower = name.lower()
-        combined_text = f"{name_lower} {category.lower()}"
-        
-        # Check keywords with priorities
-        for keywords, default_score in [(formal_keywords, 8), (datenight_keywords, 6), (casual_keywords, 2)]:
-            for keyword, score in keywords.items():
-                if keyword in combined_text:
-                    return score
-        
-        return 5  # Default
+        return get_formality_score(category, name)
     
     def _get_comfort_score(self, category: str) -> int:
         """Estimate comfort score 1-10"""
-        comfort_scores = {
-            'athletic': 10, 'casual': 8, 'lounge': 9,
-            'business': 6, 'formal': 4
-        }
-        
-        category_lower = category.lower()
-        for key, score in comfort_scores.items():
-            if key in category_lower:
-                return score
-        
-        return 7
+        return get_comfort_score(category)
     
     def _get_weather_compatibility(self, category: str) -> List[str]:
         """Get weather conditions this item is good for"""
-        compatibility_map = {
-            'tank_top': ['sunny', 'hot'], 't_shirt': ['sunny', 'cloudy', 'mild'],
-            'sweater': ['cloudy', 'cold', 'windy'], 'hoodie': ['cloudy', 'cool', 'windy'],
-            'jacket': ['cold', 'windy', 'rainy'], 'shorts': ['sunny', 'hot', 'warm'],
-            'pants': ['cloudy', 'cool', 'cold'], 'jeans': ['cloudy', 'cool', 'casual']
-        }
-        
-        return compatibility_map.get(category.lower(), ['sunny', 'cloudy'])
+        return get_weather_compatibility(category)
     
-    def generate_outfit_recommendation(self, user_id: int, weather_data: Dict, occasion: str, variation: bool = False) -> Dict:
+    def generate_outfit_recommendation(self, user_id: int, weather_data: Dict, occasion: str, variation: bool = False,
+                                       seed: Optional[str] = None) -> Dict:
         """Generate AI-enhanced outfit recommendation using user's actual wardrobe"""
         try:
-            wardrobe_items = self.get_user_wardrobe_items(user_id)
+            # Unseeded variations are random by design and bypass the result cache
+            cache_key = None
+            if not variation or seed is not None:
+                version = wardrobe_cache.get_version(user_id)
+                cache_key = recommendation_cache.key(user_id, version, weather_data, occasion,
+                                                     seed if variation else None)
+                cached = recommendation_cache.get(cache_key)
+                if cached is not None:
+                    return dict(cached, weather_context=weather_data)
+            
+            wardrobe = self.get_featurized_wardrobe(user_id)
             
-            if not wardrobe_items:
+            if not len(wardrobe):
                 return {
                     'error': 'No wardrobe items found',
                     'message': 'Please add some clothes to your wardrobe first!'
                 }
             
-            # Group items by category
-            items_by_category = {}
-            for item in wardrobe_items:
-                category = item['category'].lower()
-                if category not in items_by_category:
-                    items_by_category[category] = []
-                items_by_category[category].append(item)
+            partials = self.scoring_engine.weather_partials(wardrobe, weather_data)
+            scores = self.scoring_engine.score_occasions(wardrobe, partials, [occasion])[0]
+            recommendation = self._recommend_from_features(wardrobe, scores, weather_data, occasion, variation, seed,
+                                                           user_id=user_id)
+            recommendation_cache.put(cache_key, recommendation)
+            return recommendation
             
-            # Score all items
-            scored_items = {}
-            for category, items in items_by_category.items():
-                scored_items[category] = []
-                for item in items:
-                    score = self.calculate_item_compatibility_score(item, weather_data, occasion)
-                    scored_items[category].append((item, score))
-                
-                scored_items[category].sort(key=lambda x: x[1], reverse=True)
-            
-            # Build outfit
-            outfit_items = []
-            total_score = 0
-            score_count = 0
-
-            # For party occasions, prefer a dress (single-piece) if available
-            dress_added = False
-            if occasion == 'party':
-                for dress_key in ['dress', 'dresses', 'frock', 'formal dress', 'sequin dress', 'sequined dress']:
-                    if dress_key in scored_items and scored_items[dress_key]:
-                        if variation:
-                            top_n = min(3, len(scored_items[dress_key]))
-                            chosen = scored_items[dress_key][random.randrange(top_n)]
-                        else:
-                            chosen = scored_items[dress_key][0]
-                        outfit_items.append(chosen[0])
-                        total_score += chosen[1]
-                        score_count += 1
-                        dress_added = True
-                        break
+        except Exception as e:
+            logger.error(f"Error generating outfit recommendation: {e}")
+            return {
+                'error': 'Failed to generate recommendation',
+                'message': str(e)
+            }
+    
+    def _recommend_from_features(self, wardrobe, scores, weather_data: Dict, occasion: str, variation: bool = False,
+                                 seed: Optional[str] = None, user_id: Optional[int] = None,
+                                 exclude: Optional[np.ndarray] = None) -> Dict:
+        """Assemble the outfit for one occasion from a featurized wardrobe and its score row"""
+        try:
+            # Search whole outfits (item scores + pairwise compatibility) instead of per-category picks;
+            # variations rank a wider space so the next unseen outfit is found in this one call
+            top_k = variation_engine.window + 3 if variation else 3
+            outfits = self.outfit_search.search(wardrobe, scores, occasion, weather_data, top_k=top_k,
+                                                exclude=exclude)
             
-            # Required categories with common variant names to match frontend inputs
-            # If a dress was added for party, skip adding separate top/bottom
-            required_categories = ['tops', 'bottoms'] if not dress_added else []
-            for req_cat in required_categories:
-                if req_cat == 'tops':
-                    possible_cats = ['tops', 'top', 'shirts', 'shirt', 't-shirts', 't-shirt', 'blouses', 'blouse', 'jersey']
-                else:
-                    # bottoms
-                    possible_cats = ['bottoms', 'bottom', 'pants', 'pant', 'jeans', 'shorts', 'skirt', 'skirts']
-                found_item = None
-
-                for cat_variant in possible_cats:
-                    if cat_variant in scored_items and scored_items[cat_variant]:
-                        # Choose top candidate or random among top-N when variation requested
-                        if variation:
-                            top_n = min(3, len(scored_items[cat_variant]))
-                            idx = random.randrange(top_n)
-                            found_item = scored_items[cat_variant][idx]
-                        else:
-                            found_item = scored_items[cat_variant][0]
-                        break
-
-                if found_item:
-                    outfit_items.append(found_item[0])
-                    total_score += found_item[1]
-                    score_count += 1
+            candidates = [[wardrobe.items[i] for i in outfit.indices] for outfit in outfits]
+            confidences = [outfit.confidence for outfit in outfits]
             
-            # Optional categories
-            optional_categories = ['shoes', 'outerwear']
-            for opt_cat in optional_categories:
-                # Accept common shoe synonyms as well
-                shoe_variants = ['shoes', 'shoe', 'sneakers', 'boots', 'sandals', 'flip-flops', 'loafers', 'espadrilles', 'moccasins', 'heels']
-                candidates_key = None
-                if opt_cat == 'shoes':
-                    # pick the first matching shoe category key present in scored_items
-                    for sv in shoe_variants:
-                        if sv in scored_items and scored_items[sv]:
-                            candidates_key = sv
-                            break
-                else:
-                    candidates_key = opt_cat
-
-                if candidates_key and candidates_key in scored_items and scored_items[candidates_key]:
-                    if opt_cat == 'shoes':
-                        # For party, prefer heels if available
-                        chosen = None
-                        if occasion == 'party' and 'heels' in scored_items and scored_items['heels']:
-                            if variation:
-                                top_n = min(3, len(scored_items['heels']))
-                                chosen = scored_items['heels'][random.randrange(top_n)]
-                            else:
-                                chosen = scored_items['heels'][0]
-                        # fallback to the candidates_key list
-                        if not chosen:
-                            chosen = scored_items[candidates_key][0]
-                            if variation:
-                                top_n = min(3, len(scored_items[candidates_key]))
-                                chosen = scored_items[candidates_key][random.randrange(top_n)]
-                        outfit_items.append(chosen[0])
-                        total_score += chosen[1]
-                        score_count += 1
-                    elif opt_cat == 'outerwear':
-                        temp = weather_data.get('temperature', 20)
-                        if temp < 15 or 'rain' in weather_data.get('condition', '').lower():
-                            chosen = scored_items[opt_cat][0]
-                            if variation:
-                                top_n = min(3, len(scored_items[opt_cat]))
-                                chosen = scored_items[opt_cat][random.randrange(top_n)]
-                            outfit_items.append(chosen[0])
-                            total_score += chosen[1]
-                            score_count += 1
+            # AI enhancement if available: every candidate is scored in one CLIP batch
+            if candidates and self.ai_loaded:
+                analyses = self.analyze_outfits_with_ai(candidates, weather_data, occasion)
+                confidences = [
+                    int((confidence + analysis.get('confidence', confidence)) / 2)
+                    for confidence, analysis in zip(confidences, analyses)
+                ]
             
-            # Calculate confidence
-            confidence = int(total_score / score_count) if score_count > 0 else 50
+            # Rank by final confidence (stable, so search order breaks ties)
+            ranking = sorted(range(len(candidates)), key=lambda index: -confidences[index])
+            candidates = [candidates[index] for index in ranking]
+            confidences = [confidences[index] for index in ranking]
+            signatures = [outfit_signature(item['id'] for item in items) for items in candidates]
             
-            # AI enhancement if available
-            if outfit_items and self.ai_loaded:
-                ai_analysis = self.analyze_outfit_compatibility_with_ai(
-                    outfit_items, weather_data, occasion
-                )
-                confidence = int((confidence + ai_analysis.get('confidence', confidence)) / 2)
+            if not candidates:
+                outfit_items = []
+                confidence = 50
+            else:
+                # Variation: next-best outfit not served recently, seeded per (user, nonce)
+                if variation:
+                    chosen = variation_engine.choose(user_id, occasion, signatures, confidences, seed)
+                else:
+                    chosen = 0
+                outfit_items = candidates[chosen]
+                confidence = confidences[chosen]
+                if user_id is not None:
+                    variation_engine.mark_served(user_id, occasion, signatures[chosen])
             
             reason = self._generate_outfit_reason(outfit_items, weather_data, occasion)
             
@@ -395,6 +272,14 @@ class AIEnhancedOutfitService:
                 'weather_context': weather_data,
                 'occasion': occasion,
                 'ai_enhanced': self.ai_loaded,
+                'alternatives': [
+                    {'item_ids': [item['id'] for item in items], 'confidence': candidate_confidence}
+                    for items, candidate_confidence in zip(candidates[:3], confidences[:3])
+                ],
+                # Per-item scores let regenerate-item recompute confidence without rescoring
+                'item_scores': {
+                    str(item['id']): round(float(scores[wardrobe.index_of(item['id'])]), 2) for item in outfit_items
+                },
                 'generated_at': datetime.now().isoformat()
             }
             
@@ -407,151 +292,148 @@ class AIEnhancedOutfitService:
     
     def calculate_item_compatibility_score(self, item: Dict, weather_data: Dict, occasion: str) -> float:
         """Calculate enhanced AI compatibility score for clothing item"""
-        score = 0.0
+        return self.scoring_engine.score_item(item, weather_data, occasion)
+    
+    def get_occasion_scores(self, user_id: int, weather_data: Dict, occasion: str):
+        """Featurized wardrobe and its score row for this weather and occasion (memoized per wardrobe)"""
+        wardrobe = self.get_featurized_wardrobe(user_id)
+        memo = getattr(wardrobe, '_score_memo', None)
+        if memo is None:
+            memo = wardrobe._score_memo = LRUCache(max_entries=64)
+        key = (self.scoring_engine.weather_key(weather_data), occasion)
+        scores = memo.get(key)
+        if scores is None:
+            partials = self.scoring_engine.weather_partials(wardrobe, weather_data)
+            scores = self.scoring_engine.score_occasions(wardrobe, partials, [occasion])[0]
+            memo.set(key, scores)
+        return wardrobe, scores, memo
+    
+    def regenerate_outfit_item(self, user_id: int, current_outfit: Dict, item_category: str,
+                               current_item_id=None, weather_data: Optional[Dict] = None,
+                               occasion: str = 'casual') -> Dict:
+        """Swap one item of an outfit for a high-scoring alternate from the same category.
         
-        # Temperature compatibility (35% weight)
-        temp = weather_data.get('temperature', 20)
-        temp_min, temp_max = item['temp_range']
-        if temp_min <= temp <= temp_max:
-            temp_score = 35.0
-            optimal_temp = (temp_min + temp_max) / 2
-            temp_distance = abs(temp - optimal_temp)
-            if temp_distance <= 3:
-                temp_score += 5.0
-        else:
-            temp_distance = min(abs(temp - temp_min), abs(temp - temp_max))
-            temp_score = max(0, 35.0 - (temp_distance * 2))
+        Uses the cached featurized wardrobe's category index and a per-category top-K
+        list of alternates, so repeated swaps need no DB round trip and no full rescoring.
+        """
+        item_category = (item_category or '').lower()
+        weather_data = weather_data or {'temperature': 22, 'condition': 'partly cloudy'}
+        wardrobe, scores, memo = self.get_occasion_scores(user_id, weather_data, occasion)
         
-        score += temp_score
+        candidates = wardrobe.category_indices(item_category)
+        current_items = current_outfit.get('items', []) if isinstance(current_outfit.get('items', []), list) else []
+        excluded = {str(current_item_id)} if current_item_id else set()
         
-        # Occasion matching (35% weight)
-        occasion_formality_range = self.outfit_rules['occasion_formality'].get(occasion, (1, 10))
-        item_formality = item['formality_score']
+        # Top-K alternates per category, best first; fall back to a full category scan when exhausted
+        heap_key = (self.scoring_engine.weather_key(weather_data), occasion, 'alternates', item_category)
+        alternates = memo.get(heap_key)
+        if alternates is None:
+            alternates = self.scoring_engine.top_k(scores, self.ALTERNATES_PER_CATEGORY, candidates).tolist()
+            memo.set(heap_key, alternates)
+        top = [index for index in alternates if str(wardrobe.items[index]['id']) not in excluded][:3]
+        if not top and len(candidates) > len(alternates):
+            allowed = np.array([index for index in candidates.tolist()
+                                if str(wardrobe.items[index]['id']) not in excluded], dtype=np.int64)
+            top = self.scoring_engine.top_k(scores, 3, allowed).tolist()
         
-        if occasion_formality_range[0] <= item_formality <= occasion_formality_range[1]:
-            occasion_score = 35.0
-        else:
-            if item_formality < occasion_formality_range[0]:
-                penalty = (occasion_formality_range[0] - item_formality) * 4
-            else:
-                penalty = (item_formality - occasion_formality_range[1]) * 4
-            occasion_score = max(0, 35.0 - penalty)
+        if not top:
+            return {'alternatives_available': len(candidates), 'outfit': None, 'replaced_item': None}
         
-        score += max(occasion_score, 0)
+        # Choose replacement from top-N to add variation on repeated regenerates
+        chosen = random.choice(top)
+        replaced_item = wardrobe.items[chosen]
         
-        # Weather condition compatibility (15% weight)
-        weather_conditions = self._extract_weather_conditions(weather_data)
-        weather_score = 0
-        for condition in weather_conditions:
-            if condition in item['weather_compatibility']:
-                weather_score += 15.0 / len(weather_conditions)
+        new_items = []
+        replaced = False
+        for it in current_items:
+            if not replaced and it.get('category') and it.get('category').lower() == item_category:
+                new_items.append(replaced_item)
+                replaced = True
+            else:
+                new_items.append(it)
+        if not replaced:
+            # If current outfit did not have that category, append the replacement
+            new_items.append(replaced_item)
         
-        score += min(weather_score, 15.0)
+        # Confidence from the outfit's carried per-item scores; only unknown items are looked up
+        item_scores = dict(current_outfit.get('item_scores') or {})
+        item_scores[str(replaced_item['id'])] = round(float(scores[chosen]), 2)
+        outfit_scores = {}
+        for it in new_items:
+            item_id = str(it.get('id'))
+            if item_id not in item_scores:
+                index = wardrobe.index_of(item_id)
+                if index is not None:
+                    item_scores[item_id] = round(float(scores[index]), 2)
+                else:
+                    try:
+                        item_scores[item_id] = self.calculate_item_compatibility_score(it, weather_data, occasion)
+                    except Exception:
+                        item_scores[item_id] = 50
+            outfit_scores[item_id] = item_scores[item_id]
         
-        # Color and comfort (15% weight)
-        score += 15.0
-
-        # Party occasion: boost shiny/metallic/sequin items to favor party looks
-        try:
-            if occasion == 'party':
-                name_lower = item.get('name', '').lower()
-                color_lower = str(item.get('color', '')).lower()
-                shiny_keywords = ['sequin', 'sequined', 'metallic', 'glitter', 'sparkle', 'sparkly', 'lamé', 'lame', 'shiny']
-                if any(k in name_lower for k in shiny_keywords) or any(k in color_lower for k in ['gold', 'silver', 'metallic']):
-                    score += 10.0
-        except Exception:
-            # In case item fields are missing or unexpected, ignore party bonus
-            pass
-
-        # Penalty for recently worn items (within 2 days) to avoid repeats
-        if item.get('last_worn'):
-            days_since_worn = (datetime.now() - item['last_worn']).days
-            if days_since_worn < 2:
-                score -= 20.0  # Reduce score to discourage generating same outfit soon
-
-        return min(score, 100.0)
+        confidence = int(sum(outfit_scores.values()) / len(outfit_scores)) if outfit_scores else 50
+        
+        return {
+            'alternatives_available': len(candidates),
+            'outfit': {
+                'id': f'user_outfit_{uuid.uuid4().hex[:8]}',
+                'items': new_items,
+                'confidence': confidence,
+                'reason': self._generate_outfit_reason(new_items, weather_data, occasion),
+                'weather_context': weather_data,
+                'occasion': occasion,
+                'ai_enhanced': self.ai_loaded,
+                'item_scores': outfit_scores,
+                'generated_at': datetime.now().isoformat()
+            },
+            'replaced_item': replaced_item
+        }
     
     def _extract_weather_conditions(self, weather_data: Dict) -> List[str]:
         """Extract weather conditions from weather data"""
-        conditions = []
-        temp = weather_data.get('temperature', 20)
-        condition = weather_data.get('condition', '').lower()
-        
-        if temp < 5:
-            conditions.append('very_cold')
-        elif temp < 15:
-            conditions.append('cold')
-        elif temp < 22:
-            conditions.append('cool')
-        elif temp < 28:
-            conditions.append('mild')
-        elif temp < 35:
-            conditions.append('warm')
-        else:
-            conditions.append('hot')
-        
-        if 'sun' in condition or 'clear' in condition:
-            conditions.append('sunny')
-        elif 'cloud' in condition:
-            conditions.append('cloudy')
-        elif 'rain' in condition:
-            conditions.append('rainy')
-        
-        return conditions
+        return extract_weather_conditions(weather_data)
     
     def analyze_outfit_compatibility_with_ai(self, outfit_items: List[Dict], 
                                            weather_data: Dict, occasion: str) -> Dict:
         """Use AI to analyze outfit compatibility"""
-        if not self.ai_loaded or not outfit_items:
+        if not outfit_items:
             return {'confidence': 70, 'ai_analysis': False}
+        return self.analyze_outfits_with_ai([outfit_items], weather_data, occasion)[0]
+    
+    def analyze_outfits_with_ai(self, outfits: List[List[Dict]],
+                                weather_data: Dict, occasion: str) -> List[Dict]:
+        """CLIP cohesion, occasion and weather scores for several candidate outfits at once"""
+        if not self.ai_loaded or self.cohesion_scorer is None or not outfits:
+            return [{'confidence': 70, 'ai_analysis': False} for _ in outfits]
         
         try:
-            # Create descriptions for AI analysis
-            outfit_descriptions = []
-            for item in outfit_items:
-                description = f"a {item.get('color', 'colored')} {item.get('name', item.get('category', 'clothing item'))}"
-                outfit_descriptions.append(description)
-            
-            # Basic AI scoring (simplified for this implementation)
-            style_score = 80.0  # Could be enhanced with actual CLIP analysis
-            color_score = 75.0
-            occasion_score = 85.0
-            weather_score = 80.0
-            
-            overall_score = (style_score + color_score + occasion_score + weather_score) / 4
-            
-            return {
-                'overall_compatibility': overall_score,
-                'style_cohesion': style_score,
-                'color_harmony': color_score,
-                'occasion_appropriateness': occasion_score,
-                'weather_suitability': weather_score,
-                'ai_analysis': True,
-                'confidence': int(overall_score)
-            }
+            return self.cohesion_scorer.score_outfits(outfits, weather_data, occasion)
             
         except Exception as e:
             logger.error(f"AI outfit analysis failed: {e}")
-            return {'confidence': 70, 'ai_analysis': False}
+            return [{'confidence': 70, 'ai_analysis': False} for _ in outfits]
     
-    def generate_multi_occasion_recommendations(self, user_id: int, weather_data: Dict) -> Dict:
-        """Generate outfit recommendations for all occasions"""
-        occasions = ['casual', 'work', 'formal', 'workout', 'datenight', 'party']
+    def generate_multi_occasion_recommendations(self, user_id: int, weather_data: Dict,
+                                                occasions: Optional[List[str]] = None) -> Dict:
+        """Generate outfit recommendations for all occasions from a single wardrobe load"""
+        occasions = occasions or DEFAULT_OCCASIONS
         recommendations = {}
         
         try:
-            wardrobe_items = self.get_user_wardrobe_items(user_id)
+            wardrobe, score_matrix = self.prepare_occasion_scores(user_id, weather_data, occasions)
             
-            if not wardrobe_items:
+            if not len(wardrobe):
                 return {
                     'error': 'No wardrobe items found',
                     'message': 'Please add some clothes to your wardrobe first!',
                     'recommendations': {}
                 }
             
-            for occasion in occasions:
+            for row, occasion in enumerate(occasions):
                 try:
-                    outfit = self.generate_outfit_recommendation(user_id, weather_data, occasion)
+                    outfit = self._recommend_from_features(wardrobe, score_matrix[row], weather_data, occasion,
+                                                           user_id=user_id)
                     recommendations[occasion] = outfit
                 except Exception as e:
                     logger.error(f"Failed to generate {occasion} outfit: {e}")
@@ -576,6 +458,75 @@ class AIEnhancedOutfitService:
                 'recommendations': {}
             }
     
+    def prepare_occasion_scores(self, user_id: int, weather_data: Dict, occasions: List[str]):
+        """Featurized wardrobe plus a score row per occasion, in a single vectorized pass"""
+        wardrobe = self.get_featurized_wardrobe(user_id)
+        if not len(wardrobe):
+            return wardrobe, None
+        partials = self.scoring_engine.weather_partials(wardrobe, weather_data)
+        return wardrobe, self.scoring_engine.score_occasions(wardrobe, partials, occasions)
+    
+    def plan_outfits(self, user_id: int, days: List[Tuple[str, Dict]], occasion: str = 'casual') -> Dict:
+        """One outfit per (date, weather) day, scored in a single pass and avoiding repeated items"""
+        try:
+            wardrobe = self.get_featurized_wardrobe(user_id)
+            
+            if not len(wardrobe):
+                return {
+                    'error': 'No wardrobe items found',
+                    'message': 'Please add some clothes to your wardrobe first!',
+                    'plan': []
+                }
+            
+            weathers = [weather_data for _, weather_data in days]
+            partials = self.scoring_engine.weather_partials_batch(wardrobe, weathers)
+            score_matrix = self.scoring_engine.score_weathers(wardrobe, partials, occasion)
+            
+            # Greedy day by day: items already planned are skipped while the slot has alternatives
+            used = np.zeros(len(wardrobe), dtype=bool)
+            plan = []
+            for row, (day, weather_data) in enumerate(days):
+                outfit = self._recommend_from_features(wardrobe, score_matrix[row], weather_data, occasion,
+                                                       exclude=used)
+                for item in outfit.get('items', []):
+                    used[wardrobe.index_of(item['id'])] = True
+                plan.append({'date': day, 'weather': weather_data, 'outfit': outfit})
+            
+            return {
+                'plan': plan,
+                'occasion': occasion,
+                'repeated_items': self._count_repeats(plan),
+                'generated_at': datetime.now().isoformat()
+            }
+            
+        except Exception as e:
+            logger.error(f"Error planning outfits: {e}")
+            return {
+                'error': 'Failed to plan outfits',
+                'message': str(e),
+                'plan': []
+            }
+    
+    @staticmethod
+    def _count_repeats(plan: List[Dict]) -> int:
+        """Item slots reused from an earlier day (small wardrobes can't always avoid it)"""
+        seen = set()
+        repeats = 0
+        for day in plan:
+            for item in day['outfit'].get('items', []):
+                repeats += item['id'] in seen
+                seen.add(item['id'])
+        return repeats
+    
+    def submit_occasion_recommendations(self, user_id: int, wardrobe, score_matrix, weather_data: Dict,
+                                        occasions: List[str]) -> List[Tuple[str, Future]]:
+        """Assemble each occasion's outfit on the worker pool; futures resolve independently"""
+        return [
+            (occasion, self.executor.submit(self._recommend_from_features, wardrobe, score_matrix[row],
+                                            weather_data, occasion, user_id=user_id))
+            for row, occasion in enumerate(occasions)
+        ]
+    
     def _generate_outfit_reason(self, items: List[Dict], weather_data: Dict, occasion: str) -> str:
         """Generate explanation for outfit choice"""
         if not items:
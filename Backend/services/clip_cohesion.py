@@ -0,0 +1,252 @@
+# services/clip_cohesion.py
+import logging
+import threading
+import numpy as np
+import torch
+from pathlib import Path
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from utils.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).parent.parent
+
+# Cosine margin of the target prompt over the mean of its prompt set that maps to 0 / 100;
+# CLIP text-image cosines for competing prompts differ by a few hundredths
+PROMPT_MARGIN = 0.05
+
+# Item-to-item cosine range mapped onto 0-100 style cohesion
+COHESION_FLOOR = 0.4
+COHESION_CEIL = 0.9
+
+TEMPERATURE_BANDS = [
+    (0, 'freezing'), (10, 'cold'), (18, 'cool'), (25, 'mild'), (30, 'warm'), (float('inf'), 'hot')
+]
+
+
+def temperature_band(temp: float) -> str:
+    for upper, band in TEMPERATURE_BANDS:
+        if temp < upper:
+            return band
+    return 'mild'
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-8)
+
+
+class ClipCohesionScorer:
+    """Outfit-level CLIP scores from cached item and prompt embeddings.
+
+    Item embeddings (image + text, averaged in CLIP's joint space) and prompt
+    embeddings are computed once and cached, so scoring a request's candidate
+    outfits is a couple of small matrix multiplies instead of model calls. Items
+    not cached yet are encoded on a background thread; until then outfits containing
+    them are left unscored (the search confidence stands).
+    """
+
+    def __init__(self, clip_model, clip_processor, pairwise_scorer, occasions: List[str],
+                 max_items: int = 50000):
+        self.clip_model = clip_model
+        self.clip_processor = clip_processor
+        self.pairwise_scorer = pairwise_scorer
+        self.occasions = list(occasions)
+        self.item_embeddings = LRUCache(max_entries=max_items)
+        self.prompt_embeddings = LRUCache(max_entries=1024)
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._encoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix='clip-embed')
+        self._encoder.submit(self._warm_prompts)
+
+    @staticmethod
+    def _item_key(item: Dict):
+        return (item.get('id'), item.get('image_path'), item.get('name'), item.get('color'))
+
+    @staticmethod
+    def _item_text(item: Dict) -> str:
+        return f"a {item.get('color', 'colored')} {item.get('name', item.get('category', 'clothing item'))}"
+
+    @staticmethod
+    def _image_file(image_path: Optional[str]) -> Optional[Path]:
+        """Local file for a stored image URL (/static/...), if present"""
+        if not image_path or image_path.startswith(('http://', 'https://')):
+            return None
+        path = BASE_DIR / image_path.lstrip('/') if image_path.startswith('/static/') else Path(image_path)
+        return path if path.is_file() else None
+
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        inputs = self.clip_processor(text=texts, return_tensors="pt", padding=True)
+        with torch.no_grad():
+            features = self.clip_model.get_text_features(**inputs)
+        return _normalize(features.cpu().numpy().astype(np.float32))
+
+    def _encode_images(self, images: List) -> np.ndarray:
+        inputs = self.clip_processor(images=images, return_tensors="pt")
+        with torch.no_grad():
+            features = self.clip_model.get_image_features(**inputs)
+        return _normalize(features.cpu().numpy().astype(np.float32))
+
+    def embed_items(self, items: List[Dict]) -> np.ndarray:
+        """Unit-norm embedding per item; misses are encoded together in one batch"""
+        keys = [self._item_key(item) for item in items]
+        missing = {}
+        for item, key in zip(items, keys):
+            if key not in missing and self.item_embeddings.get(key) is None:
+                missing[key] = item
+
+        if missing:
+            pending = list(missing.items())
+            embeddings = self._encode_texts([self._item_text(item) for _, item in pending])
+
+            images, image_rows = [], []
+            for row, (_, item) in enumerate(pending):
+                image_file = self._image_file(item.get('image_path'))
+                if image_file is None:
+                    continue
+                try:
+                    images.append(Image.open(image_file).convert('RGB'))
+                    image_rows.append(row)
+                except Exception as e:
+                    logger.warning(f"Could not load item image {image_file}: {e}")
+            if images:
+                embeddings[image_rows] = _normalize(embeddings[image_rows] + self._encode_images(images))
+
+            for (key, _), embedding in zip(pending, embeddings):
+                self.item_embeddings.set(key, embedding)
+
+        return np.stack([self.item_embeddings.get(key) for key in keys])
+
+    def queue_items(self, items: List[Dict]):
+        """Encode items on the background encoder (each key queued once)"""
+        with self._pending_lock:
+            queued = {}
+            for item in items:
+                key = self._item_key(item)
+                if key not in self._pending and key not in queued:
+                    queued[key] = item
+            self._pending.update(queued)
+        if queued:
+            self._encoder.submit(self._encode_queued, queued)
+
+    def _encode_queued(self, queued: Dict):
+        try:
+            self.embed_items(list(queued.values()))
+        except Exception as e:
+            logger.warning(f"Background CLIP encoding failed for {len(queued)} items: {e}")
+        finally:
+            with self._pending_lock:
+                self._pending.difference_update(queued)
+
+    def _occasion_prompts(self, occasions: List[str]) -> List[str]:
+        return [f"an outfit for a {name} occasion" for name in occasions]
+
+    def _warm_prompts(self):
+        try:
+            prompts = self._occasion_prompts(self.occasions)
+            for condition in ('clear', 'rain'):
+                prompts += self._weather_prompts({'condition': condition})[0]
+            self.embed_prompts(prompts)
+        except Exception as e:
+            logger.warning(f"CLIP prompt warm-up failed: {e}")
+
+    def embed_prompts(self, prompts: List[str]) -> np.ndarray:
+        missing = [prompt for prompt in dict.fromkeys(prompts) if self.prompt_embeddings.get(prompt) is None]
+        if missing:
+            for prompt, embedding in zip(missing, self._encode_texts(missing)):
+                self.prompt_embeddings.set(prompt, embedding)
+        return np.stack([self.prompt_embeddings.get(prompt) for prompt in prompts])
+
+    def _weather_prompts(self, weather_data: Dict):
+        """One prompt per temperature band; returns (prompts, index of the current band)"""
+        rainy = 'rain' in str(weather_data.get('condition', '')).lower()
+        suffix = ' and rain' if rainy else ''
+        bands = [band for _, band in TEMPERATURE_BANDS]
+        prompts = [f"an outfit for {band} weather{suffix}" for band in bands]
+        return prompts, bands.index(temperature_band(weather_data.get('temperature', 20)))
+
+    def _color_harmony(self, outfit: List[Dict]) -> float:
+        """Mean pairwise color-harmony table value mapped to 0-100"""
+        if len(outfit) < 2:
+            return 75.0
+        codes = self.pairwise_scorer.item_features(outfit).colors
+        table = self.pairwise_scorer.harmony_table[codes[:, None], codes[None, :]]
+        n = len(outfit)
+        mean = (table.sum() - np.trace(table)) / (n * (n - 1))
+        return float(np.clip((mean + 0.5) / 1.5, 0, 1) * 100)
+
+    def score_outfits(self, outfits: List[List[Dict]], weather_data: Dict, occasion: str) -> List[Dict]:
+        """Cohesion, occasion and weather scores for every candidate outfit in one batch"""
+        union, column = [], {}
+        for outfit in outfits:
+            for item in outfit:
+                key = self._item_key(item)
+                if key not in column:
+                    column[key] = len(union)
+                    union.append(item)
+        cached = [self.item_embeddings.get(self._item_key(item)) for item in union]
+        missing = [item for item, embedding in zip(union, cached) if embedding is None]
+        if missing:
+            self.queue_items(missing)
+        if len(missing) == len(union):
+            return [{'ai_analysis': False, 'pending_embeddings': True} for _ in outfits]
+        dimension = next(embedding for embedding in cached if embedding is not None).shape[0]
+        embeddings = np.stack([
+            embedding if embedding is not None else np.zeros(dimension, dtype=np.float32) for embedding in cached
+        ])
+        ready = np.array([embedding is not None for embedding in cached])
+
+        # Outfit membership matrix: one matmul yields every outfit's embedding sum
+        membership = np.zeros((len(outfits), len(union)), dtype=np.float32)
+        for row, outfit in enumerate(outfits):
+            for item in outfit:
+                membership[row, column[self._item_key(item)]] = 1.0
+        sizes = membership.sum(axis=1)
+        sums = membership @ embeddings
+        complete = (membership[:, ~ready] == 0).all(axis=1)
+
+        # Mean pairwise cosine within each outfit: (|sum|^2 - n) / (n (n - 1))
+        squared = np.einsum('ij,ij->i', sums, sums)
+        pair_counts = np.maximum(sizes * (sizes - 1), 1)
+        cohesion = (squared - sizes) / pair_counts
+        style_scores = np.clip((cohesion - COHESION_FLOOR) / (COHESION_CEIL - COHESION_FLOOR), 0, 1) * 100
+        style_scores = np.where(sizes > 1, style_scores, 75.0)
+
+        occasions = self.occasions if occasion in self.occasions else self.occasions + [occasion]
+        occasion_prompts = self._occasion_prompts(occasions)
+        weather_prompts, weather_index = self._weather_prompts(weather_data)
+        prompts = self.embed_prompts(occasion_prompts + weather_prompts)
+
+        # Target prompt's cosine margin over its competing prompts, mapped linearly onto 0-100
+        cosines = _normalize(sums) @ prompts.T
+        occasion_scores = self._prompt_scores(cosines[:, :len(occasion_prompts)], occasions.index(occasion))
+        weather_scores = self._prompt_scores(cosines[:, len(occasion_prompts):], weather_index)
+
+        results = []
+        for row, outfit in enumerate(outfits):
+            if not complete[row]:
+                results.append({'ai_analysis': False, 'pending_embeddings': True})
+                continue
+            style_score = float(style_scores[row])
+            color_score = self._color_harmony(outfit)
+            occasion_score = float(occasion_scores[row])
+            weather_score = float(weather_scores[row])
+            overall_score = (style_score + color_score + occasion_score + weather_score) / 4
+            results.append({
+                'overall_compatibility': overall_score,
+                'style_cohesion': style_score,
+                'color_harmony': color_score,
+                'occasion_appropriateness': occasion_score,
+                'weather_suitability': weather_score,
+                'ai_analysis': True,
+                'confidence': int(overall_score)
+            })
+        return results
+
+    @staticmethod
+    def _prompt_scores(cosines: np.ndarray, target: int) -> np.ndarray:
+        """0-100 per outfit: 50 at the prompt-set mean, 100 at PROMPT_MARGIN above it"""
+        margin = cosines[:, target] - cosines.mean(axis=1)
+        return np.clip(0.5 + margin / (2 * PROMPT_MARGIN), 0, 1) * 100
@@ -0,0 +1,351 @@
+# services/compatibility_matrix.py
+import os
+import json
+import zlib
+import logging
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+from database.connection import db
+from services.item_features import FEATURE_RULES_VERSION
+from services.outfit_rules import create_color_harmony_rules
+from services.outfit_search import PairFeatures, PairwiseScorer, SEASON_BITS
+from utils.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Wardrobes above this size are scored on the fly (the packed matrix grows as n^2 / 2)
+MAX_MATRIX_ITEMS = int(os.getenv('COMPATIBILITY_MATRIX_MAX_ITEMS', 2000))
+
+# Weight of the optional embedding-affinity term (cosine similarity of item embeddings)
+EMBEDDING_WEIGHT = 0.5
+
+
+def _pair_rules_version(embeddings: bool = False) -> int:
+    """Checksum of everything a stored pair score depends on"""
+    rules = [create_color_harmony_rules(), SEASON_BITS, FEATURE_RULES_VERSION,
+             EMBEDDING_WEIGHT if embeddings else 0]
+    return zlib.crc32(json.dumps(rules, sort_keys=True).encode('utf-8')) & 0x7fffffff
+
+
+PAIR_RULES_VERSION = _pair_rules_version()
+
+
+def _triangle_coords(n: int):
+    """(row, column) of every packed entry for an n-item matrix"""
+    cols = np.repeat(np.arange(n, dtype=np.int64), np.arange(n, dtype=np.int64))
+    rows = np.arange(len(cols), dtype=np.int64) - cols * (cols - 1) // 2
+    return rows, cols
+
+
+class CompatibilityMatrix:
+    """Packed float16 upper triangle of pair scores for one user's wardrobe.
+
+    Pair (i, j) with i < j lives at j * (j - 1) / 2 + i, i.e. the triangle is stored
+    column by column, so adding an item appends exactly its new column. Instances are
+    treated as immutable snapshots: add/remove return new matrices, so a featurized
+    wardrobe holding an older snapshot keeps consistent positions.
+    """
+
+    def __init__(self, item_ids: List[int], features: PairFeatures, packed: np.ndarray,
+                 rules_version: int = PAIR_RULES_VERSION):
+        self.item_ids = list(item_ids)
+        self.features = features
+        self.packed = np.asarray(packed, dtype=np.float16)
+        self.rules_version = rules_version
+        self._position = {item_id: pos for pos, item_id in enumerate(self.item_ids)}
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.packed.nbytes) + len(self.item_ids) * 64
+
+    @classmethod
+    def build(cls, item_ids: List[int], features: PairFeatures, scores: np.ndarray,
+              rules_version: int = PAIR_RULES_VERSION) -> 'CompatibilityMatrix':
+        """Pack a full (n, n) score matrix"""
+        rows, cols = _triangle_coords(len(item_ids))
+        return cls(item_ids, features, scores[rows, cols], rules_version)
+
+    def position(self, item_id) -> Optional[int]:
+        return self._position.get(item_id)
+
+    def positions(self, item_ids: Iterable) -> np.ndarray:
+        return np.array([self._position.get(item_id, -1) for item_id in item_ids], dtype=np.int64)
+
+    def with_item(self, item_id, features: PairFeatures, column: np.ndarray) -> 'CompatibilityMatrix':
+        """New matrix with one more item; column holds its scores against every existing item"""
+        packed = np.concatenate([self.packed, np.asarray(column, dtype=np.float16)])
+        return CompatibilityMatrix(self.item_ids + [item_id], self.features.concat(features), packed,
+                                   self.rules_version)
+
+    def without_items(self, item_ids: Iterable) -> 'CompatibilityMatrix':
+        """New matrix with the given items' rows and columns dropped"""
+        keep = np.ones(len(self.item_ids), dtype=bool)
+        for item_id in item_ids:
+            pos = self._position.get(item_id)
+            if pos is not None:
+                keep[pos] = False
+        rows, cols = _triangle_coords(len(self.item_ids))
+        # Filtering keeps column-major order, which is exactly the packing of the smaller matrix
+        packed = self.packed[keep[rows] & keep[cols]]
+        kept = np.flatnonzero(keep)
+        return CompatibilityMatrix([self.item_ids[pos] for pos in kept], self.features.take(kept), packed,
+                                   self.rules_version)
+
+    def dense(self, positions: np.ndarray) -> np.ndarray:
+        """Symmetric float64 sub-matrix for the given item positions (zero diagonal)"""
+        positions = np.asarray(positions, dtype=np.int64)
+        if self.packed.size == 0:
+            return np.zeros((len(positions), len(positions)))
+        low = np.minimum(positions[:, None], positions[None, :])
+        high = np.maximum(positions[:, None], positions[None, :])
+        diagonal = low == high
+        index = np.where(diagonal, 0, high * (high - 1) // 2 + low)
+        return np.where(diagonal, 0.0, self.packed[index].astype(np.float64))
+
+    def to_record(self) -> Dict:
+        return {
+            'item_features': json.dumps([
+                [item_id, int(color), float(formality), int(season)]
+                for item_id, color, formality, season in zip(
+                    self.item_ids, self.features.colors, self.features.formality, self.features.seasons)
+            ]),
+            'scores': self.packed.tobytes(),
+            'rules_version': self.rules_version
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict) -> 'CompatibilityMatrix':
+        rows = record['item_features']
+        if isinstance(rows, str):
+            rows = json.loads(rows)
+        features = PairFeatures([row[1] for row in rows], [row[2] for row in rows], [row[3] for row in rows])
+        packed = np.frombuffer(bytes(record['scores']), dtype=np.float16).copy()
+        return cls([row[0] for row in rows], features, packed, record['rules_version'])
+
+
+class CompatibilityService:
+    """Per-user pairwise compatibility matrices, kept current incrementally.
+
+    Adding an item computes only its new column and removing one drops its row and
+    column; outfit search then reads pair scores by lookup. Matrices are persisted in
+    item_compatibility and cached in-process. Requests only read a matrix that is
+    already in memory and current; building, reconciling and saving happen on a
+    background thread, and search scores pairs on the fly until the matrix is ready.
+    """
+
+    def __init__(self, scorer: PairwiseScorer, max_items: int = MAX_MATRIX_ITEMS,
+                 max_bytes: int = 128 * 1024 * 1024,
+                 embedding_provider: Optional[Callable[[List[Dict]], Optional[np.ndarray]]] = None):
+        self.scorer = scorer
+        self.max_items = max_items
+        self.embedding_provider = None
+        self.rules_version = PAIR_RULES_VERSION
+        self.matrices = LRUCache(max_entries=10000, max_bytes=max_bytes, size_fn=lambda matrix: matrix.nbytes)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._table_ready = False
+        self._scheduled = set()
+        self._scheduled_lock = threading.Lock()
+        self._builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix='compat-matrix')
+        if embedding_provider is not None:
+            self.set_embedding_provider(embedding_provider)
+
+    def set_embedding_provider(self, provider: Optional[Callable[[List[Dict]], Optional[np.ndarray]]]):
+        """Add (or drop) the embedding-affinity term.
+
+        provider returns unit-norm embeddings for a list of wardrobe items, or None
+        when unavailable. Matrices built under the other setting are discarded.
+        """
+        self.embedding_provider = provider
+        self.rules_version = _pair_rules_version(provider is not None)
+        self.matrices.clear()
+
+    def _ensure_table(self):
+        """Create the item_compatibility table if it doesn't exist (once, off the request path)"""
+        if self._table_ready:
+            return
+        try:
+            query = """
+            CREATE TABLE IF NOT EXISTS item_compatibility (
+                user_id INTEGER PRIMARY KEY,
+                item_features JSONB NOT NULL,
+                scores BYTEA NOT NULL,
+                rules_version INTEGER NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+            db.execute_query(query)
+            self._table_ready = True
+            logger.info("Item compatibility table created or confirmed to exist")
+        except Exception as e:
+            logger.error(f"Error ensuring item compatibility table: {e}")
+
+    def _user_lock(self, user_id: int) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(user_id, threading.Lock())
+
+    def _embedding_affinity(self, left_items: List[Dict], right_items: List[Dict]) -> Optional[np.ndarray]:
+        if self.embedding_provider is None or not left_items or not right_items:
+            return None
+        try:
+            left = self.embedding_provider(left_items)
+            right = self.embedding_provider(right_items)
+            if left is None or right is None:
+                return None
+            return EMBEDDING_WEIGHT * (left @ right.T)
+        except Exception as e:
+            logger.warning(f"Embedding affinity unavailable: {e}")
+            return None
+
+    def _scores(self, left_items: List[Dict], left: PairFeatures,
+                right_items: List[Dict], right: PairFeatures) -> np.ndarray:
+        scores = self.scorer.pair_scores(left, right)
+        affinity = self._embedding_affinity(left_items, right_items)
+        if affinity is not None:
+            scores = scores + affinity
+        return scores
+
+    def build(self, items: List[Dict]) -> CompatibilityMatrix:
+        """Full matrix for a wardrobe (first use or rules change)"""
+        item_ids = [item['id'] for item in items]
+        features = self.scorer.item_features(items)
+        scores = self._scores(items, features, items, features)
+        return CompatibilityMatrix.build(item_ids, features, scores, self.rules_version)
+
+    def _append(self, matrix: CompatibilityMatrix, item: Dict, items_by_id: Dict) -> CompatibilityMatrix:
+        features = self.scorer.item_features([item])
+        existing = [items_by_id[item_id] for item_id in matrix.item_ids]
+        column = self._scores([item], features, existing, matrix.features)[0]
+        return matrix.with_item(item['id'], features, column)
+
+    def _load(self, user_id: int) -> Optional[CompatibilityMatrix]:
+        matrix = self.matrices.get(user_id)
+        if matrix is not None:
+            return matrix
+        try:
+            rows = db.execute_query("""
+                SELECT item_features, scores, rules_version
+                FROM item_compatibility
+                WHERE user_id = %s
+            """, (user_id,))
+            matrix = CompatibilityMatrix.from_record(rows[0]) if rows else None
+        except Exception as e:
+            logger.error(f"Error loading compatibility matrix for user {user_id}: {e}")
+            return None
+        if matrix is None or matrix.rules_version != self.rules_version:
+            return None
+        self.matrices.set(user_id, matrix)
+        return matrix
+
+    def _save(self, user_id: int, matrix: CompatibilityMatrix):
+        self.matrices.set(user_id, matrix)
+        record = matrix.to_record()
+        try:
+            db.execute_query("""
+                INSERT INTO item_compatibility (user_id, item_features, scores, rules_version, updated_at)
+                VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    item_features = EXCLUDED.item_features,
+                    scores = EXCLUDED.scores,
+                    rules_version = EXCLUDED.rules_version,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (user_id, record['item_features'], record['scores'], record['rules_version']))
+        except Exception as e:
+            logger.error(f"Error saving compatibility matrix for user {user_id}: {e}")
+
+    def _schedule(self, key, fn, *args):
+        """Run fn on the background builder unless the same job is already queued"""
+        with self._scheduled_lock:
+            if key in self._scheduled:
+                return
+            self._scheduled.add(key)
+
+        def run():
+            try:
+                self._ensure_table()
+                fn(*args)
+            except Exception as e:
+                logger.error(f"Compatibility matrix job {key} failed: {e}")
+            finally:
+                with self._scheduled_lock:
+                    self._scheduled.discard(key)
+
+        try:
+            self._builder.submit(run)
+        except RuntimeError as e:
+            with self._scheduled_lock:
+                self._scheduled.discard(key)
+            logger.warning(f"Compatibility matrix builder unavailable: {e}")
+
+    def get_matrix(self, user_id: int, items: List[Dict]) -> Optional[CompatibilityMatrix]:
+        """In-memory matrix covering these items, or None while one is built in the background"""
+        if not items or len(items) > self.max_items:
+            return None
+        matrix = self.matrices.get(user_id)
+        if matrix is not None and matrix.rules_version == self.rules_version and len(matrix) == len(items):
+            if (matrix.positions(item['id'] for item in items) >= 0).all():
+                return matrix
+        self._schedule(('refresh', user_id), self._refresh, user_id, list(items))
+        return None
+
+    def _refresh(self, user_id: int, items: List[Dict]):
+        """Reconcile the stored matrix with the current items (background thread)"""
+        with self._user_lock(user_id):
+            matrix = self._load(user_id)
+            items_by_id = {item['id']: item for item in items}
+
+            if matrix is None:
+                updated = self.build(items)
+            else:
+                updated = matrix
+                stale = [item_id for item_id in matrix.item_ids if item_id not in items_by_id]
+                if stale:
+                    updated = updated.without_items(stale)
+                missing = [item for item in items if updated.position(item['id']) is None]
+                if len(missing) > len(items) // 2:
+                    updated = self.build(items)
+                else:
+                    for item in missing:
+                        updated = self._append(updated, item, items_by_id)
+
+            if updated is not matrix:
+                self._save(user_id, updated)
+
+    def remove_item(self, user_id: int, item_id: int):
+        """Drop a deleted item's row and column (in the background)"""
+        self._schedule(('remove', user_id, item_id), self._remove_item, user_id, item_id)
+
+    def _remove_item(self, user_id: int, item_id: int):
+        with self._user_lock(user_id):
+            matrix = self._load(user_id)
+            if matrix is None or matrix.position(item_id) is None:
+                return
+            self._save(user_id, matrix.without_items([item_id]))
+
+    def attach(self, user_id: int, wardrobe) -> bool:
+        """Attach the user's matrix to a featurized wardrobe so outfit search uses lookups"""
+        matrix = self.get_matrix(user_id, wardrobe.items)
+        if matrix is None:
+            return False
+        positions = matrix.positions(item['id'] for item in wardrobe.items)
+        if (positions < 0).any():
+            return False
+        # Positions first: search reads them only once compatibility is set
+        wardrobe.compatibility_positions = positions
+        wardrobe.compatibility = matrix
+        return True
+
+    def stats(self) -> Dict:
+        stats = self.matrices.stats()
+        stats['pending_builds'] = len(self._scheduled)
+        stats['embeddings'] = self.embedding_provider is not None
+        return stats
+
+
+# Global instance
+compatibility_service = CompatibilityService(PairwiseScorer(create_color_harmony_rules()))
@@ -0,0 +1,213 @@
+# services/daily_recommendations.py
+import os
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Callable, Dict, List, Optional
+from database.connection import db
+from services.wardrobe_cache import wardrobe_cache
+from utils.geo import geo_cell, cell_center
+from utils.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Same defaults /api/outfit/ai-recommendation uses when no location is sent
+DEFAULT_WEATHER = {
+    'temperature': 22,
+    'condition': 'partly cloudy',
+    'humidity': 55,
+    'windSpeed': 12,
+    'precipitation': 0,
+    'location': 'Default Location'
+}
+
+DEFAULT_OCCASIONS = [
+    occasion.strip() for occasion in os.getenv('DAILY_RECOMMENDATION_OCCASIONS', 'casual,work').split(',')
+    if occasion.strip()
+]
+
+
+class DailyRecommendationService:
+    """Precomputed "today's outfit" per user and occasion.
+
+    A nightly batch (scripts/precompute_daily_recommendations.py) streams users
+    through a server-side cursor, fetches weather once per geo-cell of their
+    last-known location and scores every default occasion in one vectorized pass.
+    The recommendation endpoint then answers from a short-lived in-process copy of
+    the user's rows, so the hot path costs at most one primary-key read per TTL.
+    Tables are created by create_all_tables.py.
+    """
+
+    def __init__(self, max_users: int = 50000, rows_ttl: float = 600):
+        self._known_cells = LRUCache(max_entries=max_users)  # user_id -> last recorded geo-cell
+        # user_id -> {(date, occasion): row} for today onwards; {} caches "nothing precomputed"
+        self._rows = LRUCache(max_entries=max_users, ttl=rows_ttl)
+        self._lock = threading.Lock()
+        # Invalidation DELETEs run here, behind the wardrobe write that triggered them
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='daily-recommendations')
+        wardrobe_cache.add_invalidation_listener(self.invalidate)
+
+    def record_location(self, user_id: int, latitude: float, longitude: float):
+        """Remember the user's last-known location (only written when the geo-cell changes)"""
+        try:
+            cell = geo_cell(latitude, longitude)
+            with self._lock:
+                if self._known_cells.get(user_id) == cell:
+                    return
+                self._known_cells.set(user_id, cell)
+            db.execute_query("""
+                INSERT INTO user_locations (user_id, latitude, longitude, geo_cell, updated_at)
+                VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    latitude = EXCLUDED.latitude,
+                    longitude = EXCLUDED.longitude,
+                    geo_cell = EXCLUDED.geo_cell,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (user_id, latitude, longitude, cell))
+        except Exception as e:
+            logger.error(f"Error recording location for user {user_id}: {e}")
+
+    def get(self, user_id: int, occasion: str, cell: Optional[str] = None) -> Optional[Dict]:
+        """Today's precomputed recommendation for the same geo-cell, if any.
+
+        Without a location (cell None) only rows computed for the default weather
+        (geo_cell NULL) are served, never another city's.
+        """
+        try:
+            rows = self._rows.get(user_id)
+            if rows is None:
+                rows = self._load(user_id)
+            row = rows.get((date.today(), occasion))
+            if row is None:
+                return None
+            if row['geo_cell'] != cell:
+                return None
+            return {'weather': row['weather'], 'recommendation': row['recommendation']}
+        except Exception as e:
+            logger.error(f"Error reading daily recommendation for user {user_id}: {e}")
+            return None
+
+    def _load(self, user_id: int) -> Dict:
+        """Read the user's precomputed rows from today onwards into the in-process cache"""
+        rows = db.execute_query("""
+            SELECT recommendation_date, occasion, geo_cell, weather, recommendation
+            FROM daily_recommendations
+            WHERE user_id = %s AND recommendation_date >= CURRENT_DATE
+        """, (user_id,))
+        loaded = {(row['recommendation_date'], row['occasion']): row for row in rows or []}
+        self._rows.set(user_id, loaded)
+        return loaded
+
+    def invalidate(self, user_id: int):
+        """Drop today's and future precomputed outfits after a wardrobe change.
+
+        This worker stops serving them at once; the DELETE runs off the request thread.
+        """
+        # Known to have nothing precomputed: skip the DELETE on every wardrobe write
+        if self._rows.peek(user_id) == {}:
+            return
+        self._rows.set(user_id, {})
+        try:
+            self._writer.submit(self._delete, user_id)
+        except RuntimeError as e:
+            logger.warning(f"Daily recommendation writer unavailable: {e}")
+
+    def _delete(self, user_id: int):
+        try:
+            db.execute_query("""
+                DELETE FROM daily_recommendations
+                WHERE user_id = %s AND recommendation_date >= CURRENT_DATE
+            """, (user_id,))
+        except Exception as e:
+            logger.error(f"Error invalidating daily recommendations for user {user_id}: {e}")
+
+    def _store(self, rows: List[tuple]):
+        """Bulk upsert (user_id, date, occasion, cell, weather_json, recommendation_json) rows"""
+        if not rows:
+            return
+        values = ', '.join(["(%s, %s, %s, %s, %s::jsonb, %s::jsonb)"] * len(rows))
+        params = [value for row in rows for value in row]
+        db.execute_query(f"""
+            INSERT INTO daily_recommendations
+                (user_id, recommendation_date, occasion, geo_cell, weather, recommendation)
+            VALUES {values}
+            ON CONFLICT (user_id, recommendation_date, occasion) DO UPDATE SET
+                geo_cell = EXCLUDED.geo_cell,
+                weather = EXCLUDED.weather,
+                recommendation = EXCLUDED.recommendation,
+                created_at = CURRENT_TIMESTAMP
+        """, tuple(params))
+
+    def run_batch(self, outfit_service, weather_provider: Callable[[float, float], Dict],
+                  default_weather: Dict = DEFAULT_WEATHER, occasions: Optional[List[str]] = None,
+                  recommendation_date: Optional[date] = None, chunk_size: int = 500) -> Dict:
+        """Precompute recommendations for every active user with a wardrobe.
+
+        Users without a known location get default_weather, matching what the
+        endpoint uses when no location is sent.
+        """
+        occasions = occasions or DEFAULT_OCCASIONS
+        recommendation_date = recommendation_date or date.today()
+        weather_by_cell = {}
+        stats = {'users': 0, 'stored': 0, 'failed': 0, 'weather_lookups': 0}
+
+        query = """
+            SELECT u.id AS user_id, l.geo_cell
+            FROM users u
+            LEFT JOIN user_locations l ON l.user_id = u.id
+            WHERE u.is_active IS NOT FALSE
+              AND EXISTS (SELECT 1 FROM wardrobe_items w WHERE w.user_id = u.id)
+            ORDER BY u.id
+        """
+        for chunk in db.iter_query(query, chunk_size=chunk_size, cursor_name='daily_recommendation_users'):
+            # One weather lookup per geo-cell for the whole run
+            for cell in {row['geo_cell'] for row in chunk} - set(weather_by_cell):
+                try:
+                    if cell is None:
+                        weather_by_cell[cell] = default_weather
+                    else:
+                        weather_by_cell[cell] = weather_provider(*cell_center(cell))
+                    stats['weather_lookups'] += 1
+                except Exception as e:
+                    logger.warning(f"Weather lookup failed for cell {cell}: {e}")
+                    weather_by_cell[cell] = None
+
+            rows = []
+            for row in chunk:
+                stats['users'] += 1
+                weather = weather_by_cell.get(row['geo_cell'])
+                if weather is None:
+                    stats['failed'] += 1
+                    continue
+                try:
+                    result = outfit_service.generate_multi_occasion_recommendations(
+                        row['user_id'], weather, occasions
+                    )
+                    for occasion, recommendation in result.get('recommendations', {}).items():
+                        if recommendation.get('error') or not recommendation.get('items'):
+                            continue
+                        rows.append((
+                            row['user_id'], recommendation_date, occasion, row['geo_cell'],
+                            json.dumps(weather, default=str), json.dumps(recommendation, default=str)
+                        ))
+                except Exception as e:
+                    stats['failed'] += 1
+                    logger.error(f"Daily recommendation failed for user {row['user_id']}: {e}")
+
+            try:
+                self._store(rows)
+                stats['stored'] += len(rows)
+                for user_id in {row[0] for row in rows}:
+                    self._rows.delete(user_id)
+            except Exception as e:
+                stats['failed'] += len(rows)
+                logger.error(f"Error storing daily recommendations chunk: {e}")
+            logger.info(f"Daily recommendations: {stats['users']} users processed, {stats['stored']} stored")
+
+        return stats
+
+
+# Global instance
+daily_recommendation_service = DailyRecommendationService()
@@ -0,0 +1,112 @@
+# services/item_features.py
+"""Derived wardrobe item attributes (temperature range, formality, comfort, weather fit).
+
+These only depend on an item's name/category/season, so they are computed when the
+item is written and persisted in wardrobe_items together with FEATURE_RULES_VERSION.
+Changing any rule table below changes the version, and stale rows are re-featurized
+by WardrobeService.refeaturize_stale_items.
+"""
+import json
+import zlib
+from typing import Dict, List
+from services.keyword_matcher import KeywordMatcher
+
+BASE_TEMP_RANGES = {
+    'tank_top': [25, 40], 't_shirt': [18, 35], 'blouse': [16, 30],
+    'sweater': [5, 20], 'hoodie': [8, 25], 'jacket': [0, 18],
+    'shorts': [22, 40], 'pants': [5, 30], 'jeans': [8, 25],
+    'skirt': [20, 35], 'dress': [15, 32]
+}
+
+SEASON_ADJUSTMENTS = {
+    'winter': [-5, -10], 'summer': [5, 10],
+    'spring': [0, 5], 'fall': [-2, -5]
+}
+
+FORMAL_KEYWORDS = {
+    'suit': 10, 'tuxedo': 10, 'formal dress': 9, 'evening gown': 9,
+    'dress shirt': 8, 'blazer': 8, 'dress pants': 8, 'dress shoes': 8,
+    'business': 7, 'office': 7, 'professional': 7, 'blouse': 7
+}
+
+DATENIGHT_KEYWORDS = {
+    'dress': 6, 'frock': 6, 'nice dress': 7, 'party dress': 6,
+    'denim': 5, 'jeans': 5, 'cute top': 5, 'nice top': 6,
+    'crop top': 4, 'heels': 7, 'boots': 5, 'flats': 5
+}
+
+CASUAL_KEYWORDS = {
+    't-shirt': 2, 'tank top': 1, 'hoodie': 2, 'sweatshirt': 2,
+    'shorts': 2, 'athletic': 1, 'gym': 1, 'workout': 1,
+    'sneakers': 3, 'flip-flops': 1, 'sandals': 2
+}
+
+# Checked in order: the first matching keyword wins
+FORMALITY_KEYWORD_TABLES = [FORMAL_KEYWORDS, DATENIGHT_KEYWORDS, CASUAL_KEYWORDS]
+
+COMFORT_SCORES = {
+    'athletic': 10, 'casual': 8, 'lounge': 9,
+    'business': 6, 'formal': 4
+}
+
+WEATHER_COMPATIBILITY_MAP = {
+    'tank_top': ['sunny', 'hot'], 't_shirt': ['sunny', 'cloudy', 'mild'],
+    'sweater': ['cloudy', 'cold', 'windy'], 'hoodie': ['cloudy', 'cool', 'windy'],
+    'jacket': ['cold', 'windy', 'rainy'], 'shorts': ['sunny', 'hot', 'warm'],
+    'pants': ['cloudy', 'cool', 'cold'], 'jeans': ['cloudy', 'cool', 'casual']
+}
+
+
+def _rules_version() -> int:
+    """Stable checksum of the rule tables (fits a signed INTEGER column)"""
+    tables = [BASE_TEMP_RANGES, SEASON_ADJUSTMENTS, FORMALITY_KEYWORD_TABLES,
+              COMFORT_SCORES, WEATHER_COMPATIBILITY_MAP]
+    return zlib.crc32(json.dumps(tables, sort_keys=False).encode('utf-8')) & 0x7fffffff
+
+
+FEATURE_RULES_VERSION = _rules_version()
+
+# Compiled once; priority follows table order so the first listed keyword still wins
+FORMALITY_MATCHER = KeywordMatcher.from_tables(FORMALITY_KEYWORD_TABLES)
+COMFORT_MATCHER = KeywordMatcher.from_tables([COMFORT_SCORES])
+
+
+def get_temp_range_for_item(category: str, season: str) -> List[int]:
+    """Estimate temperature range for clothing item"""
+    base_range = BASE_TEMP_RANGES.get(category.lower(), [10, 30])
+
+    if season in SEASON_ADJUSTMENTS:
+        adj = SEASON_ADJUSTMENTS[season]
+        base_range = [base_range[0] + adj[0], base_range[1] + adj[1]]
+
+    return list(base_range)
+
+
+def get_formality_score(category: str, name: str) -> int:
+    """Enhanced formality score calculation 1-10"""
+    match = FORMALITY_MATCHER.best_match(f"{name} {category}")
+    return match.payload if match else 5  # Default
+
+
+def get_comfort_score(category: str) -> int:
+    """Estimate comfort score 1-10"""
+    match = COMFORT_MATCHER.best_match(category)
+    return match.payload if match else 7
+
+
+def get_weather_compatibility(category: str) -> List[str]:
+    """Get weather conditions this item is good for"""
+    return list(WEATHER_COMPATIBILITY_MAP.get(category.lower(), ['sunny', 'cloudy']))
+
+
+def compute_item_features(name: str, category: str, season: str) -> Dict:
+    """All derived attributes for one item, in wardrobe_items column form"""
+    temp_range = get_temp_range_for_item(category, season)
+    return {
+        'temp_min': temp_range[0],
+        'temp_max': temp_range[1],
+        'formality_score': get_formality_score(category, name),
+        'comfort_score': get_comfort_score(category),
+        'weather_compatibility': get_weather_compatibility(category),
+        'features_version': FEATURE_RULES_VERSION
+    }
@@ -0,0 +1,110 @@
+# services/keyword_matcher.py
+"""Compiled multi-keyword matcher for the styling rule tables.
+
+A matcher is built once from {keyword: payload} tables into a single regex alternation
+and then finds every keyword occurring anywhere in a text - overlapping ones included -
+in one pass, replacing the per-keyword `keyword in text` scans.
+"""
+import re
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class KeywordMatch(NamedTuple):
+    keyword: str
+    priority: int   # Lower wins: position of the keyword in the rule tables
+    payload: Any
+    start: int
+
+
+class KeywordMatcher:
+    """Single compiled alternation over lowercase keywords.
+
+    The alternation is factored into a trie inside a zero-width lookahead, so each start
+    position yields its longest keyword; every shorter keyword starting at the same
+    position is necessarily a prefix of it and is expanded from a precomputed table.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, Any]]):
+        self._entries: Dict[str, List[Tuple[int, Any]]] = {}
+        for priority, (keyword, payload) in enumerate(entries):
+            keyword = keyword.lower()
+            if keyword:
+                self._entries.setdefault(keyword, []).append((priority, payload))
+
+        self.keywords = list(self._entries)
+        # Keywords (including itself) that are prefixes of each keyword, longest first
+        self._prefixes = {
+            keyword: [other for other in sorted(self.keywords, key=len, reverse=True) if keyword.startswith(other)]
+            for keyword in self.keywords
+        }
+
+        # Highest-priority entry among each keyword's prefixes, for best_match without expansion
+        self._best = {
+            keyword: min(((priority, payload, other) for other in prefixes
+                          for priority, payload in self._entries[other]), key=lambda entry: entry[0])
+            for keyword, prefixes in self._prefixes.items()
+        }
+
+        if self.keywords:
+            self._pattern = re.compile(f"(?=({self._trie_regex(self.keywords)}))")
+        else:
+            self._pattern = None
+
+    @staticmethod
+    def _trie_regex(keywords: List[str]) -> str:
+        """Alternation factored into a character trie; greedy optional tails prefer the longest keyword"""
+        trie = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = {}
+
+        def build(node) -> str:
+            terminal = '' in node
+            branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ''
+            body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+            if terminal:
+                return f"(?:{body})?"
+            return body
+
+        return build(trie)
+
+    @classmethod
+    def from_tables(cls, tables: Iterable) -> 'KeywordMatcher':
+        """Build from ordered dicts ({keyword: payload}) or lists of keywords"""
+        entries = []
+        for table in tables:
+            if isinstance(table, dict):
+                entries.extend(table.items())
+            else:
+                entries.extend((keyword, None) for keyword in table)
+        return cls(entries)
+
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        """Every keyword occurrence in text, ordered by start position"""
+        if self._pattern is None:
+            return []
+        matches = []
+        for found in self._pattern.finditer(text.lower()):
+            start = found.start()
+            for keyword in self._prefixes[found.group(1)]:
+                for priority, payload in self._entries[keyword]:
+                    matches.append(KeywordMatch(keyword, priority, payload, start))
+        return matches
+
+    def best_match(self, text: str) -> Optional[KeywordMatch]:
+        """Highest-priority (earliest-listed) keyword occurring in text"""
+        if self._pattern is None:
+            return None
+        best = None
+        for found in self._pattern.finditer(text.lower()):
+            priority, payload, keyword = self._best[found.group(1)]
+            if best is None or priority < best.priority:
+                best = KeywordMatch(keyword, priority, payload, found.start())
+        return best
+
+    def matches_any(self, text: str) -> bool:
+        return self._pattern is not None and self._pattern.search(text.lower()) is not None
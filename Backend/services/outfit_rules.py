@@ -0,0 +1,124 @@
+# services/outfit_rules.py
+"""Static styling rule tables shared by the outfit service, scoring engine and wardrobe writes"""
+from typing import Dict, List
+
+
+def create_weather_compatibility_matrix() -> Dict:
+    """Weather compatibility scoring matrix"""
+    return {
+        'temperature_ranges': {
+            'very_cold': (-20, 5),
+            'cold': (5, 15),
+            'cool': (15, 22),
+            'mild': (22, 28),
+            'warm': (28, 35),
+            'hot': (35, 50)
+        },
+        'category_weather_scores': {
+            'tops': {
+                'very_cold': {'sweater': 9, 'hoodie': 8, 'long_sleeve': 7, 't_shirt': 2},
+                'cold': {'sweater': 8, 'hoodie': 9, 'long_sleeve': 8, 't_shirt': 3},
+                'cool': {'hoodie': 7, 'long_sleeve': 8, 'light_sweater': 8, 't_shirt': 6},
+                'mild': {'t_shirt': 9, 'blouse': 8, 'light_sweater': 6, 'tank_top': 7},
+                'warm': {'t_shirt': 8, 'tank_top': 9, 'blouse': 7, 'light_shirt': 8},
+                'hot': {'tank_top': 10, 'light_shirt': 8, 't_shirt': 6, 'sleeveless': 9}
+            }
+        }
+    }
+
+
+def create_color_harmony_rules() -> Dict:
+    """Color harmony and compatibility rules"""
+    return {
+        'complementary_pairs': [
+            ('blue', 'orange'), ('red', 'green'), ('purple', 'yellow'),
+            ('navy', 'cream'), ('black', 'white'), ('gray', 'pink')
+        ],
+        'neutral_colors': ['black', 'white', 'gray', 'beige', 'cream', 'navy', 'brown'],
+        'warm_colors': ['red', 'orange', 'yellow', 'pink', 'coral', 'burgundy'],
+        'cool_colors': ['blue', 'green', 'purple', 'teal', 'navy', 'turquoise']
+    }
+
+
+def create_outfit_rules() -> Dict:
+    """Enhanced outfit combination rules with occasion-specific guidelines"""
+    return {
+        'occasion_formality': {
+            'casual': (1, 4),
+            'work': (5, 7),
+            'business': (5, 7),
+            'formal': (8, 10),
+            'workout': (1, 3),
+            'date': (6, 9),
+            'datenight': (6, 9),
+            # Party outfits should be dressy but allow statement/shiny pieces
+            'party': (6, 9)
+        },
+        'occasion_specific_rules': {
+            'casual': {
+                'preferred_categories': ['tops', 'bottoms', 'shoes'],
+                'preferred_items': ['t-shirt', 'jeans', 'sneakers', 'hoodie', 'shorts'],
+                'color_preferences': ['blue', 'white', 'gray', 'black'],
+                'avoid_items': ['suit', 'blazer', 'formal dress', 'heels']
+            },
+            'work': {
+                'preferred_categories': ['tops', 'bottoms', 'shoes', 'outerwear'],
+                'preferred_items': ['button shirt', 'blouse', 'dress pants', 'blazer', 'dress shoes'],
+                'color_preferences': ['navy', 'black', 'white', 'gray', 'brown'],
+                'avoid_items': ['tank top', 'shorts', 'sneakers', 'flip-flops']
+            },
+            'datenight': {
+                'preferred_categories': ['dresses', 'tops', 'bottoms', 'shoes', 'accessories'],
+                'preferred_items': ['dress', 'frock', 'nice top', 'blouse', 'crop top', 'denim', 'jeans', 'cute pants', 'heels', 'flats', 'boots'],
+                'color_preferences': ['red', 'black', 'blue', 'white', 'pink', 'burgundy', 'navy'],
+                'avoid_items': ['workout', 'athletic', 'gym clothes', 'office trousers', 'formal pants', 'dress pants', 'blazer', 'business shirt']
+            },
+            'party': {
+                'preferred_categories': ['dresses', 'tops', 'bottoms', 'shoes', 'accessories'],
+                'preferred_items': ['sequined dress', 'sequin top', 'metallic top', 'leather jacket', 'statement dress', 'sparkly top', 'sequin skirt', 'glitter top', 'lamé dress', 'shiny blouse', 'bold accessories', 'heels', 'boots'],
+                'color_preferences': ['gold', 'silver', 'black', 'red', 'burgundy', 'navy', 'metallic'],
+                'avoid_items': ['plain activewear', 'workout clothes', 'very casual lounge wear']
+            },
+            'formal': {
+                'preferred_categories': ['tops', 'bottoms', 'shoes', 'accessories'],
+                'preferred_items': ['dress shirt', 'suit', 'dress', 'formal dress', 'dress shoes', 'heels'],
+                'color_preferences': ['black', 'navy', 'white', 'gray'],
+                'avoid_items': ['t-shirt', 'jeans', 'sneakers', 'shorts']
+            },
+            'workout': {
+                'preferred_categories': ['tops', 'bottoms', 'shoes'],
+                'preferred_items': ['athletic', 'gym', 'sports', 'workout', 'running', 'yoga'],
+                'color_preferences': ['black', 'gray', 'blue', 'white'],
+                'avoid_items': ['dress', 'suit', 'formal', 'heels']
+            }
+        }
+    }
+
+
+def extract_weather_conditions(weather_data: Dict) -> List[str]:
+    """Extract weather conditions from weather data"""
+    conditions = []
+    temp = weather_data.get('temperature', 20)
+    condition = weather_data.get('condition', '').lower()
+    
+    if temp < 5:
+        conditions.append('very_cold')
+    elif temp < 15:
+        conditions.append('cold')
+    elif temp < 22:
+        conditions.append('cool')
+    elif temp < 28:
+        conditions.append('mild')
+    elif temp < 35:
+        conditions.append('warm')
+    else:
+        conditions.append('hot')
+    
+    if 'sun' in condition or 'clear' in condition:
+        conditions.append('sunny')
+    elif 'cloud' in condition:
+        conditions.append('cloudy')
+    elif 'rain' in condition:
+        conditions.append('rainy')
+    
+    return conditions
@@ -0,0 +1,340 @@
+# services/outfit_scoring_engine.py
+import logging
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from services.keyword_matcher import KeywordMatcher
+
+logger = logging.getLogger(__name__)
+
+SHINY_NAME_KEYWORDS = ['sequin', 'sequined', 'metallic', 'glitter', 'sparkle', 'sparkly', 'lamé', 'lame', 'shiny']
+SHINY_COLOR_KEYWORDS = ['gold', 'silver', 'metallic']
+SHINY_NAME_MATCHER = KeywordMatcher.from_tables([SHINY_NAME_KEYWORDS])
+SHINY_COLOR_MATCHER = KeywordMatcher.from_tables([SHINY_COLOR_KEYWORDS])
+
+# Every condition name that can appear in item compatibility lists or extracted weather
+WEATHER_CONDITION_BITS = {
+    condition: 1 << bit for bit, condition in enumerate([
+        'very_cold', 'cold', 'cool', 'mild', 'warm', 'hot',
+        'sunny', 'cloudy', 'rainy', 'windy', 'casual'
+    ])
+}
+
+# Wear-recency decay: a wear costs up to FRESHNESS_PENALTY points, halving every half-life
+FRESHNESS_PENALTY = 20.0
+FRESHNESS_HALF_LIFE_SECONDS = 2 * 24 * 3600
+EPOCH = datetime(1970, 1, 1)
+
+
+def parse_last_worn(value) -> Optional[datetime]:
+    """Accept datetime or ISO string (as produced by get_user_wardrobe_items)"""
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def to_epoch(value: Optional[datetime]) -> float:
+    """Naive datetime -> seconds since epoch (NaN when missing)"""
+    if value is None:
+        return np.nan
+    return (value.replace(tzinfo=None) - EPOCH).total_seconds()
+
+
+def freshness_penalty(wear_epochs: np.ndarray, now_epoch: float) -> np.ndarray:
+    """Decayed wear count over the last axis (NaN = no wear), capped at FRESHNESS_PENALTY"""
+    ages = np.maximum(now_epoch - wear_epochs, 0.0)
+    decay = np.where(np.isnan(ages), 0.0, np.exp2(-ages / FRESHNESS_HALF_LIFE_SECONDS))
+    return FRESHNESS_PENALTY * np.minimum(decay.sum(axis=-1), 1.0)
+
+
+def is_party_shine(item: Dict) -> bool:
+    return (SHINY_NAME_MATCHER.matches_any(str(item.get('name', ''))) or
+            SHINY_COLOR_MATCHER.matches_any(str(item.get('color', ''))))
+
+
+def build_avoid_matcher(outfit_rules: Dict) -> KeywordMatcher:
+    """One automaton over every occasion's avoid_items, payload is the occasion"""
+    entries = []
+    for occasion, rules in outfit_rules.get('occasion_specific_rules', {}).items():
+        entries.extend((keyword, occasion) for keyword in rules.get('avoid_items', []))
+    return KeywordMatcher(entries)
+
+
+def top_k_indices(scores: np.ndarray, k: int, indices: Optional[np.ndarray] = None) -> np.ndarray:
+    """The k best-scoring indices, best first, without sorting everything.
+
+    Ties keep their order in `indices` (same result as a stable full sort), so
+    partial selection never changes which items are recommended.
+    """
+    indices = np.arange(len(scores)) if indices is None else np.asarray(indices, dtype=np.int64)
+    values = scores[indices]
+    n = len(indices)
+    if k <= 0 or n == 0:
+        return indices[:0]
+    if k < n:
+        kth = np.partition(values, n - k)[n - k]
+        above = np.flatnonzero(values > kth)
+        ties = np.flatnonzero(values == kth)[:k - len(above)]
+        chosen = np.sort(np.concatenate([above, ties]))
+    else:
+        chosen = np.arange(n)
+    return indices[chosen[np.argsort(-values[chosen], kind='stable')]]
+
+
+def weather_mask(conditions) -> int:
+    mask = 0
+    for condition in conditions:
+        mask |= WEATHER_CONDITION_BITS.get(condition, 0)
+    return mask
+
+
+class FeaturizedWardrobe:
+    """Columnar NumPy view of a user's wardrobe, built once and shared by every occasion"""
+
+    def __init__(self, items: List[Dict], avoid_matcher: Optional[KeywordMatcher] = None):
+        self.items = items
+        self.categories = [str(item.get('category', '')).lower() for item in items]
+        self.temp_min = np.array([item['temp_range'][0] for item in items], dtype=np.float64)
+        self.temp_max = np.array([item['temp_range'][1] for item in items], dtype=np.float64)
+        self.formality = np.array([item['formality_score'] for item in items], dtype=np.float64)
+        self.weather_bits = np.array([weather_mask(item['weather_compatibility']) for item in items], dtype=np.int64)
+        self.party_shine = np.array([is_party_shine(item) for item in items], dtype=bool)
+        self.last_worn = np.array([to_epoch(parse_last_worn(item.get('last_worn'))) for item in items],
+                                  dtype=np.float64)
+        # (n, k) wear epochs from outfit_history, attached by the recency index when available
+        self.wear_times: Optional[np.ndarray] = None
+        # Occasions whose avoid_items match the item's name/category
+        self.avoided_occasions = [
+            frozenset(match.payload for match in avoid_matcher.find_all(f"{item.get('name', '')} {category}"))
+            if avoid_matcher else frozenset()
+            for item, category in zip(items, self.categories)
+        ]
+
+    def __len__(self):
+        return len(self.items)
+
+    def category_indices(self, category: str) -> np.ndarray:
+        """Indices of items in a (lowercase) category, from a lazily built index"""
+        index = getattr(self, '_category_index', None)
+        if index is None:
+            buckets = {}
+            for position, item_category in enumerate(self.categories):
+                buckets.setdefault(item_category, []).append(position)
+            index = {key: np.array(positions, dtype=np.int64) for key, positions in buckets.items()}
+            self._category_index = index
+        return index.get(category.lower(), np.zeros(0, dtype=np.int64))
+
+    def index_of(self, item_id) -> Optional[int]:
+        """Position of an item id (string ids from JSON clients are accepted)"""
+        positions = getattr(self, '_id_index', None)
+        if positions is None:
+            positions = {str(item.get('id')): position for position, item in enumerate(self.items)}
+            self._id_index = positions
+        return positions.get(str(item_id))
+
+    def wear_epochs(self) -> np.ndarray:
+        """Wear history per item; items without recorded wears fall back to last_worn"""
+        if self.wear_times is None:
+            return self.last_worn[:, None]
+        wears = self.wear_times.copy()
+        no_history = np.isnan(wears).all(axis=1)
+        wears[no_history, 0] = self.last_worn[no_history]
+        return wears
+
+    def avoid_mask(self, occasion: str) -> np.ndarray:
+        """Boolean array: item matches one of the occasion's avoid_items"""
+        return np.array([occasion in avoided for avoided in self.avoided_occasions], dtype=bool)
+
+
+class WeatherPartials:
+    """Occasion-independent score components for one weather context"""
+
+    def __init__(self, temp_scores: np.ndarray, weather_scores: np.ndarray):
+        self.temp_scores = temp_scores
+        self.weather_scores = weather_scores
+
+
+class OutfitScoringEngine:
+    """Vectorized item scoring for every occasion in one pass.
+
+    score_occasions() produces exactly the values of the scalar score_item(), which
+    backs AIEnhancedOutfitService.calculate_item_compatibility_score. Temperature and
+    weather-condition components depend only on the weather, so they are computed once
+    per request; formality/party/freshness terms are broadcast over occasions.
+    """
+
+    def __init__(self, outfit_rules: Dict, extract_weather_conditions):
+        self.outfit_rules = outfit_rules
+        self.extract_weather_conditions = extract_weather_conditions
+        self.avoid_matcher = build_avoid_matcher(outfit_rules)
+
+    def featurize(self, items: List[Dict]) -> FeaturizedWardrobe:
+        return FeaturizedWardrobe(items, self.avoid_matcher)
+
+    def weather_key(self, weather_data: Dict) -> Tuple:
+        """Exactly the weather inputs the partials depend on, for memoizing score rows"""
+        return weather_data.get('temperature', 20), tuple(self.extract_weather_conditions(weather_data))
+
+    def weather_partials(self, wardrobe: FeaturizedWardrobe, weather_data: Dict) -> WeatherPartials:
+        """Temperature and condition scores for every item (computed once per weather)"""
+        return WeatherPartials(
+            self._temp_scores(wardrobe, weather_data.get('temperature', 20)),
+            self._condition_scores(wardrobe, self.extract_weather_conditions(weather_data))
+        )
+
+    def weather_partials_batch(self, wardrobe: FeaturizedWardrobe, weathers: List[Dict]) -> WeatherPartials:
+        """Partials for several weather contexts at once, as (len(weathers), len(wardrobe)) arrays"""
+        temps = np.array([weather_data.get('temperature', 20) for weather_data in weathers], dtype=np.float64)
+        return WeatherPartials(
+            self._temp_scores(wardrobe, temps[:, None]),
+            np.stack([self._condition_scores(wardrobe, self.extract_weather_conditions(weather_data))
+                      for weather_data in weathers])
+        )
+
+    def _temp_scores(self, wardrobe: FeaturizedWardrobe, temp) -> np.ndarray:
+        """Temperature component; temp may be a scalar or a column of temperatures"""
+        in_range = (wardrobe.temp_min <= temp) & (temp <= wardrobe.temp_max)
+        near_optimal = np.abs(temp - (wardrobe.temp_min + wardrobe.temp_max) / 2) <= 3
+        distance = np.minimum(np.abs(temp - wardrobe.temp_min), np.abs(temp - wardrobe.temp_max))
+        temp_scores = np.where(
+            in_range,
+            np.where(near_optimal, 40.0, 35.0),
+            np.maximum(0, 35.0 - (distance * 2))
+        )
+        return temp_scores
+
+    def _condition_scores(self, wardrobe: FeaturizedWardrobe, conditions: List[str]) -> np.ndarray:
+        # Sequential adds keep float results identical to the scalar loop
+        weather_scores = np.zeros(len(wardrobe))
+        for condition in conditions:
+            matched = (wardrobe.weather_bits & WEATHER_CONDITION_BITS.get(condition, 0)) != 0
+            weather_scores = weather_scores + np.where(matched, 15.0 / len(conditions), 0.0)
+        return np.minimum(weather_scores, 15.0)
+
+    def score_occasions(self, wardrobe: FeaturizedWardrobe, partials: WeatherPartials,
+                        occasions: List[str], now: Optional[datetime] = None) -> np.ndarray:
+        """Score matrix of shape (len(occasions), len(wardrobe))"""
+        occasion_scores, party_bonus, freshness = self._occasion_terms(wardrobe, occasions, now)
+        return self._combine(partials.temp_scores[None, :], partials.weather_scores[None, :],
+                             occasion_scores, party_bonus, freshness)
+
+    def score_weathers(self, wardrobe: FeaturizedWardrobe, partials: WeatherPartials,
+                       occasion: str, now: Optional[datetime] = None) -> np.ndarray:
+        """Score matrix of shape (len(weathers), len(wardrobe)) for one occasion (batched partials)"""
+        occasion_scores, party_bonus, freshness = self._occasion_terms(wardrobe, [occasion], now)
+        return self._combine(partials.temp_scores, partials.weather_scores, occasion_scores, party_bonus, freshness)
+
+    @staticmethod
+    def _combine(temp_scores, weather_scores, occasion_scores, party_bonus, freshness) -> np.ndarray:
+        # Same addition order as score_item(), so every path produces identical floats
+        scores = temp_scores + occasion_scores
+        scores = scores + weather_scores
+        scores = scores + 15.0
+        scores = scores + party_bonus
+        scores = scores - freshness
+        return np.minimum(scores, 100.0)
+
+    def _occasion_terms(self, wardrobe: FeaturizedWardrobe, occasions: List[str], now: Optional[datetime]):
+        """Weather-independent (occasion formality, party bonus, freshness) terms"""
+        now_epoch = to_epoch(now or datetime.now())
+        ranges = [self.outfit_rules['occasion_formality'].get(occasion, (1, 10)) for occasion in occasions]
+        low = np.array([r[0] for r in ranges], dtype=np.float64)[:, None]
+        high = np.array([r[1] for r in ranges], dtype=np.float64)[:, None]
+        formality = wardrobe.formality[None, :]
+
+        occasion_scores = np.where(
+            (low <= formality) & (formality <= high),
+            35.0,
+            np.maximum(0, 35.0 - np.where(formality < low, low - formality, formality - high) * 4)
+        )
+
+        is_party = np.array([occasion == 'party' for occasion in occasions])[:, None]
+        party_bonus = np.where(is_party & wardrobe.party_shine[None, :], 10.0, 0.0)
+        freshness = freshness_penalty(wardrobe.wear_epochs(), now_epoch)[None, :]
+        return occasion_scores, party_bonus, freshness
+
+    def score_items(self, items: List[Dict], weather_data: Dict, occasion: str) -> np.ndarray:
+        """Convenience wrapper: featurize and score a list of items for one occasion"""
+        if not items:
+            return np.zeros(0)
+        wardrobe = self.featurize(items)
+        partials = self.weather_partials(wardrobe, weather_data)
+        return self.score_occasions(wardrobe, partials, [occasion])[0]
+
+    def score_item(self, item: Dict, weather_data: Dict, occasion: str, now: Optional[datetime] = None,
+                   wear_times: Optional[List[float]] = None) -> float:
+        """Scalar reference implementation for a single item (wear_times: epochs from outfit_history)"""
+        score = 0.0
+
+        # Temperature compatibility (35% weight)
+        temp = weather_data.get('temperature', 20)
+        temp_min, temp_max = item['temp_range']
+        if temp_min <= temp <= temp_max:
+            temp_score = 35.0
+            optimal_temp = (temp_min + temp_max) / 2
+            temp_distance = abs(temp - optimal_temp)
+            if temp_distance <= 3:
+                temp_score += 5.0
+        else:
+            temp_distance = min(abs(temp - temp_min), abs(temp - temp_max))
+            temp_score = max(0, 35.0 - (temp_distance * 2))
+
+        score += temp_score
+
+        # Occasion matching (35% weight)
+        occasion_formality_range = self.outfit_rules['occasion_formality'].get(occasion, (1, 10))
+        item_formality = item['formality_score']
+
+        if occasion_formality_range[0] <= item_formality <= occasion_formality_range[1]:
+            occasion_score = 35.0
+        else:
+            if item_formality < occasion_formality_range[0]:
+                penalty = (occasion_formality_range[0] - item_formality) * 4
+            else:
+                penalty = (item_formality - occasion_formality_range[1]) * 4
+            occasion_score = max(0, 35.0 - penalty)
+
+        score += max(occasion_score, 0)
+
+        # Weather condition compatibility (15% weight)
+        weather_conditions = self.extract_weather_conditions(weather_data)
+        weather_score = 0
+        for condition in weather_conditions:
+            if condition in item['weather_compatibility']:
+                weather_score += 15.0 / len(weather_conditions)
+
+        score += min(weather_score, 15.0)
+
+        # Color and comfort (15% weight)
+        score += 15.0
+
+        # Party occasion: boost shiny/metallic/sequin items to favor party looks
+        try:
+            if occasion == 'party' and is_party_shine(item):
+                score += 10.0
+        except Exception:
+            # In case item fields are missing or unexpected, ignore party bonus
+            pass
+
+        # Decaying penalty for recent wears to avoid repeats
+        if not wear_times:
+            wear_times = [to_epoch(parse_last_worn(item.get('last_worn')))]
+        score -= float(freshness_penalty(np.array(wear_times, dtype=np.float64), to_epoch(now or datetime.now())))
+
+        return min(score, 100.0)
+
+    def top_k(self, scores: np.ndarray, k: int, indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """Shared ranking primitive for the outfit composer, regenerate and batch paths"""
+        return top_k_indices(scores, k, indices)
+
+    def top_by_category(self, wardrobe: FeaturizedWardrobe, scores: np.ndarray,
+                        k: int) -> Dict[str, List[Tuple[Dict, float]]]:
+        """Best k (item, score) pairs per lowercase category, best first"""
+        top_items = {}
+        for category in set(wardrobe.categories):
+            best = self.top_k(scores, k, wardrobe.category_indices(category))
+            top_items[category] = [(wardrobe.items[index], float(scores[index])) for index in best]
+        return top_items
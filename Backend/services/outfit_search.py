@@ -0,0 +1,305 @@
+# services/outfit_search.py
+import time
+import heapq
+import logging
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+from services.keyword_matcher import KeywordMatcher
+from services.outfit_scoring_engine import top_k_indices
+
+logger = logging.getLogger(__name__)
+
+# Category variants accepted for each outfit slot (matches frontend category names)
+SLOT_CATEGORIES = {
+    'dress': ['dress', 'dresses', 'frock', 'formal dress', 'sequin dress', 'sequined dress'],
+    'tops': ['tops', 'top', 'shirts', 'shirt', 't-shirts', 't-shirt', 'blouses', 'blouse', 'jersey'],
+    'bottoms': ['bottoms', 'bottom', 'pants', 'pant', 'jeans', 'shorts', 'skirt', 'skirts'],
+    'shoes': ['shoes', 'shoe', 'sneakers', 'boots', 'sandals', 'flip-flops', 'loafers',
+              'espadrilles', 'moccasins', 'heels'],
+    'outerwear': ['outerwear']
+}
+
+CATEGORY_TO_SLOT = {
+    category: slot for slot, categories in SLOT_CATEGORIES.items() for category in categories
+}
+
+# Categories an occasion prefers within a slot, used whenever the wardrobe has any
+PREFERRED_CATEGORIES = {
+    'party': {'shoes': {'heels'}}
+}
+
+
+class OutfitCandidate:
+    """One complete outfit found by the search (indices into the featurized wardrobe)"""
+
+    __slots__ = ('indices', 'item_scores', 'pair_score', 'score')
+
+    def __init__(self, indices: Sequence[int], item_scores: Sequence[float], pair_score: float, score: float):
+        self.indices = tuple(indices)
+        self.item_scores = list(item_scores)
+        self.pair_score = pair_score
+        self.score = score
+
+    @property
+    def confidence(self) -> int:
+        return int(sum(self.item_scores) / len(self.item_scores)) if self.item_scores else 50
+
+
+# Season overlap term for pairwise compatibility ('all' overlaps every season)
+SEASON_BITS = {'spring': 1, 'summer': 2, 'fall': 4, 'winter': 8}
+ALL_SEASONS = 15
+
+
+def season_mask(season) -> int:
+    return SEASON_BITS.get(str(season or 'all').lower(), ALL_SEASONS)
+
+
+class PairFeatures:
+    """Per-item inputs of the pairwise score (palette color code, formality, season mask)"""
+
+    __slots__ = ('colors', 'formality', 'seasons')
+
+    def __init__(self, colors: np.ndarray, formality: np.ndarray, seasons: np.ndarray):
+        self.colors = np.asarray(colors, dtype=np.int64)
+        self.formality = np.asarray(formality, dtype=np.float64)
+        self.seasons = np.asarray(seasons, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.colors)
+
+    def take(self, positions) -> 'PairFeatures':
+        return PairFeatures(self.colors[positions], self.formality[positions], self.seasons[positions])
+
+    def concat(self, other: 'PairFeatures') -> 'PairFeatures':
+        return PairFeatures(np.concatenate([self.colors, other.colors]),
+                            np.concatenate([self.formality, other.formality]),
+                            np.concatenate([self.seasons, other.seasons]))
+
+
+class PairwiseScorer:
+    """Pairwise item compatibility: color harmony, formality spread and season overlap, roughly in [-2, 1.25]"""
+
+    def __init__(self, color_harmony_rules: Dict):
+        neutrals = set(color_harmony_rules.get('neutral_colors', []))
+        warm = set(color_harmony_rules.get('warm_colors', []))
+        cool = set(color_harmony_rules.get('cool_colors', []))
+        complementary = color_harmony_rules.get('complementary_pairs', [])
+
+        palette = []
+        for color in list(neutrals) + list(warm) + list(cool) + [c for pair in complementary for c in pair]:
+            if color not in palette:
+                palette.append(color)
+        self.palette = palette
+        self.color_matcher = KeywordMatcher((color, code) for code, color in enumerate(palette))
+
+        # Palette-level harmony table; the extra last row/column is "unknown color"
+        size = len(palette) + 1
+        table = np.zeros((size, size), dtype=np.float64)
+        complementary_set = {frozenset(pair) for pair in complementary}
+        for i, a in enumerate(palette):
+            for j, b in enumerate(palette):
+                if frozenset((a, b)) in complementary_set:
+                    table[i, j] = 1.0
+                elif a in neutrals or b in neutrals:
+                    table[i, j] = 0.5
+                elif a == b or (a in warm and b in warm) or (a in cool and b in cool):
+                    table[i, j] = 0.25
+                elif (a in warm and b in cool) or (a in cool and b in warm):
+                    table[i, j] = -0.5
+        self.harmony_table = table
+        self.unknown_code = len(palette)
+
+    def color_code(self, color: str) -> int:
+        """Palette index of the first known color word in the item's color text"""
+        matches = self.color_matcher.find_all(color or '')
+        if not matches:
+            return self.unknown_code
+        return min(matches, key=lambda match: match.start).payload
+
+    def item_features(self, items: List[Dict]) -> PairFeatures:
+        """Pair-score inputs for raw item dicts (id, color, formality_score, season)"""
+        return PairFeatures(
+            [self.color_code(str(item.get('color') or '')) for item in items],
+            [item.get('formality_score', 5) for item in items],
+            [season_mask(item.get('season')) for item in items]
+        )
+
+    def pair_scores(self, a: PairFeatures, b: PairFeatures) -> np.ndarray:
+        """Score matrix of shape (len(a), len(b))"""
+        color_scores = self.harmony_table[a.colors[:, None], b.colors[None, :]]
+        formality_gap = np.abs(a.formality[:, None] - b.formality[None, :]) / 9.0
+        season_overlap = np.where((a.seasons[:, None] & b.seasons[None, :]) != 0, 0.25, -0.25)
+        return color_scores - formality_gap + season_overlap
+
+    def color_codes(self, wardrobe, indices: np.ndarray) -> np.ndarray:
+        """Palette codes for the given items, resolved lazily and memoized on the wardrobe"""
+        codes = getattr(wardrobe, '_color_codes', None)
+        if codes is None:
+            codes = np.full(len(wardrobe), -1, dtype=np.int64)
+            wardrobe._color_codes = codes
+        for index in indices[codes[indices] < 0]:
+            codes[index] = self.color_code(str(wardrobe.items[index].get('color') or ''))
+        return codes[indices]
+
+    def matrix(self, wardrobe, indices: np.ndarray) -> np.ndarray:
+        """Symmetric pair-score matrix among the given wardrobe indices.
+
+        Uses the user's precomputed compatibility matrix when one is attached to the
+        featurized wardrobe, otherwise scores the pairs on the fly.
+        """
+        compatibility = getattr(wardrobe, 'compatibility', None)
+        if compatibility is not None:
+            return compatibility.dense(wardrobe.compatibility_positions[indices])
+        features = PairFeatures(
+            self.color_codes(wardrobe, indices),
+            wardrobe.formality[indices],
+            [season_mask(wardrobe.items[index].get('season')) for index in indices]
+        )
+        return self.pair_scores(features, features)
+
+
+class OutfitSearchEngine:
+    """Beam search over slot combinations (top x bottom x shoes x optional outerwear, or dress x shoes).
+
+    Per-slot candidates are pruned to the best-scoring items, partial outfits are ranked by
+    mean item score plus weighted mean pairwise compatibility, and the beam collapses to
+    greedy once the time budget is spent so large wardrobes stay bounded.
+    """
+
+    def __init__(self, pairwise_scorer: PairwiseScorer, beam_width: int = 20,
+                 candidates_per_slot: int = 12, pair_weight: float = 10.0, time_budget_ms: float = 50.0):
+        self.pairwise_scorer = pairwise_scorer
+        self.beam_width = beam_width
+        self.candidates_per_slot = candidates_per_slot
+        self.pair_weight = pair_weight
+        self.time_budget = time_budget_ms / 1000.0
+
+    def slot_indices(self, wardrobe) -> Dict[str, np.ndarray]:
+        """Wardrobe indices per outfit slot, cached on the featurized wardrobe"""
+        slots = getattr(wardrobe, '_slot_indices', None)
+        if slots is None:
+            buckets = {slot: [] for slot in SLOT_CATEGORIES}
+            for index, category in enumerate(wardrobe.categories):
+                slot = CATEGORY_TO_SLOT.get(category)
+                if slot:
+                    buckets[slot].append(index)
+            slots = {slot: np.array(indices, dtype=np.int64) for slot, indices in buckets.items()}
+            wardrobe._slot_indices = slots
+        return slots
+
+    def templates(self, slots: Dict[str, np.ndarray], occasion: str, weather_data: Dict) -> List[List[str]]:
+        """Slot lists to search for this occasion and weather"""
+        temp = weather_data.get('temperature', 20)
+        wants_outerwear = temp < 15 or 'rain' in str(weather_data.get('condition', '')).lower()
+        accessories = ['shoes'] + (['outerwear'] if wants_outerwear else [])
+
+        separates = ['tops', 'bottoms'] + accessories
+        dress = ['dress'] + accessories
+        has_dress = len(slots['dress']) > 0
+
+        if occasion == 'party' and has_dress:
+            # Party looks prefer a single statement piece
+            candidates = [dress]
+        else:
+            candidates = [separates]
+
+        templates = []
+        for template in candidates:
+            present = [slot for slot in template if len(slots[slot]) > 0]
+            if present:
+                templates.append(present)
+        return templates
+
+    @staticmethod
+    def preferred_masks(wardrobe, occasion: str) -> Dict[str, np.ndarray]:
+        """Per slot, a boolean mask of the items in the occasion's preferred categories"""
+        return {
+            slot: np.array([category in categories for category in wardrobe.categories], dtype=bool)
+            for slot, categories in PREFERRED_CATEGORIES.get(occasion, {}).items()
+        }
+
+    def _slot_candidates(self, indices: np.ndarray, scores: np.ndarray, avoid: Optional[np.ndarray],
+                         exclude: Optional[np.ndarray] = None, prefer: Optional[np.ndarray] = None) -> np.ndarray:
+        """Best-scoring items for one slot.
+
+        Excluded and avoided items are skipped and only preferred items kept, each
+        step applied only when it leaves something to choose from.
+        """
+        for mask, keep in ((exclude, False), (avoid, False), (prefer, True)):
+            if mask is not None:
+                allowed = indices[mask[indices] == keep]
+                if len(allowed):
+                    indices = allowed
+        # Best-first, ties in wardrobe order
+        return top_k_indices(scores, self.candidates_per_slot, indices)
+
+    def search(self, wardrobe, scores: np.ndarray, occasion: str, weather_data: Dict,
+               top_k: int = 3, exclude: Optional[np.ndarray] = None) -> List[OutfitCandidate]:
+        """Top-K diverse outfits for one occasion (exclude: boolean mask of items to leave out if possible)"""
+        started = time.perf_counter()
+        slots = self.slot_indices(wardrobe)
+        avoid = wardrobe.avoid_mask(occasion) if hasattr(wardrobe, 'avoid_mask') else None
+        preferred = self.preferred_masks(wardrobe, occasion)
+
+        complete = []
+        for template in self.templates(slots, occasion, weather_data):
+            slot_candidates = [self._slot_candidates(slots[slot], scores, avoid, exclude, preferred.get(slot))
+                               for slot in template]
+            union = np.unique(np.concatenate(slot_candidates))
+            position = {int(index): pos for pos, index in enumerate(union)}
+            pair_matrix = self.pairwise_scorer.matrix(wardrobe, union)
+
+            # Beam entries: (positions in union, item score sum, pair score sum)
+            beam = [((), 0.0, 0.0)]
+            for candidates in slot_candidates:
+                # Keep at least top_k partial outfits so wide (variation) requests can be filled
+                width = max(self.beam_width, top_k) if time.perf_counter() - started < self.time_budget else 1
+                cand_positions = np.array([position[int(i)] for i in candidates], dtype=np.int64)
+                cand_scores = scores[candidates]
+                expanded = []
+                for members, item_sum, pair_sum in beam:
+                    if members:
+                        pair_add = pair_matrix[np.array(members)][:, cand_positions].sum(axis=0)
+                    else:
+                        pair_add = np.zeros(len(candidates))
+                    size = len(members) + 1
+                    pair_count = size * (size - 1) / 2
+                    new_item_sums = item_sum + cand_scores
+                    new_pair_sums = pair_sum + pair_add
+                    objective = new_item_sums / size
+                    if pair_count:
+                        objective = objective + self.pair_weight * new_pair_sums / pair_count
+                    for j in range(len(candidates)):
+                        expanded.append((objective[j], members + (int(cand_positions[j]),),
+                                         float(new_item_sums[j]), float(new_pair_sums[j])))
+                # Partial selection of the beam (nlargest is stable for equal objectives)
+                best = heapq.nlargest(width, expanded, key=lambda entry: entry[0])
+                beam = [(members, item_sum, pair_sum) for _, members, item_sum, pair_sum in best]
+
+            for members, item_sum, pair_sum in beam:
+                indices = [int(union[pos]) for pos in members]
+                size = len(indices)
+                pair_count = size * (size - 1) / 2
+                pair_score = pair_sum / pair_count if pair_count else 0.0
+                score = item_sum / size + self.pair_weight * pair_score
+                complete.append(OutfitCandidate(indices, [float(scores[i]) for i in indices], pair_score, score))
+
+        complete.sort(key=lambda outfit: outfit.score, reverse=True)
+        return self._diverse_top_k(complete, top_k)
+
+    @staticmethod
+    def _diverse_top_k(ranked: List[OutfitCandidate], top_k: int) -> List[OutfitCandidate]:
+        """Prefer outfits sharing at most half their pieces with any already chosen one"""
+        chosen = []
+        for outfit in ranked:
+            if len(chosen) >= top_k:
+                break
+            limit = len(outfit.indices) // 2
+            if all(len(set(outfit.indices) & set(other.indices)) <= limit for other in chosen):
+                chosen.append(outfit)
+        for outfit in ranked:
+            if len(chosen) >= top_k:
+                break
+            if outfit not in chosen:
+                chosen.append(outfit)
+        return chosen
@@ -0,0 +1,79 @@
+# services/recommendation_cache.py
+import os
+import math
+import logging
+from typing import Dict, Hashable, Optional, Tuple
+from services.outfit_rules import extract_weather_conditions
+from utils.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Temperatures within the same bucket produce the same recommendation
+TEMPERATURE_BUCKET = float(os.getenv('RECOMMENDATION_TEMP_BUCKET', 1.0))
+
+
+def temperature_thresholds(temp: float) -> Tuple:
+    """Side of every temperature threshold the recommender branches on.
+
+    Outerwear is added below 15 (outfit search) and the reason text changes at
+    10/25/30; the 5/15/22/28/35 condition bands are covered by the extracted
+    conditions. Integer temperatures are flagged because item ranges have
+    integer bounds checked inclusively.
+    """
+    return temp < 10, temp < 15, temp > 25, temp > 30, temp == math.floor(temp)
+
+
+def weather_bucket(weather_data: Dict) -> Tuple:
+    """Quantized view of the weather fields the recommender actually reads"""
+    temp = weather_data.get('temperature', 20)
+    try:
+        temp = float(temp)
+        # Floor, not round: a bucket never straddles an integer edge
+        temp_bucket = (math.floor(temp / TEMPERATURE_BUCKET) * TEMPERATURE_BUCKET, temperature_thresholds(temp))
+    except (TypeError, ValueError):
+        temp_bucket = None
+    condition = str(weather_data.get('condition', '')).lower()
+    return temp_bucket, tuple(extract_weather_conditions(weather_data)), 'rain' in condition
+
+
+class RecommendationCache:
+    """Finished outfit recommendations keyed by (user, wardrobe version, weather bucket, occasion, seed).
+
+    Wardrobe writes and wear events bump the wardrobe version, so entries for an
+    older wardrobe are never read again and age out through the TTL/LRU bounds.
+    """
+
+    def __init__(self, ttl: float = 900, max_entries: int = 5000, max_bytes: int = 32 * 1024 * 1024):
+        self.entries = LRUCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+
+    @staticmethod
+    def key(user_id: int, version: Optional[int], weather_data: Dict, occasion: str,
+            seed: Optional[Hashable] = None) -> Optional[Tuple]:
+        """Cache key, or None when the request can't be cached"""
+        if version is None:
+            return None
+        return (user_id, version, weather_bucket(weather_data), occasion, seed)
+
+    def get(self, key: Optional[Tuple]) -> Optional[Dict]:
+        if key is None:
+            return None
+        return self.entries.get(key)
+
+    def put(self, key: Optional[Tuple], recommendation: Dict):
+        if key is None or not recommendation or recommendation.get('error'):
+            return
+        self.entries.set(key, recommendation)
+
+    def invalidate(self, user_id: int) -> int:
+        """Drop this process's entries for a user"""
+        return self.entries.delete_where(lambda key: key[0] == user_id)
+
+    def stats(self) -> Dict:
+        return self.entries.stats()
+
+
+# Global instance
+recommendation_cache = RecommendationCache(
+    ttl=float(os.getenv('RECOMMENDATION_CACHE_TTL', 900)),
+    max_bytes=int(os.getenv('RECOMMENDATION_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+)
@@ -0,0 +1,74 @@
+# services/variation_engine.py
+import random
+import logging
+import threading
+from collections import OrderedDict
+from typing import Hashable, Iterable, Optional, Sequence, Tuple
+from utils.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+def outfit_signature(item_ids: Iterable) -> Tuple:
+    """Order-independent identity of an outfit"""
+    return tuple(sorted(str(item_id) for item_id in item_ids))
+
+
+class VariationEngine:
+    """Picks "another outfit" deterministically and without repeats.
+
+    Each (user, occasion) keeps a bounded window of recently served outfit
+    signatures. A variation request walks the ranked search results and returns
+    the best outfit not in the window; near-ties are broken by an RNG seeded with
+    (user, nonce), so retrying the same request returns the same answer.
+    """
+
+    def __init__(self, window: int = 20, max_sessions: int = 20000, tie_tolerance: float = 1.0):
+        self.window = window
+        self.tie_tolerance = tie_tolerance
+        self.sessions = LRUCache(max_entries=max_sessions)
+        self._lock = threading.Lock()
+
+    def served(self, user_id: int, occasion: str) -> 'OrderedDict[Tuple, None]':
+        with self._lock:
+            served = self.sessions.get((user_id, occasion))
+            if served is None:
+                served = OrderedDict()
+                self.sessions.set((user_id, occasion), served)
+            return served
+
+    def mark_served(self, user_id: int, occasion: str, signature: Tuple):
+        served = self.served(user_id, occasion)
+        with self._lock:
+            served.pop(signature, None)
+            served[signature] = None
+            while len(served) > self.window:
+                served.popitem(last=False)
+
+    def choose(self, user_id: int, occasion: str, signatures: Sequence[Tuple], scores: Sequence[float],
+               seed: Optional[Hashable] = None) -> int:
+        """Index of the outfit to serve; signatures/scores are ranked best first"""
+        if not signatures:
+            raise ValueError("No outfits to choose from")
+        served = self.served(user_id, occasion)
+        with self._lock:
+            seen = set(served)
+            order = list(served)
+
+        unseen = [index for index, signature in enumerate(signatures) if signature not in seen]
+        if not unseen:
+            # Everything in the ranked space was served recently: cycle to the least recent one
+            age = {signature: position for position, signature in enumerate(order)}
+            return min(range(len(signatures)), key=lambda index: age.get(signatures[index], -1))
+
+        best = scores[unseen[0]]
+        ties = [index for index in unseen if best - scores[index] <= self.tie_tolerance]
+        rng = random.Random(f"{user_id}:{seed}") if seed is not None else random
+        return rng.choice(ties)
+
+    def stats(self) -> dict:
+        return self.sessions.stats()
+
+
+# Global instance
+variation_engine = VariationEngine()
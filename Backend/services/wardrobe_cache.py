@@ -0,0 +1,139 @@
+# services/wardrobe_cache.py
+import os
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+from utils.lru_cache import LRUCache
+
+try:
+    import redis
+except ImportError:  # Optional shared backend
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class LocalVersionBackend:
+    """Per-process wardrobe version counters (single worker deployments)"""
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get_version(self, user_id: int) -> int:
+        return self._versions.get(user_id, 0)
+
+    def bump_version(self, user_id: int) -> int:
+        with self._lock:
+            version = self._versions.get(user_id, 0) + 1
+            self._versions[user_id] = version
+            return version
+
+
+class RedisVersionBackend:
+    """Wardrobe version counters shared by all workers through Redis"""
+
+    KEY_PREFIX = 'styra:wardrobe_version:'
+
+    def __init__(self, url: str):
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    def get_version(self, user_id: int) -> int:
+        value = self.client.get(f"{self.KEY_PREFIX}{user_id}")
+        return int(value) if value is not None else 0
+
+    def bump_version(self, user_id: int) -> int:
+        return int(self.client.incr(f"{self.KEY_PREFIX}{user_id}"))
+
+
+class WardrobeCache:
+    """In-process cache of formatted wardrobe items keyed by (user_id, wardrobe version).
+
+    Writes bump the user's version counter, so stale entries are never read again
+    and simply age out of the LRU. With a shared version backend every worker
+    sees the bump and misses on its next read.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 10000, backend=None):
+        self.entries = LRUCache(max_entries=max_entries, max_bytes=max_bytes)
+        self.backend = backend or LocalVersionBackend()
+        self._listeners: List[Callable[[int], None]] = []
+
+    def add_invalidation_listener(self, listener: Callable[[int], None]):
+        """Call listener(user_id) whenever a user's wardrobe changes (derived data owners)"""
+        self._listeners.append(listener)
+
+    def get_version(self, user_id: int) -> Optional[int]:
+        """Current wardrobe version, or None when the shared backend is unreachable"""
+        try:
+            return self.backend.get_version(user_id)
+        except Exception as e:
+            logger.warning(f"Wardrobe version lookup failed for user {user_id}: {e}")
+            return None
+
+    def get(self, user_id: int, version: Optional[int]) -> Optional[List[Dict]]:
+        if version is None:
+            return None
+        return self.entries.get((user_id, version))
+
+    def put(self, user_id: int, version: Optional[int], items: List[Dict]):
+        if version is None:
+            return
+        self.entries.set((user_id, version), items)
+
+    def get_features(self, user_id: int, version: Optional[int]):
+        """Featurized (columnar) wardrobe for the same version, if cached"""
+        if version is None:
+            return None
+        return self.entries.get((user_id, version, 'features'))
+
+    def put_features(self, user_id: int, version: Optional[int], features):
+        if version is None:
+            return
+        self.entries.set((user_id, version, 'features'), features)
+
+    def invalidate(self, user_id) -> Optional[int]:
+        """Bump the user's wardrobe version and drop local entries"""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        self.entries.delete_where(lambda key: key[0] == user_id)
+        for listener in self._listeners:
+            try:
+                listener(user_id)
+            except Exception as e:
+                logger.warning(f"Wardrobe invalidation listener failed for user {user_id}: {e}")
+        try:
+            return self.backend.bump_version(user_id)
+        except Exception as e:
+            logger.warning(f"Wardrobe version bump failed for user {user_id}: {e}")
+            return None
+
+    def stats(self) -> Dict:
+        stats = self.entries.stats()
+        stats['backend'] = type(self.backend).__name__
+        return stats
+
+
+def _create_version_backend():
+    """Use Redis for version counters when configured, otherwise stay in-process"""
+    redis_url = os.getenv('WARDROBE_CACHE_REDIS_URL') or os.getenv('REDIS_URL')
+    if redis_url and redis is not None:
+        try:
+            backend = RedisVersionBackend(redis_url)
+            backend.client.ping()
+            logger.info("Wardrobe cache using shared Redis version backend")
+            return backend
+        except Exception as e:
+            logger.warning(f"Redis version backend unavailable, using local counters: {e}")
+    elif redis_url:
+        logger.warning("REDIS_URL set but redis package not installed, using local counters")
+    return LocalVersionBackend()
+
+
+# Global instance
+wardrobe_cache = WardrobeCache(
+    max_bytes=int(os.getenv('WARDROBE_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    backend=_create_version_backend()
+)
@@ -1,12 +1,36 @@
 from datetime import datetime
+import json
 import logging
 from database.connection import db
+from services.wardrobe_cache import wardrobe_cache
+from services.compatibility_matrix import compatibility_service
+from services.item_features import FEATURE_RULES_VERSION, compute_item_features
 
 logger = logging.getLogger(__name__)
 
 class WardrobeService:
     """Service for managing wardrobe items in the database"""
     
+    def __init__(self):
+        self._ensure_feature_columns()
+    
+    def _ensure_feature_columns(self):
+        """Add derived-attribute columns to wardrobe_items if they don't exist"""
+        try:
+            query = """
+            ALTER TABLE wardrobe_items
+                ADD COLUMN IF NOT EXISTS temp_min INTEGER,
+                ADD COLUMN IF NOT EXISTS temp_max INTEGER,
+                ADD COLUMN IF NOT EXISTS formality_score INTEGER,
+                ADD COLUMN IF NOT EXISTS comfort_score INTEGER,
+                ADD COLUMN IF NOT EXISTS weather_compatibility JSONB,
+                ADD COLUMN IF NOT EXISTS features_version INTEGER
+            """
+            db.execute_query(query)
+            logger.info("Wardrobe feature columns created or confirmed to exist")
+        except Exception as e:
+            logger.error(f"Error ensuring wardrobe feature columns: {e}")
+    
     def save_wardrobe_item(self, item_data):
         """Save a wardrobe item to the database"""
         try:
@@ -42,17 +66,25 @@ class WardrobeService:
             # Remove any fields that might cause issues
             # Don't pass occasion to database if it doesn't have an occasion column
             
+            # Derived scoring attributes are computed once here instead of on every read
+            features = compute_item_features(name, category, season)
+            
             # Prepare the INSERT query
             query = """
             INSERT INTO wardrobe_items 
-            (user_id, name, category, color, season, image_path, confidence, analysis_method, created_at)
+            (user_id, name, category, color, season, image_path, confidence, analysis_method,
+             temp_min, temp_max, formality_score, comfort_score, weather_compatibility, features_version,
+             created_at)
             VALUES 
-            (%s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+            (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
             RETURNING id, created_at
             """
             
             params = (
-                user_id, name, category, color, season, image_path, confidence, analysis_method
+                user_id, name, category, color, season, image_path, confidence, analysis_method,
+                features['temp_min'], features['temp_max'], features['formality_score'],
+                features['comfort_score'], json.dumps(features['weather_compatibility']),
+                features['features_version']
             )
             
             logger.info(f"Executing query with params: {params}")
@@ -68,6 +100,7 @@ class WardrobeService:
                 
                 returned_id = result_data['id']
                 created_at = result_data['created_at']
+                wardrobe_cache.invalidate(user_id)
                 logger.info(f"Wardrobe item saved successfully with ID: {returned_id}")
                 return {
                     "item_id": str(returned_id),
@@ -177,12 +210,14 @@ class WardrobeService:
             query = """
             DELETE FROM wardrobe_items 
             WHERE id = %s
-            RETURNING id
+            RETURNING id, user_id
             """
             params = (item_id,)
             result = db.execute_query(query, params)
             
             if result:
+                wardrobe_cache.invalidate(result['user_id'])
+                compatibility_service.remove_item(result['user_id'], result['id'])
                 logger.info(f"Wardrobe item deleted from database: {item_id}")
                 return True
             else:
@@ -206,11 +241,12 @@ class WardrobeService:
                 last_worn = CURRENT_TIMESTAMP,
                 updated_at = CURRENT_TIMESTAMP
             WHERE id = %s
-            RETURNING id, times_worn
+            RETURNING id, user_id, times_worn
             """
             result = db.execute_query(query, (item_id,))
             
             if result:
+                wardrobe_cache.invalidate(result['user_id'])
                 logger.info(f"Updated wear count for item {item_id}")
                 return True
             return False
@@ -219,5 +255,61 @@ class WardrobeService:
             logger.exception(f"Error updating wear count: {e}")
             return False
 
+    def refeaturize_stale_items(self, batch_size=500):
+        """Recompute derived attributes for rows written under older rule tables.
+        
+        Runs in the background at startup; a no-op once every row carries
+        the current FEATURE_RULES_VERSION.
+        """
+        total_updated = 0
+        try:
+            while True:
+                rows = db.execute_query("""
+                    SELECT id, user_id, name, category, season
+                    FROM wardrobe_items
+                    WHERE features_version IS DISTINCT FROM %s
+                    ORDER BY id
+                    LIMIT %s
+                """, (FEATURE_RULES_VERSION, batch_size))
+                
+                if not rows:
+                    break
+                
+                values = []
+                params = [FEATURE_RULES_VERSION]
+                for row in rows:
+                    features = compute_item_features(row['name'], row['category'], row['season'] or 'all')
+                    values.append("(%s, %s, %s, %s, %s, %s::jsonb)")
+                    params.extend([
+                        row['id'], features['temp_min'], features['temp_max'],
+                        features['formality_score'], features['comfort_score'],
+                        json.dumps(features['weather_compatibility'])
+                    ])
+                
+                query = f"""
+                UPDATE wardrobe_items AS w
+                SET temp_min = v.temp_min,
+                    temp_max = v.temp_max,
+                    formality_score = v.formality_score,
+                    comfort_score = v.comfort_score,
+                    weather_compatibility = v.weather_compatibility,
+                    features_version = %s
+                FROM (VALUES {', '.join(values)})
+                    AS v(id, temp_min, temp_max, formality_score, comfort_score, weather_compatibility)
+                WHERE w.id = v.id
+                """
+                db.execute_query(query, tuple(params))
+                
+                for user_id in {row['user_id'] for row in rows}:
+                    wardrobe_cache.invalidate(user_id)
+                total_updated += len(rows)
+                logger.info(f"Re-featurized {len(rows)} wardrobe items (total {total_updated})")
+            
+            return total_updated
+            
+        except Exception as e:
+            logger.exception(f"Error re-featurizing wardrobe items: {e}")
+            return total_updated
+
 # Create global instance
 wardrobe_service = WardrobeService()
\ No newline at end of file
@@ -0,0 +1,135 @@
+# services/wear_history.py
+import os
+import json
+import logging
+import threading
+import numpy as np
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+from database.connection import db
+from services.outfit_scoring_engine import to_epoch
+from utils.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Wears kept per item and how far back the index is loaded from outfit_history
+MAX_WEARS_PER_ITEM = int(os.getenv('WEAR_HISTORY_MAX_WEARS', 8))
+HISTORY_DAYS = int(os.getenv('WEAR_HISTORY_DAYS', 60))
+
+
+def wear_epoch(value) -> Optional[float]:
+    """Epoch seconds for a worn_date (datetime, date or ISO string)"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if not isinstance(value, datetime):
+        return None
+    return to_epoch(value)
+
+
+def outfit_item_ids(outfit_data) -> List[str]:
+    """Wardrobe item ids referenced by an outfit_history outfit_data blob"""
+    if isinstance(outfit_data, str):
+        try:
+            outfit_data = json.loads(outfit_data)
+        except ValueError:
+            return []
+    items = outfit_data.get('items') if isinstance(outfit_data, dict) else None
+    if not isinstance(items, list):
+        return []
+    return [str(item['id']) for item in items if isinstance(item, dict) and item.get('id') is not None]
+
+
+class UserWearHistory:
+    """Item id -> ascending array of the last N wear timestamps for one user"""
+
+    def __init__(self, version: Optional[int]):
+        self.version = version
+        self.times: Dict[str, np.ndarray] = {}
+
+    def add(self, item_id: str, epoch: float):
+        times = self.times.get(item_id)
+        times = np.array([epoch]) if times is None else np.sort(np.append(times, epoch))
+        self.times[item_id] = times[-MAX_WEARS_PER_ITEM:]
+
+    def matrix(self, item_ids: List[str]) -> np.ndarray:
+        """(len(item_ids), MAX_WEARS_PER_ITEM) wear epochs, NaN-padded"""
+        wears = np.full((len(item_ids), MAX_WEARS_PER_ITEM), np.nan)
+        for row, item_id in enumerate(item_ids):
+            times = self.times.get(item_id)
+            if times is not None:
+                wears[row, :len(times)] = times
+        return wears
+
+
+class WearHistoryIndex:
+    """Per-user recency index built from outfit_history.
+
+    A user's index is loaded with one query the first time they are scored, then
+    updated in place by /api/outfit/wear. It is stamped with the wardrobe version it
+    reflects; a wear recorded by another worker bumps the shared version, and the
+    next lookup here reloads instead of scoring with stale wears.
+    """
+
+    def __init__(self, max_users: int = 10000):
+        self.users = LRUCache(max_entries=max_users)
+        self._lock = threading.Lock()
+
+    def _load(self, user_id: int, version: Optional[int]) -> UserWearHistory:
+        history = UserWearHistory(version)
+        try:
+            rows = db.execute_query("""
+                SELECT worn_date, outfit_data
+                FROM outfit_history
+                WHERE user_id = %s AND worn_date >= CURRENT_DATE - %s
+                ORDER BY worn_date
+            """, (user_id, HISTORY_DAYS))
+            for row in rows or []:
+                epoch = wear_epoch(row['worn_date'])
+                if epoch is None:
+                    continue
+                for item_id in outfit_item_ids(row['outfit_data']):
+                    history.add(item_id, epoch)
+        except Exception as e:
+            logger.error(f"Error loading wear history for user {user_id}: {e}")
+        return history
+
+    def get(self, user_id: int, version: Optional[int]) -> UserWearHistory:
+        """The user's index, (re)loaded when missing or behind the wardrobe version"""
+        with self._lock:
+            history = self.users.get(user_id)
+        if history is not None and history.version == version:
+            return history
+        history = self._load(user_id, version)
+        with self._lock:
+            self.users.set(user_id, history)
+        return history
+
+    def record_wear(self, user_id: int, item_ids: Iterable, worn_date, version: Optional[int] = None):
+        """Add one wear of item_ids and move a loaded index to the new wardrobe version"""
+        epoch = wear_epoch(worn_date)
+        with self._lock:
+            history = self.users.get(user_id)
+            if history is None or epoch is None:
+                return
+            for item_id in {str(item_id) for item_id in item_ids}:
+                history.add(item_id, epoch)
+            history.version = version
+
+    def wear_matrix(self, user_id: int, version: Optional[int], wardrobe) -> np.ndarray:
+        """Wear epochs aligned with a featurized wardrobe's rows"""
+        history = self.get(user_id, version)
+        item_ids = [str(item.get('id')) for item in wardrobe.items]
+        with self._lock:
+            return history.matrix(item_ids)
+
+    def stats(self) -> Dict:
+        return self.users.stats()
+
+
+# Global instance
+wear_history = WearHistoryIndex(max_users=int(os.getenv('WEAR_HISTORY_MAX_USERS', 10000)))
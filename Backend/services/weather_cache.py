@@ -0,0 +1,281 @@
+# services/weather_cache.py
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from database.connection import db
+from utils.lru_cache import LRUCache
+from utils.geo import cell_center
+
+logger = logging.getLogger(__name__)
+
+FRESH = 'fresh'
+STALE = 'stale'
+
+
+def cell_of_key(key: str) -> str:
+    """Geo-cell part of a weather cache key ("<cell>:current")"""
+    return key.rsplit(':', 1)[0]
+
+
+class WeatherCacheTable:
+    """Shared tier: the weather_cache table, one row per cache key (cell_key).
+
+    Ages are computed with the database clock, so workers with skewed clocks
+    agree on what is fresh.
+    """
+
+    def __init__(self):
+        self._ensure_table()
+
+    def _ensure_table(self):
+        """Create weather_cache (or add cell_key to the original schema) if needed"""
+        try:
+            db.execute_query("""
+            CREATE TABLE IF NOT EXISTS weather_cache (
+                id SERIAL PRIMARY KEY,
+                latitude DECIMAL(10,8) NOT NULL,
+                longitude DECIMAL(11,8) NOT NULL,
+                weather_data JSONB NOT NULL,
+                cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at TIMESTAMP NOT NULL
+            );
+            ALTER TABLE weather_cache ADD COLUMN IF NOT EXISTS cell_key VARCHAR(64);
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_weather_cache_cell_key ON weather_cache(cell_key);
+            CREATE INDEX IF NOT EXISTS idx_weather_cache_expires ON weather_cache(expires_at)
+            """)
+            logger.info("Weather cache table created or confirmed to exist")
+        except Exception as e:
+            logger.error(f"Error ensuring weather_cache table: {e}")
+
+    def load(self, key: str) -> Optional[Dict]:
+        """{'data', 'age'} for an unexpired row, else None"""
+        rows = db.execute_query("""
+            SELECT weather_data, EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - cached_at)) AS age
+            FROM weather_cache
+            WHERE cell_key = %s AND expires_at > CURRENT_TIMESTAMP
+        """, (key,))
+        if not rows:
+            return None
+        return {'data': rows[0]['weather_data'], 'age': float(rows[0]['age'])}
+
+    def save(self, key: str, data: Dict, age: float, expires_in: float):
+        """Upsert the row for a cache key"""
+        latitude, longitude = cell_center(cell_of_key(key))
+        db.execute_query("""
+            INSERT INTO weather_cache (cell_key, latitude, longitude, weather_data, cached_at, expires_at)
+            VALUES (%s, %s, %s, %s::jsonb,
+                    CURRENT_TIMESTAMP - make_interval(secs => %s),
+                    CURRENT_TIMESTAMP + make_interval(secs => %s))
+            ON CONFLICT (cell_key) DO UPDATE SET
+                weather_data = EXCLUDED.weather_data,
+                cached_at = EXCLUDED.cached_at,
+                expires_at = EXCLUDED.expires_at
+            WHERE weather_cache.cached_at <= EXCLUDED.cached_at
+        """, (key, latitude, longitude, json.dumps(data, default=str), age, expires_in))
+
+    def cleanup(self) -> bool:
+        """Bulk-delete expired rows"""
+        return db.execute_query("DELETE FROM weather_cache WHERE expires_at <= CURRENT_TIMESTAMP")
+
+    def preload(self, limit: int, kind: str) -> List[Dict]:
+        """Most recently refreshed unexpired rows of one kind ("<cell>:<kind>" keys)"""
+        rows = db.execute_query("""
+            SELECT cell_key, weather_data, EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - cached_at)) AS age
+            FROM weather_cache
+            WHERE cell_key LIKE %s AND expires_at > CURRENT_TIMESTAMP
+            ORDER BY cached_at DESC
+            LIMIT %s
+        """, (f"%:{kind}", limit))
+        return [{'key': row['cell_key'], 'data': row['weather_data'], 'age': float(row['age'])}
+                for row in rows or []]
+
+
+class WeatherCache:
+    """Two-tier weather cache with stale-while-revalidate.
+
+    Entries are fresh for `ttl` seconds and may then be served stale for up to
+    `max_stale` more seconds while the caller refreshes them in the background.
+    Past that they expire out of the in-process LRU, as do the least recently used
+    cells once `max_entries` is reached. An optional shared tier (the weather_cache
+    table, or anything with the same load/save/cleanup/preload methods) is read on
+    local misses and written behind on every refresh, so workers and restarts share
+    fetched weather. The local tier holds values as given; `encode`/`decode` convert
+    them to and from JSON-friendly records for the shared tier only.
+    """
+
+    def __init__(self, ttl: float = 30 * 60, max_stale: float = 6 * 3600, max_entries: int = 20000,
+                 shared=None, cleanup_interval: float = 3600, kind: str = 'current',
+                 encode: Optional[Callable[[Any], Dict]] = None, decode: Optional[Callable[[Dict], Any]] = None):
+        self.kind = kind
+        self.encode = encode
+        self.decode = decode
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.entries = LRUCache(max_entries=max_entries, ttl=ttl + max_stale)
+        self.shared = shared
+        self.cleanup_interval = cleanup_interval
+        self.stale_served = 0
+        self.shared_hits = 0
+        self.shared_errors = 0
+        self._last_cleanup = time.monotonic()
+        self._lock = threading.Lock()
+        # DB writes happen behind the request; one worker keeps them ordered and cheap
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='weather-cache') if shared else None
+
+    def _state(self, entry: Dict) -> Tuple[Dict, str]:
+        if time.time() - entry['fetched_at'] < self.ttl:
+            return entry['data'], FRESH
+        self.stale_served += 1
+        return entry['data'], STALE
+
+    def lookup(self, key: str) -> Tuple[Optional[Dict], Optional[str]]:
+        """In-process tier only: (data, FRESH | STALE), or (None, None) on a miss"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None, None
+        return self._state(entry)
+
+    def fresh_for(self, key: str) -> Optional[float]:
+        """Seconds until the local entry turns stale (negative once stale), None when absent"""
+        entry = self.entries.peek(key)  # bookkeeping read: leaves hit/miss stats and recency alone
+        if entry is None:
+            return None
+        return self.ttl - (time.time() - entry['fetched_at'])
+
+    async def get(self, key: str) -> Tuple[Optional[Dict], Optional[str]]:
+        """Both tiers: local LRU first, then the shared tier (off the event loop)"""
+        data, state = self.lookup(key)
+        if state is not None or self.shared is None:
+            return data, state
+        try:
+            row = await asyncio.get_running_loop().run_in_executor(None, self.shared.load, key)
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning(f"Shared weather cache read failed for {key}: {e}")
+            return None, None
+        if row is None:
+            return None, None
+        try:
+            data = self._decode(row['data'])
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning(f"Unreadable shared weather cache row for {key}: {e}")
+            return None, None
+        self.shared_hits += 1
+        fetched_at = time.time() - row['age']
+        self._set_local(key, data, fetched_at)
+        return self._state({'data': data, 'fetched_at': fetched_at})
+
+    async def adopt_shared(self, key: str, lead: float) -> bool:
+        """Take the shared tier's entry when it stays fresh for at least `lead` more seconds.
+
+        Lets a worker skip an upstream refresh another worker has already done; True
+        when the local tier now holds that entry.
+        """
+        if self.shared is None:
+            return False
+        try:
+            row = await asyncio.get_running_loop().run_in_executor(None, self.shared.load, key)
+            if row is None or self.ttl - row['age'] < lead:
+                return False
+            data = self._decode(row['data'])
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning(f"Shared weather cache read failed for {key}: {e}")
+            return False
+        self._set_local(key, data, time.time() - row['age'])
+        return True
+
+    def _decode(self, record: Dict):
+        return self.decode(record) if self.decode is not None else record
+
+    def _set_local(self, key: str, data: Dict, fetched_at: float) -> float:
+        remaining = self.ttl + self.max_stale - (time.time() - fetched_at)
+        if remaining > 0:
+            self.entries.set(key, {'data': data, 'fetched_at': fetched_at}, ttl=remaining)
+        return remaining
+
+    def put(self, key: str, data: Dict, fetched_at: Optional[float] = None):
+        """Store locally and write behind to the shared tier"""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        remaining = self._set_local(key, data, fetched_at)
+        if self._writer is None or remaining <= 0:
+            return
+        self._writer.submit(self._write_shared, key, data, time.time() - fetched_at, remaining)
+        with self._lock:
+            due = time.monotonic() - self._last_cleanup >= self.cleanup_interval
+            if due:
+                self._last_cleanup = time.monotonic()
+        if due:
+            self._writer.submit(self.cleanup)
+
+    def _write_shared(self, key: str, data, age: float, expires_in: float):
+        try:
+            record = self.encode(data) if self.encode is not None else data
+            self.shared.save(key, record, age, expires_in)
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning(f"Shared weather cache write failed for {key}: {e}")
+
+    def cleanup(self):
+        """Drop expired rows from the shared tier"""
+        if self.shared is None:
+            return
+        try:
+            self.shared.cleanup()
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning(f"Weather cache cleanup failed: {e}")
+
+    def preload(self, limit: int = 2000) -> int:
+        """Warm the local tier with the hottest unexpired shared rows of this cache's kind (run at boot)"""
+        if self.shared is None:
+            return 0
+        try:
+            rows = self.shared.preload(limit, self.kind)
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning(f"Weather cache preload failed: {e}")
+            return 0
+        now = time.time()
+        for row in reversed(rows):  # hottest last, so it ends up most recently used
+            try:
+                self._set_local(row['key'], self._decode(row['data']), now - row['age'])
+            except Exception as e:
+                self.shared_errors += 1
+                logger.warning(f"Skipping unreadable preloaded weather row {row['key']}: {e}")
+        logger.info(f"Preloaded {len(rows)} weather cells ({self.kind})")
+        return len(rows)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> Dict:
+        stats = self.entries.stats()
+        stats['stale_served'] = self.stale_served
+        stats['max_stale'] = self.max_stale
+        stats['shared'] = type(self.shared).__name__ if self.shared is not None else None
+        stats['shared_hits'] = self.shared_hits
+        stats['shared_errors'] = self.shared_errors
+        return stats
+
+
+def create_weather_cache(ttl: Optional[float] = None, kind: str = 'current',
+                         encode: Optional[Callable[[Any], Dict]] = None,
+                         decode: Optional[Callable[[Dict], Any]] = None) -> WeatherCache:
+    shared = WeatherCacheTable() if os.getenv('WEATHER_CACHE_SHARED', '1') != '0' else None
+    return WeatherCache(
+        ttl=ttl if ttl is not None else float(os.getenv('WEATHER_CACHE_TTL', 30 * 60)),
+        max_stale=float(os.getenv('WEATHER_CACHE_MAX_STALE', 6 * 3600)),
+        max_entries=int(os.getenv('WEATHER_CACHE_MAX_ENTRIES', 20000)),
+        shared=shared,
+        cleanup_interval=float(os.getenv('WEATHER_CACHE_CLEANUP_INTERVAL', 3600)),
+        kind=kind,
+        encode=encode,
+        decode=decode
+    )
@@ -0,0 +1,122 @@
+# services/weather_forecast.py
+import numpy as np
+from datetime import date, datetime, timezone
+from typing import Dict, Optional
+
+HOUR_SECONDS = 3600
+
+WEATHER_CODE_DESCRIPTIONS = {
+    0: "Clear sky",
+    1: "Mainly clear", 2: "Partly cloudy", 3: "Overcast",
+    45: "Fog", 48: "Depositing rime fog",
+    51: "Light drizzle", 53: "Moderate drizzle", 55: "Dense drizzle",
+    61: "Slight rain", 63: "Moderate rain", 65: "Heavy rain",
+    71: "Slight snow", 73: "Moderate snow", 75: "Heavy snow",
+    95: "Thunderstorm", 96: "Thunderstorm with hail", 99: "Thunderstorm with heavy hail"
+}
+
+
+def weather_code_to_description(code: int) -> str:
+    """Convert Open-Meteo weather code to description"""
+    return WEATHER_CODE_DESCRIPTIONS.get(code, "Unknown")
+
+
+def weather_code_to_icon(code: int) -> str:
+    """Convert Open-Meteo weather code to icon"""
+    if code == 0:
+        return "01d"  # Clear sky
+    elif code in [1, 2]:
+        return "02d"  # Partly cloudy
+    elif code == 3:
+        return "04d"  # Overcast
+    elif code in [45, 48]:
+        return "50d"  # Fog
+    elif code in [51, 53, 55, 61, 63, 65]:
+        return "09d"  # Rain
+    elif code in [71, 73, 75]:
+        return "13d"  # Snow
+    elif code in [95, 96, 99]:
+        return "11d"  # Thunderstorm
+    else:
+        return "02d"  # Default
+
+
+# Column name -> dtype; one compact array per hourly variable
+FORECAST_COLUMNS = {
+    'temperature': np.float32,
+    'feels_like': np.float32,
+    'humidity': np.float32,
+    'precipitation': np.float32,
+    'windspeed': np.float32,
+    'weathercode': np.int16,
+}
+
+
+class HourlyForecast:
+    """Hourly forecast for one geo-cell as parallel NumPy arrays.
+
+    `times` holds the UTC epoch second each hour starts at (ascending), so the
+    weather at any instant is one binary search away.
+    """
+
+    def __init__(self, times, columns: Dict[str, np.ndarray], utc_offset: int = 0,
+                 location: Optional[Dict] = None, source: str = 'forecast'):
+        self.times = np.asarray(times, dtype=np.int64)
+        self.columns = {name: np.asarray(columns[name], dtype=dtype) for name, dtype in FORECAST_COLUMNS.items()}
+        self.utc_offset = int(utc_offset)
+        self.location = location or {'name': 'Unknown', 'country': 'Unknown'}
+        self.source = source
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def covers(self, epoch: float) -> bool:
+        return len(self.times) > 0 and self.times[0] <= epoch < self.times[-1] + HOUR_SECONDS
+
+    def index_at(self, epoch) -> np.ndarray:
+        """Index of the hour containing each epoch (clamped to the forecast range)"""
+        index = np.searchsorted(self.times, epoch, side='right') - 1
+        return np.clip(index, 0, len(self.times) - 1)
+
+    def local_epoch(self, day: date, hour: int = 12) -> float:
+        """UTC epoch of a local wall-clock hour at this cell"""
+        local = datetime(day.year, day.month, day.day, hour, tzinfo=timezone.utc)
+        return local.timestamp() - self.utc_offset
+
+    def at(self, epoch: float) -> Dict:
+        """Weather dict (same shape as current conditions) for the hour containing epoch"""
+        return self._weather(int(self.index_at(epoch)))
+
+    def _weather(self, index: int) -> Dict:
+        columns = self.columns
+        code = int(columns['weathercode'][index])
+        return {
+            'temperature': round(float(columns['temperature'][index])),
+            'feels_like': round(float(columns['feels_like'][index])),
+            'condition': weather_code_to_description(code),
+            'humidity': round(float(columns['humidity'][index])),
+            'windSpeed': round(float(columns['windspeed'][index])),
+            'precipitation': round(float(columns['precipitation'][index]), 1),
+            'visibility': 10,  # Default value
+            'icon': weather_code_to_icon(code),
+            'location': self.location,
+            'api_source': self.source,
+            'forecast_time': datetime.fromtimestamp(int(self.times[index]), timezone.utc).isoformat(),
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def to_record(self) -> Dict:
+        """JSON-serializable form for the weather caches"""
+        record = {name: values.tolist() for name, values in self.columns.items()}
+        record.update({
+            'times': self.times.tolist(),
+            'utc_offset': self.utc_offset,
+            'location': self.location,
+            'source': self.source
+        })
+        return record
+
+    @classmethod
+    def from_record(cls, record: Dict) -> 'HourlyForecast':
+        return cls(record['times'], record, record.get('utc_offset', 0), record.get('location'),
+                   record.get('source', 'forecast'))
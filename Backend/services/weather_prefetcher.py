@@ -0,0 +1,133 @@
+# services/weather_prefetcher.py
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Dict, Optional
+from services.weather_service import weather_service
+from utils.count_min_sketch import HeavyHitters
+
+logger = logging.getLogger(__name__)
+
+# Refresh cells whose weather turns stale within this many seconds
+WEATHER_PREFETCH_LEAD = float(os.getenv('WEATHER_PREFETCH_LEAD', 5 * 60))
+WEATHER_PREFETCH_INTERVAL = float(os.getenv('WEATHER_PREFETCH_INTERVAL', 60))
+# Upstream refreshes per second across all cells, per worker process. Cells another worker
+# already refreshed are taken from the shared weather_cache table and spend no budget.
+WEATHER_PREFETCH_RATE = float(os.getenv('WEATHER_PREFETCH_RATE', 1.0))
+
+
+class WeatherPrefetcher:
+    """Keeps weather for recently active geo-cells warm so hot cells never miss on the request path.
+
+    Request handlers record() each looked-up coordinate; cells are counted in a
+    bounded heavy-hitters sketch that is halved every `decay_interval`. Every
+    `interval` seconds the hottest cells whose cache entries go stale within `lead`
+    (plus jitter, so cells fetched together drift apart) are refreshed, at most
+    `rate` refreshes per second and never more than one interval's budget per pass.
+    Each worker runs its own prefetcher, but a cell is only fetched upstream when the
+    shared cache tier doesn't already hold a fresh enough copy, so workers don't
+    repeat each other's refreshes.
+    """
+
+    def __init__(self, service, capacity: int = 2000, min_hits: int = 2,
+                 lead: float = WEATHER_PREFETCH_LEAD, interval: float = WEATHER_PREFETCH_INTERVAL,
+                 rate: float = WEATHER_PREFETCH_RATE, decay_interval: float = 3600, jitter: float = 0.25):
+        self.service = service
+        self.active = HeavyHitters(capacity)
+        self.min_hits = min_hits
+        self.lead = lead
+        self.interval = interval
+        self.rate = rate
+        self.decay_interval = decay_interval
+        self.jitter = jitter
+        self.ticks = 0
+        self.refreshed = 0
+        self.failures = 0
+        self.deferred = 0
+        self.last_tick_seconds = 0.0
+        self._last_decay = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, lat: float, lon: float):
+        """Count a request for a coordinate's cell (cheap; safe from any thread)"""
+        try:
+            self.active.add(self.service.cell_for(lat, lon))
+        except Exception as e:
+            logger.warning(f"Failed to record weather cell: {e}")
+
+    def start(self):
+        """Run the prefetch loop on the running event loop (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info("Weather prefetcher started")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Weather prefetch pass failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def tick(self) -> int:
+        """One prefetch pass over the hot cells; returns the number of cache entries refreshed"""
+        started = time.monotonic()
+        if started - self._last_decay >= self.decay_interval:
+            self.active.decay()
+            self._last_decay = started
+
+        budget = max(1, int(self.rate * self.interval))
+        spacing = 1.0 / self.rate if self.rate > 0 else 0.0
+        refreshed = 0
+        for cell, _ in self.active.top(self.min_hits):
+            if budget <= 0:
+                self.deferred += 1
+                continue
+            lead = self.lead * (1 + random.uniform(0, self.jitter))
+            try:
+                count = await self.service.prefetch_cell(cell, lead)
+                refreshed += count
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"Weather prefetch failed for {cell}: {e}")
+                count = 1  # a failed call still spent provider quota
+            if count:
+                budget -= 1
+                await asyncio.sleep(spacing)
+
+        self.ticks += 1
+        self.refreshed += refreshed
+        self.last_tick_seconds = time.monotonic() - started
+        return refreshed
+
+    def stats(self) -> Dict:
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'tracked_cells': len(self.active),
+            'hot_cells': len(self.active.top(self.min_hits)),
+            'recorded': self.active.total,
+            'ticks': self.ticks,
+            'refreshed': self.refreshed,
+            'deferred': self.deferred,
+            'failures': self.failures,
+            'last_tick_seconds': round(self.last_tick_seconds, 3)
+        }
+
+# Global instance
+weather_prefetcher = WeatherPrefetcher(
+    weather_service,
+    capacity=int(os.getenv('WEATHER_PREFETCH_CELLS', 2000)),
+    min_hits=int(os.getenv('WEATHER_PREFETCH_MIN_HITS', 2))
+)
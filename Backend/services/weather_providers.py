@@ -0,0 +1,249 @@
+# services/weather_providers.py
+import os
+import time
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional
+from services.weather_forecast import (
+    HourlyForecast, weather_code_to_description, weather_code_to_icon
+)
+
+logger = logging.getLogger(__name__)
+
+# Per-provider request timeout (seconds); the service also enforces a total deadline
+DEFAULT_PROVIDER_TIMEOUT = float(os.getenv('WEATHER_PROVIDER_TIMEOUT', 3.0))
+
+# Days of hourly forecast fetched per cell
+FORECAST_DAYS = int(os.getenv('WEATHER_FORECAST_DAYS', 7))
+
+# Weather code for hours Open-Meteo reports without one (described as "Unknown")
+UNKNOWN_WEATHER_CODE = -1
+
+
+class WeatherProvider(ABC):
+    """One upstream weather API; fetch_current() runs on the service's shared async HTTP client"""
+
+    name = 'provider'
+    supports_forecast = False
+
+    def __init__(self, timeout: float = DEFAULT_PROVIDER_TIMEOUT):
+        self.timeout = timeout
+
+    def available(self) -> bool:
+        """False when the provider can't be used (e.g. no API key configured)"""
+        return True
+
+    @abstractmethod
+    async def fetch_current(self, client, lat: float, lon: float, timeout: float) -> Dict:
+        """Current conditions as a weather dict"""
+
+    async def _get_json(self, client, url: str, params: Dict, timeout: float) -> Dict:
+        response = await client.get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+class ForecastProvider(WeatherProvider):
+    """A provider that also serves the hourly forecast"""
+
+    supports_forecast = True
+
+    @abstractmethod
+    async def fetch_forecast(self, client, lat: float, lon: float, timeout: float) -> HourlyForecast:
+        """Hourly forecast for the coming FORECAST_DAYS days"""
+
+
+class OpenWeatherMapProvider(WeatherProvider):
+    name = 'openweathermap'
+    URL = "https://api.openweathermap.org/data/2.5/weather"
+
+    def __init__(self, api_key: Optional[str], timeout: float = DEFAULT_PROVIDER_TIMEOUT):
+        super().__init__(timeout)
+        self.api_key = api_key
+
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    async def fetch_current(self, client, lat: float, lon: float, timeout: float) -> Dict:
+        data = await self._get_json(client, self.URL, {
+            'lat': lat,
+            'lon': lon,
+            'appid': self.api_key,
+            'units': 'metric'
+        }, timeout)
+
+        return {
+            'temperature': round(data['main']['temp']),
+            'feels_like': round(data['main']['feels_like']),
+            'condition': data['weather'][0]['description'],
+            'humidity': data['main']['humidity'],
+            'windSpeed': round(data['wind'].get('speed', 0) * 3.6),
+            'precipitation': data.get('rain', {}).get('1h', 0),
+            'visibility': data.get('visibility', 10000) / 1000,
+            'icon': data['weather'][0]['icon'],
+            'location': {
+                'name': data.get('name', 'Unknown'),
+                'country': data['sys'].get('country', 'Unknown')
+            },
+            'api_source': self.name,
+            'timestamp': datetime.now().isoformat()
+        }
+
+
+class WeatherAPIProvider(WeatherProvider):
+    name = 'weatherapi'
+    URL = "https://api.weatherapi.com/v1/current.json"
+
+    def __init__(self, api_key: Optional[str], timeout: float = DEFAULT_PROVIDER_TIMEOUT):
+        super().__init__(timeout)
+        self.api_key = api_key
+
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    async def fetch_current(self, client, lat: float, lon: float, timeout: float) -> Dict:
+        data = await self._get_json(client, self.URL, {
+            'key': self.api_key,
+            'q': f"{lat},{lon}",
+            'aqi': 'no'
+        }, timeout)
+
+        return {
+            'temperature': round(data['current']['temp_c']),
+            'feels_like': round(data['current']['feelslike_c']),
+            'condition': data['current']['condition']['text'],
+            'humidity': data['current']['humidity'],
+            'windSpeed': round(data['current']['wind_kph']),
+            'precipitation': data['current']['precip_mm'],
+            'visibility': data['current']['vis_km'],
+            'icon': data['current']['condition']['icon'],
+            'location': {
+                'name': data['location']['name'],
+                'country': data['location']['country']
+            },
+            'api_source': self.name,
+            'timestamp': datetime.now().isoformat()
+        }
+
+
+class OpenMeteoProvider(ForecastProvider):
+    """Open-Meteo (free, no API key); also serves the hourly forecast"""
+
+    name = 'open-meteo'
+    supports_forecast = True
+    URL = "https://api.open-meteo.com/v1/forecast"
+
+    async def _fetch(self, client, lat: float, lon: float, timeout: float) -> Dict:
+        return await self._get_json(client, self.URL, {
+            'latitude': lat,
+            'longitude': lon,
+            'current_weather': 'true',
+            'hourly': 'temperature_2m,apparent_temperature,relativehumidity_2m,precipitation,'
+                      'windspeed_10m,weathercode',
+            'timeformat': 'unixtime',
+            'timezone': 'auto',
+            'forecast_days': FORECAST_DAYS
+        }, timeout)
+
+    def _forecast(self, data: Dict, lat: float, lon: float) -> HourlyForecast:
+        hourly = data.get('hourly', {})
+        times = hourly.get('time', [])
+
+        def column(key: str) -> List:
+            values = hourly.get(key) or []
+            return [values[i] if i < len(values) else None for i in range(len(times))]
+
+        # Open-Meteo reports missing values as null: hours without a temperature are
+        # dropped, other gaps get the same defaults as a missing variable
+        temperature = column('temperature_2m')
+        keep = [i for i, value in enumerate(temperature) if value is not None]
+        feels_like = column('apparent_temperature')
+        humidity = column('relativehumidity_2m')
+        precipitation = column('precipitation')
+        windspeed = column('windspeed_10m')
+        weathercode = column('weathercode')
+        return HourlyForecast([times[i] for i in keep], {
+            'temperature': [temperature[i] for i in keep],
+            'feels_like': [temperature[i] if feels_like[i] is None else feels_like[i] for i in keep],
+            'humidity': [50 if humidity[i] is None else humidity[i] for i in keep],
+            'precipitation': [precipitation[i] or 0 for i in keep],
+            'windspeed': [windspeed[i] or 0 for i in keep],
+            'weathercode': [UNKNOWN_WEATHER_CODE if weathercode[i] is None else weathercode[i] for i in keep],
+        }, utc_offset=data.get('utc_offset_seconds', 0),
+            location={'name': f"Lat: {lat}, Lon: {lon}", 'country': 'Unknown'}, source=self.name)
+
+    async def fetch_forecast(self, client, lat: float, lon: float, timeout: float) -> HourlyForecast:
+        return self._forecast(await self._fetch(client, lat, lon, timeout), lat, lon)
+
+    async def fetch_current(self, client, lat: float, lon: float, timeout: float) -> Dict:
+        data = await self._fetch(client, lat, lon, timeout)
+        current = data['current_weather']
+
+        # Humidity and precipitation from the hourly slot containing now
+        forecast = self._forecast(data, lat, lon)
+        if len(forecast):
+            weather = forecast.at(time.time())
+        else:
+            weather = {
+                'feels_like': round(current['temperature']), 'humidity': 50, 'precipitation': 0,
+                'visibility': 10, 'location': forecast.location, 'api_source': self.name,
+                'timestamp': datetime.now().isoformat()
+            }
+        weather.update({
+            'temperature': round(current['temperature']),
+            'condition': weather_code_to_description(current['weathercode']),
+            'windSpeed': round(current['windspeed']),
+            'icon': weather_code_to_icon(current['weathercode'])
+        })
+        weather.pop('forecast_time', None)
+        return weather
+
+
+class StaticWeatherProvider(ForecastProvider):
+    """Local stub: canned (or computed) weather, optional latency and failures, no network.
+
+    Usable in tests and offline development, e.g.
+    WeatherService(providers=[StaticWeatherProvider({'temperature': 18}, delay=0.05)])
+    Pass `forecast` (an HourlyForecast or a callable returning one) to serve forecasts too.
+    """
+
+    name = 'static'
+
+    def __init__(self, weather, delay: float = 0.0, fail: bool = False,
+                 timeout: float = DEFAULT_PROVIDER_TIMEOUT, name: Optional[str] = None, forecast=None):
+        super().__init__(timeout)
+        self.weather = weather
+        self.delay = delay
+        self.fail = fail
+        self.forecast = forecast
+        self.supports_forecast = forecast is not None
+        self.calls = 0
+        if name:
+            self.name = name
+
+    async def _respond(self):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} stub configured to fail")
+
+    async def fetch_current(self, client, lat: float, lon: float, timeout: float) -> Dict:
+        await self._respond()
+        weather = self.weather(lat, lon) if callable(self.weather) else self.weather
+        return {**weather, 'api_source': self.name, 'timestamp': datetime.now().isoformat()}
+
+    async def fetch_forecast(self, client, lat: float, lon: float, timeout: float) -> HourlyForecast:
+        await self._respond()
+        return self.forecast(lat, lon) if callable(self.forecast) else self.forecast
+
+
+def default_providers() -> List[WeatherProvider]:
+    """OpenWeatherMap, then WeatherAPI, then Open-Meteo (keyed providers skipped without keys)"""
+    return [
+        OpenWeatherMapProvider(os.getenv('OPENWEATHER_API_KEY')),
+        WeatherAPIProvider(os.getenv('WEATHERAPI_KEY')),
+        OpenMeteoProvider(timeout=float(os.getenv('OPEN_METEO_TIMEOUT', 4.0)))
+    ]
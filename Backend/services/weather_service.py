@@ -1,201 +1,409 @@
-import requests
 import os
-from typing import Dict, List, Optional
+import asyncio
 import logging
-from datetime import datetime, timedelta
+import time
+import threading
+import weakref
+from typing import Dict, List, Optional
+from datetime import date, datetime
+import httpx
+from services.weather_providers import WeatherProvider, default_providers
+from services.weather_cache import WeatherCache, FRESH, STALE, cell_of_key, create_weather_cache
+from services.weather_forecast import HourlyForecast
+from utils.single_flight import SingleFlight
+from utils.geo import GEO_CELL_DEGREES, geo_cell, cell_center
+from utils.circuit_breaker import CircuitBreaker
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Upper bound for one lookup across the whole provider fallback chain
+WEATHER_DEADLINE_SECONDS = float(os.getenv('WEATHER_DEADLINE_SECONDS', 6.0))
+
+# Hedged requests: wait this long on a provider without latency history, never less than the minimum
+WEATHER_HEDGE_DEFAULT_DELAY = float(os.getenv('WEATHER_HEDGE_DEFAULT_DELAY', 1.0))
+WEATHER_HEDGE_MIN_DELAY = float(os.getenv('WEATHER_HEDGE_MIN_DELAY', 0.2))
+
+# Hourly forecasts are refetched per cell every few hours (current conditions too, when no keyed provider is set)
+WEATHER_FORECAST_TTL = float(os.getenv('WEATHER_FORECAST_TTL', 3 * 3600))
+
+# Grid size for weather cache keys; every coordinate in a cell shares one lookup
+WEATHER_CELL_DEGREES = float(os.getenv('WEATHER_CELL_DEGREES', GEO_CELL_DEGREES))
+
 class WeatherService:
-    def __init__(self):
-        self.openweather_api_key = os.getenv('OPENWEATHER_API_KEY')
-        self.weatherapi_key = os.getenv('WEATHERAPI_KEY')  
-        self.cache = {}
-        self.cache_duration = 30 * 60  # 30 minutes
+    def __init__(self, providers: Optional[List[WeatherProvider]] = None,
+                 deadline: float = WEATHER_DEADLINE_SECONDS, cell_degrees: float = WEATHER_CELL_DEGREES,
+                 cache: Optional[WeatherCache] = None, forecast_cache: Optional[WeatherCache] = None):
+        self.providers = providers if providers is not None else default_providers()
+        self.deadline = deadline
+        self.cell_degrees = cell_degrees
+        self.cache = cache if cache is not None else create_weather_cache()
+        self.forecast_cache = (forecast_cache if forecast_cache is not None
+                               else create_weather_cache(ttl=WEATHER_FORECAST_TTL, kind='forecast',
+                                                         encode=HourlyForecast.to_record,
+                                                         decode=HourlyForecast.from_record))
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.hedged = 0
+        self.breakers = {
+            provider.name: CircuitBreaker(
+                provider.name,
+                slow_call_seconds=float(os.getenv('WEATHER_BREAKER_SLOW_SECONDS', 2.0)),
+                open_seconds=float(os.getenv('WEATHER_BREAKER_OPEN_SECONDS', 30))
+            )
+            for provider in self.providers
+        }
+        self._refresh_tasks = set()  # strong refs so background refreshes aren't garbage collected
+        # One pooled keep-alive client per event loop (httpx clients are loop-bound)
+        self._clients = weakref.WeakKeyDictionary()
+        self._clients_lock = threading.Lock()
+        # Concurrent misses for the same cache key share one upstream fetch
+        self.single_flight = SingleFlight()
     
-    def get_current_weather(self, lat: float, lon: float) -> Dict:
-        """Get current weather with fallback to multiple APIs"""
-        cache_key = f"{lat},{lon},current"
-        
-        # Check cache first
-        if self._is_cache_valid(cache_key):
-            return self.cache[cache_key]['data']
+    def preload(self, limit: int = 2000):
+        """Warm both caches from the shared tier, each with its own rows (run at boot)"""
+        self.cache.preload(limit)
+        self.forecast_cache.preload(limit)
+    
+    def _client(self) -> httpx.AsyncClient:
+        """Shared async HTTP client for the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            client = self._clients.get(loop)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(
+                    http2=HTTP2_AVAILABLE,
+                    limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60),
+                    timeout=httpx.Timeout(self.deadline, connect=2.0)
+                )
+                self._clients[loop] = client
+            return client
+    
+    async def aclose(self):
+        """Close the client bound to the running loop (app shutdown)"""
+        with self._clients_lock:
+            client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+    
+    def cell_for(self, lat: float, lon: float) -> str:
+        """Weather geo-cell of a coordinate (GPS jitter within a cell maps to the same key)"""
+        return geo_cell(lat, lon, self.cell_degrees)
+    
+    async def get_current_weather_async(self, lat: float, lon: float, allow_stale: bool = True) -> Dict:
+        """Get current weather with fallback across providers within one deadline budget"""
+        return await self.get_cell_weather_async(self.cell_for(lat, lon), allow_stale)
+    
+    async def get_cell_weather_async(self, cell: str, allow_stale: bool = True) -> Dict:
+        """Current weather for a geo-cell, fetched at the cell center.
         
-        # Try OpenWeatherMap first
-        if self.openweather_api_key:
-            try:
-                weather_data = self._get_openweather_current(lat, lon)
-                self._cache_result(cache_key, weather_data)
-                return weather_data
-            except Exception as e:
-                logger.warning(f"OpenWeatherMap failed: {e}")
+        A stale entry is returned immediately while a background task refreshes it.
+        """
+        cache_key = f"{cell}:current"
+        lat, lon = cell_center(cell)
         
-        # Try WeatherAPI as backup
-        if self.weatherapi_key:
-            try:
-                weather_data = self._get_weatherapi_current(lat, lon)
-                self._cache_result(cache_key, weather_data)
-                return weather_data
-            except Exception as e:
-                logger.warning(f"WeatherAPI failed: {e}")
+        # Check cache first
+        cached, state = await self.cache.get(cache_key)
+        if state == FRESH or (state == STALE and allow_stale):
+            self.hits += 1
+            if state == STALE:
+                self._revalidate(cache_key, lambda: self._fetch_and_cache(cache_key, lat, lon))
+            return cached
+        self.misses += 1
         
-        # Try Open-Meteo (no API key required)
         try:
-            weather_data = self._get_open_meteo_current(lat, lon)
-            self._cache_result(cache_key, weather_data)
-            return weather_data
+            weather_data = await self.single_flight.do(cache_key, lambda: self._fetch_and_cache(cache_key, lat, lon))
         except Exception as e:
-            logger.warning(f"Open-Meteo failed: {e}")
+            logger.warning(f"Weather lookup failed: {e}")
+            weather_data = None
+        if weather_data is None:
+            # Return fallback data
+            logger.info("Using fallback weather data")
+            return self._get_fallback_weather()
+        return weather_data
+    
+    async def _fetch_and_cache(self, cache_key: str, lat: float, lon: float) -> Optional[Dict]:
+        """Single-flight leader: fetch, then cache before followers are released.
         
-        # Return fallback data
-        logger.info("Using fallback weather data")
-        return self._get_fallback_weather()
-    
-    def _get_openweather_current(self, lat: float, lon: float) -> Dict:
-        """Get weather from OpenWeatherMap"""
-        url = "https://api.openweathermap.org/data/2.5/weather"
-        params = {
-            'lat': lat,
-            'lon': lon,
-            'appid': self.openweather_api_key,
-            'units': 'metric'
-        }
+        The configured provider order decides where current conditions come from. When
+        the first available provider is a forecast provider (no current-conditions API
+        key set), they are read from the cell's hourly forecast, so a cell costs one
+        upstream call per forecast TTL, with the provider chain as the fallback.
+        Otherwise the provider chain answers and the forecast is the fallback.
+        """
+        if self._current_from_forecast():
+            weather_data = await self._forecast_now(cache_key)
+            if weather_data is None:
+                weather_data = await self._fetch_current(lat, lon)
+        else:
+            weather_data = await self._fetch_current(lat, lon)
+            if weather_data is None:
+                weather_data = await self._forecast_now(cache_key)
+        if weather_data is not None:
+            self.cache.put(cache_key, weather_data)
+        return weather_data
+    
+    def _current_from_forecast(self) -> bool:
+        """True when the preferred available provider is the forecast provider"""
+        for provider in self.providers:
+            if provider.available():
+                return provider.supports_forecast
+        return False
+    
+    async def _forecast_now(self, cache_key: str) -> Optional[Dict]:
+        """Current conditions read from the cell's hourly forecast, when it covers now"""
+        forecast = await self.get_forecast_async(cell_of_key(cache_key))
+        now = time.time()
+        if forecast is not None and forecast.covers(now):
+            return forecast.at(now)
+        return None
+    
+    async def get_forecast_async(self, cell: str, allow_stale: bool = True) -> Optional[HourlyForecast]:
+        """Hourly forecast for a geo-cell (one upstream fetch per cell per forecast TTL).
         
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        The local cache tier holds the HourlyForecast itself, so hits cost no parsing;
+        records are only serialized for the shared weather_cache table.
+        """
+        cache_key = f"{cell}:forecast"
+        lat, lon = cell_center(cell)
+        fetch = lambda: self._fetch_forecast_and_cache(cache_key, lat, lon)
         
-        return {
-            'temperature': round(data['main']['temp']),
-            'feels_like': round(data['main']['feels_like']),
-            'condition': data['weather'][0]['description'],
-            'humidity': data['main']['humidity'],
-            'windSpeed': round(data['wind'].get('speed', 0) * 3.6),
-            'precipitation': data.get('rain', {}).get('1h', 0),
-            'visibility': data.get('visibility', 10000) / 1000,
-            'icon': data['weather'][0]['icon'],
-            'location': {
-                'name': data.get('name', 'Unknown'),
-                'country': data['sys'].get('country', 'Unknown')
-            },
-            'api_source': 'openweathermap',
-            'timestamp': datetime.now().isoformat()
-        }
+        forecast, state = await self.forecast_cache.get(cache_key)
+        if state == STALE and allow_stale:
+            self._revalidate(cache_key, fetch)
+        elif state != FRESH:
+            try:
+                forecast = await self.single_flight.do(cache_key, fetch)
+            except Exception as e:
+                logger.warning(f"Forecast lookup failed: {e}")
+                forecast = None
+        return forecast
     
-    def _get_weatherapi_current(self, lat: float, lon: float) -> Dict:
-        """Get weather from WeatherAPI.com"""
-        url = "https://api.weatherapi.com/v1/current.json"
-        params = {
-            'key': self.weatherapi_key,
-            'q': f"{lat},{lon}",
-            'aqi': 'no'
-        }
+    async def _fetch_forecast_and_cache(self, cache_key: str, lat: float, lon: float) -> Optional[HourlyForecast]:
+        forecast = await self._fetch_forecast(lat, lon)
+        if forecast is None or not len(forecast):
+            return None
+        self.forecast_cache.put(cache_key, forecast)
+        return forecast
+    
+    async def get_weather_at_async(self, lat: float, lon: float, day: date, hour: int = 12) -> Dict:
+        """Forecast weather at a local hour of a day; current conditions when not covered"""
+        return (await self.get_weather_for_days_async(lat, lon, [day], hour))[0]
+    
+    async def get_weather_for_days_async(self, lat: float, lon: float, days: List[date],
+                                         hour: int = 12) -> List[Dict]:
+        """Weather at a local hour of each day from one cached forecast lookup.
         
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        Days outside the forecast get current conditions (fetched at most once),
+        marked with 'forecast': False.
+        """
+        forecast = await self.get_forecast_async(self.cell_for(lat, lon))
+        current = None
+        weathers = []
+        for day in days:
+            epoch = forecast.local_epoch(day, hour) if forecast is not None else None
+            if epoch is not None and forecast.covers(epoch):
+                weathers.append(dict(forecast.at(epoch), forecast=True))
+                continue
+            if current is None:
+                current = await self.get_current_weather_async(lat, lon)
+            weathers.append(dict(current, forecast=False))
+        return weathers
+    
+    def get_weather_at(self, lat: float, lon: float, day: date, hour: int = 12) -> Dict:
+        """Blocking variant of get_weather_at_async (scripts, no running event loop)"""
+        async def run():
+            try:
+                return await self.get_weather_at_async(lat, lon, day, hour)
+            finally:
+                await self._drain_refreshes()
+                await self.aclose()
+        return asyncio.run(run())
+    
+    async def prefetch_cell(self, cell: str, lead: float) -> int:
+        """Refresh a cell's forecast and current weather if they turn stale within `lead` seconds.
         
-        return {
-            'temperature': round(data['current']['temp_c']),
-            'feels_like': round(data['current']['feelslike_c']),
-            'condition': data['current']['condition']['text'],
-            'humidity': data['current']['humidity'],
-            'windSpeed': round(data['current']['wind_kph']),
-            'precipitation': data['current']['precip_mm'],
-            'visibility': data['current']['vis_km'],
-            'icon': data['current']['condition']['icon'],
-            'location': {
-                'name': data['location']['name'],
-                'country': data['location']['country']
-            },
-            'api_source': 'weatherapi',
-            'timestamp': datetime.now().isoformat()
-        }
+        Returns the number of cache entries refreshed (0 when everything is fresh enough).
+        """
+        lat, lon = cell_center(cell)
+        refreshed = 0
+        forecast_key = f"{cell}:forecast"
+        if await self._due(self.forecast_cache, forecast_key, lead):
+            await self.single_flight.do(forecast_key,
+                                        lambda: self._fetch_forecast_and_cache(forecast_key, lat, lon))
+            refreshed += 1
+        current_key = f"{cell}:current"
+        if await self._due(self.cache, current_key, lead):
+            await self.single_flight.do(current_key, lambda: self._fetch_and_cache(current_key, lat, lon))
+            refreshed += 1
+        return refreshed
     
-    def _get_open_meteo_current(self, lat: float, lon: float) -> Dict:
-        """Get weather from Open-Meteo (free, no API key)"""
-        url = "https://api.open-meteo.com/v1/forecast"
-        params = {
-            'latitude': lat,
-            'longitude': lon,
-            'current_weather': 'true',
-            'hourly': 'temperature_2m,relativehumidity_2m,precipitation,windspeed_10m'
-        }
+    @staticmethod
+    async def _due(cache: WeatherCache, cache_key: str, lead: float) -> bool:
+        """Whether an entry needs an upstream refresh within `lead` seconds.
         
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        A locally due entry is first checked in the shared tier: when another worker
+        has already refreshed it, that row is adopted and no upstream call is made.
+        """
+        fresh_for = cache.fresh_for(cache_key)
+        if fresh_for is not None and fresh_for >= lead:
+            return False
+        return not await cache.adopt_shared(cache_key, lead)
+    
+    def _revalidate(self, cache_key: str, fetch):
+        """Refresh a stale entry in the background (coalesced with any in-flight fetch)"""
+        async def refresh():
+            try:
+                await self.single_flight.do(cache_key, fetch)
+            except Exception as e:
+                logger.warning(f"Background weather refresh failed for {cache_key}: {e}")
         
-        current = data['current_weather']
+        self.revalidations += 1
+        task = asyncio.get_running_loop().create_task(refresh())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+    
+    async def _drain_refreshes(self):
+        """Let this loop's background refreshes finish before a blocking call's loop closes"""
+        loop = asyncio.get_running_loop()
+        pending = [task for task in list(self._refresh_tasks) if task.get_loop() is loop]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    
+    def get_current_weather(self, lat: float, lon: float) -> Dict:
+        """Blocking variant for scripts and worker threads (no running event loop)"""
+        async def run():
+            try:
+                # No background refresh here: the loop ends with this call
+                return await self.get_current_weather_async(lat, lon, allow_stale=False)
+            finally:
+                await self._drain_refreshes()
+                await self.aclose()
+        return asyncio.run(run())
+    
+    def _hedge_delay(self, provider: WeatherProvider) -> float:
+        """How long to wait on a provider before also asking the next one (its recent p95)"""
+        p95 = self.breakers[provider.name].latency_percentile(95)
+        return WEATHER_HEDGE_DEFAULT_DELAY if p95 is None else max(p95, WEATHER_HEDGE_MIN_DELAY)
+    
+    async def _attempt(self, provider: WeatherProvider, client, lat: float, lon: float,
+                       deadline: float, forecast: bool = False):
+        """One provider call (current conditions or forecast), recorded on its circuit breaker"""
+        loop = asyncio.get_running_loop()
+        breaker = self.breakers[provider.name]
+        timeout = min(provider.timeout, deadline - loop.time())
+        if timeout <= 0:
+            # Our own budget ran out (a late hedge or failover): no verdict on the provider
+            breaker.release()
+            return None
+        fetch = provider.fetch_forecast if forecast else provider.fetch_current
+        started = loop.time()
+        try:
+            weather_data = await asyncio.wait_for(fetch(client, lat, lon, timeout), timeout)
+        except asyncio.CancelledError:
+            # Lost a hedge race: says nothing about the provider's health, so no outcome is recorded
+            breaker.release()
+            raise
+        except asyncio.TimeoutError:
+            breaker.record(False, loop.time() - started)
+            logger.warning(f"{provider.name} timed out after {timeout:.1f}s")
+            return None
+        except Exception as e:
+            breaker.record(False, loop.time() - started)
+            logger.warning(f"{provider.name} failed: {e}")
+            return None
+        breaker.record(True, loop.time() - started)
+        return weather_data
+    
+    async def _fetch_current(self, lat: float, lon: float) -> Optional[Dict]:
+        """Hedged fallback across providers within one deadline budget.
         
-        # Get additional data from hourly forecast (current hour)
-        hourly = data.get('hourly', {})
-        current_hour_index = 0  # Simplified - would need proper time matching
+        Providers whose breaker is open are skipped. The next provider starts as soon
+        as any running attempt fails, or when the current one runs past its p95
+        latency (hedge); the first successful answer wins and the rest are cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        client = self._client()
+        candidates = iter([provider for provider in self.providers if provider.available()])
+        running = {}
         
-        return {
-            'temperature': round(current['temperature']),
-            'feels_like': round(current['temperature']),  # Open-Meteo doesn't provide feels_like
-            'condition': self._weather_code_to_description(current['weathercode']),
-            'humidity': hourly.get('relativehumidity_2m', [50])[current_hour_index],
-            'windSpeed': round(current['windspeed']),
-            'precipitation': hourly.get('precipitation', [0])[current_hour_index],
-            'visibility': 10,  # Default value
-            'icon': self._weather_code_to_icon(current['weathercode']),
-            'location': {
-                'name': f"Lat: {lat}, Lon: {lon}",
-                'country': 'Unknown'
-            },
-            'api_source': 'open-meteo',
-            'timestamp': datetime.now().isoformat()
-        }
+        def launch() -> Optional[WeatherProvider]:
+            for provider in candidates:
+                if self.breakers[provider.name].allow():
+                    task = loop.create_task(self._attempt(provider, client, lat, lon, deadline))
+                    running[task] = provider
+                    return provider
+            return None
+        
+        current = launch()
+        try:
+            while running:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    logger.warning("Weather deadline exhausted")
+                    break
+                wait = min(self._hedge_delay(current), remaining) if current else remaining
+                done, _ = await asyncio.wait(list(running), timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Hedge: the current provider is slower than usual, ask the next one too
+                    next_provider = launch()
+                    if next_provider:
+                        self.hedged += 1
+                    current = next_provider
+                    continue
+                for task in done:
+                    running.pop(task)
+                    if task.result() is not None:
+                        return task.result()
+                # Something failed: bring in the next provider even if a hedge is still running
+                current = launch()
+            return None
+        finally:
+            for task in running:
+                task.cancel()
     
-    def _weather_code_to_description(self, code: int) -> str:
-        """Convert Open-Meteo weather code to description"""
-        code_map = {
-            0: "Clear sky",
-            1: "Mainly clear", 2: "Partly cloudy", 3: "Overcast",
-            45: "Fog", 48: "Depositing rime fog",
-            51: "Light drizzle", 53: "Moderate drizzle", 55: "Dense drizzle",
-            61: "Slight rain", 63: "Moderate rain", 65: "Heavy rain",
-            71: "Slight snow", 73: "Moderate snow", 75: "Heavy snow",
-            95: "Thunderstorm", 96: "Thunderstorm with hail", 99: "Thunderstorm with heavy hail"
-        }
-        return code_map.get(code, "Unknown")
-    
-    def _weather_code_to_icon(self, code: int) -> str:
-        """Convert Open-Meteo weather code to icon"""
-        if code == 0:
-            return "01d"  # Clear sky
-        elif code in [1, 2]:
-            return "02d"  # Partly cloudy
-        elif code == 3:
-            return "04d"  # Overcast
-        elif code in [45, 48]:
-            return "50d"  # Fog
-        elif code in [51, 53, 55, 61, 63, 65]:
-            return "09d"  # Rain
-        elif code in [71, 73, 75]:
-            return "13d"  # Snow
-        elif code in [95, 96, 99]:
-            return "11d"  # Thunderstorm
-        else:
-            return "02d"  # Default
+    async def _fetch_forecast(self, lat: float, lon: float) -> Optional[HourlyForecast]:
+        """Forecast-capable providers in order, within the deadline budget"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        client = self._client()
+        for provider in self.providers:
+            if not (provider.available() and provider.supports_forecast):
+                continue
+            if deadline - loop.time() <= 0:
+                break
+            if not self.breakers[provider.name].allow():
+                continue
+            forecast = await self._attempt(provider, client, lat, lon, deadline, forecast=True)
+            if forecast is not None and len(forecast):
+                return forecast
+        return None
     
-    def _cache_result(self, cache_key: str, data: Dict):
-        """Cache the weather result"""
-        self.cache[cache_key] = {
-            'data': data,
-            'timestamp': datetime.now()
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'cell_degrees': self.cell_degrees,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'revalidations': self.revalidations,
+            'cache': self.cache.stats(),
+            'forecast_cache': self.forecast_cache.stats(),
+            'hedged_requests': self.hedged,
+            'providers': {
+                provider.name: self.breakers[provider.name].stats()
+                for provider in self.providers if provider.available()
+            },
+            'single_flight': self.single_flight.stats()
         }
     
-    def _is_cache_valid(self, cache_key: str) -> bool:
-        """Check if cache entry is still valid"""
-        if cache_key not in self.cache:
-            return False
-        
-        cache_time = self.cache[cache_key]['timestamp']
-        return (datetime.now() - cache_time).seconds < self.cache_duration
-    
     def _get_fallback_weather(self) -> Dict:
         """Return fallback weather data"""
         return {
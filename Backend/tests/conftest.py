@@ -0,0 +1,86 @@
+# tests/conftest.py
+import sys
+import types
+
+import pytest
+
+
+class InMemoryDB:
+    """Stand-in for database.connection.db: records queries and answers with canned rows"""
+
+    def __init__(self):
+        self.queries = []
+        self.rows = []
+
+    def execute_query(self, query, params=None):
+        self.queries.append((query, params))
+        return self.rows
+
+
+# database.connection connects to PostgreSQL on import; unit tests never need a server
+if 'database.connection' not in sys.modules:
+    connection = types.ModuleType('database.connection')
+    connection.db = InMemoryDB()
+    connection.DatabaseConnection = InMemoryDB
+    database = types.ModuleType('database')
+    database.__path__ = []
+    database.connection = connection
+    database.db = connection.db
+    sys.modules['database'] = database
+    sys.modules['database.connection'] = connection
+
+
+@pytest.fixture
+def fake_db():
+    """The shared in-memory db, emptied for each test"""
+    db = sys.modules['database.connection'].db
+    db.queries = []
+    db.rows = []
+    return db
+
+
+class InMemoryWeatherTier:
+    """Shared weather tier with the WeatherCacheTable interface, kept in a dict"""
+
+    def __init__(self):
+        self.rows = {}  # key -> {'data', 'age'}
+        self.saves = 0
+        self.preloaded_kinds = []
+
+    def load(self, key):
+        row = self.rows.get(key)
+        return dict(row) if row is not None else None
+
+    def save(self, key, data, age, expires_in):
+        self.saves += 1
+        self.rows[key] = {'data': data, 'age': age}
+
+    def cleanup(self):
+        return True
+
+    def preload(self, limit, kind):
+        """Freshest rows of one kind first, like the table's ORDER BY cached_at DESC"""
+        self.preloaded_kinds.append(kind)
+        rows = sorted((dict(row, key=key) for key, row in self.rows.items() if key.endswith(f":{kind}")),
+                      key=lambda row: row['age'])
+        return rows[:limit]
+
+
+@pytest.fixture
+def shared_weather_tier():
+    return InMemoryWeatherTier()
+
+
+@pytest.fixture
+def make_weather_service():
+    """Build a WeatherService over stub providers; caches default to in-process only"""
+    from services.weather_cache import WeatherCache
+    from services.weather_service import WeatherService
+
+    def make(providers, cache=None, forecast_cache=None):
+        return WeatherService(
+            providers=providers,
+            cache=cache if cache is not None else WeatherCache(),
+            forecast_cache=forecast_cache if forecast_cache is not None else WeatherCache(kind='forecast')
+        )
+    return make
@@ -0,0 +1,70 @@
+# tests/test_circuit_breaker.py
+import pytest
+
+from utils.circuit_breaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker('test', min_calls=4, error_rate=0.5, slow_call_seconds=1.0, open_seconds=30)
+
+
+def trip(breaker):
+    for _ in range(breaker.min_calls):
+        breaker.record(False, 0.1)
+
+
+def test_opens_on_error_rate(breaker):
+    for ok in (True, False, True, False):
+        breaker.record(ok, 0.1)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_stays_closed_below_min_calls(breaker):
+    for _ in range(3):
+        breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+
+
+def test_opens_on_slow_calls():
+    breaker = CircuitBreaker('slow', min_calls=4, slow_call_seconds=1.0, slow_rate=0.75)
+    for _ in range(4):
+        breaker.record(True, 1.5)
+    assert breaker.state == OPEN
+
+
+def test_half_open_allows_one_probe_and_closes_on_success(breaker):
+    breaker.open_seconds = 0
+    trip(breaker)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens(breaker):
+    breaker.open_seconds = 0
+    trip(breaker)
+    assert breaker.allow()
+    breaker.record(False, 0.1)
+    assert breaker.stats()['opened'] == 2
+
+
+def test_release_frees_the_probe_slot_without_an_outcome(breaker):
+    breaker.open_seconds = 0
+    trip(breaker)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+def test_latency_percentile_ignores_failures(breaker):
+    assert breaker.latency_percentile(95) is None
+    for latency in (0.1, 0.2, 0.3):
+        breaker.record(True, latency)
+    breaker.record(False, 9.0)
+    assert breaker.latency_percentile(95) == 0.3
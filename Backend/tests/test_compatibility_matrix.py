@@ -0,0 +1,130 @@
+# tests/test_compatibility_matrix.py
+import numpy as np
+import pytest
+
+from services.compatibility_matrix import CompatibilityMatrix, CompatibilityService
+from services.outfit_rules import create_color_harmony_rules
+from services.outfit_search import PairFeatures, PairwiseScorer
+
+
+def symmetric_scores(n, seed=5):
+    scores = np.random.default_rng(seed).uniform(-2, 1.25, (n, n))
+    scores = (scores + scores.T) / 2
+    np.fill_diagonal(scores, 0.0)
+    return scores.astype(np.float16).astype(np.float64)
+
+
+def pair_features(n):
+    return PairFeatures(np.arange(n) % 5, np.full(n, 5.0), np.full(n, 15))
+
+
+def wardrobe_items(n):
+    colors = ['black', 'white', 'navy', 'red', 'beige']
+    return [{'id': 100 + i, 'color': colors[i % 5], 'season': 'all', 'formality_score': 3 + i % 5}
+            for i in range(n)]
+
+
+def flush(service):
+    """Wait for every queued background job"""
+    service._builder.submit(lambda: None).result(timeout=10)
+
+
+@pytest.fixture
+def service(fake_db):
+    return CompatibilityService(PairwiseScorer(create_color_harmony_rules()))
+
+
+def test_packed_triangle_round_trips_the_dense_matrix():
+    scores = symmetric_scores(7)
+    matrix = CompatibilityMatrix.build(list(range(7)), pair_features(7), scores)
+
+    assert matrix.packed.size == 7 * 6 // 2
+    np.testing.assert_array_equal(matrix.dense(np.arange(7)), scores)
+    positions = np.array([5, 0, 3])
+    np.testing.assert_array_equal(matrix.dense(positions), scores[np.ix_(positions, positions)])
+
+
+def test_with_item_appends_one_column():
+    scores = symmetric_scores(5)
+    matrix = CompatibilityMatrix.build(list(range(4)), pair_features(4), scores[:4, :4])
+    grown = matrix.with_item(4, pair_features(1), scores[4, :4])
+
+    assert len(grown) == 5 and len(matrix) == 4
+    np.testing.assert_array_equal(grown.dense(np.arange(5)), scores)
+
+
+def test_without_items_keeps_the_remaining_pairs():
+    scores = symmetric_scores(6)
+    matrix = CompatibilityMatrix.build([10, 11, 12, 13, 14, 15], pair_features(6), scores)
+    smaller = matrix.without_items([11, 14, 99])
+
+    kept = [0, 2, 3, 5]
+    assert smaller.item_ids == [10, 12, 13, 15]
+    np.testing.assert_array_equal(smaller.dense(np.arange(4)), scores[np.ix_(kept, kept)])
+    np.testing.assert_array_equal(smaller.features.colors, matrix.features.colors[kept])
+
+
+def test_record_round_trip():
+    scores = symmetric_scores(4)
+    matrix = CompatibilityMatrix.build([3, 1, 4, 2], pair_features(4), scores, rules_version=42)
+    restored = CompatibilityMatrix.from_record(matrix.to_record())
+
+    assert restored.item_ids == [3, 1, 4, 2]
+    assert restored.rules_version == 42
+    np.testing.assert_array_equal(restored.dense(np.arange(4)), scores)
+
+
+def test_get_matrix_builds_in_the_background(service):
+    items = wardrobe_items(6)
+    assert service.get_matrix(1, items) is None
+    flush(service)
+
+    matrix = service.get_matrix(1, items)
+    features = service.scorer.item_features(items)
+    expected = service.scorer.pair_scores(features, features).astype(np.float16).astype(np.float64)
+    np.fill_diagonal(expected, 0.0)
+    np.testing.assert_array_equal(matrix.dense(np.arange(6)), expected)
+
+
+def test_remove_item_drops_its_row_and_column(service):
+    items = wardrobe_items(5)
+    service.get_matrix(1, items)
+    flush(service)
+    before = service.get_matrix(1, items)
+
+    service.remove_item(1, 102)
+    flush(service)
+
+    after = service.matrices.get(1)
+    kept = [0, 1, 3, 4]
+    assert after.item_ids == [100, 101, 103, 104]
+    np.testing.assert_array_equal(after.dense(np.arange(4)), before.dense(np.array(kept)))
+    assert service.get_matrix(1, [items[pos] for pos in kept]) is after
+
+
+def test_remove_unknown_item_keeps_the_matrix(service):
+    items = wardrobe_items(3)
+    service.get_matrix(1, items)
+    flush(service)
+    matrix = service.matrices.get(1)
+
+    service.remove_item(1, 999)
+    service.remove_item(2, 100)
+    flush(service)
+
+    assert service.matrices.get(1) is matrix
+    assert service.matrices.get(2) is None
+
+
+def test_embedding_provider_adds_affinity(service):
+    items = wardrobe_items(3)
+    embeddings = np.array([[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]])
+    service.set_embedding_provider(lambda batch: embeddings[[item['id'] - 100 for item in batch]])
+    service.get_matrix(1, items)
+    flush(service)
+
+    features = service.scorer.item_features(items)
+    base = service.scorer.pair_scores(features, features)
+    with_affinity = service.get_matrix(1, items).dense(np.arange(3))
+    assert with_affinity[0, 2] == pytest.approx(base[0, 2] + 0.5 * 0.6, abs=1e-2)
+    assert with_affinity[0, 1] == pytest.approx(base[0, 1], abs=1e-2)
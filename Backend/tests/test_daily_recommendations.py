@@ -0,0 +1,61 @@
+# tests/test_daily_recommendations.py
+from datetime import date
+
+import pytest
+
+from services.daily_recommendations import DailyRecommendationService
+
+
+def row(occasion, cell):
+    return {'recommendation_date': date.today(), 'occasion': occasion, 'geo_cell': cell,
+            'weather': {'temperature': 18}, 'recommendation': {'items': [1, 2], 'cell': cell}}
+
+
+def flush(service):
+    service._writer.submit(lambda: None).result(timeout=10)
+
+
+@pytest.fixture
+def service(fake_db):
+    return DailyRecommendationService()
+
+
+def test_serves_the_row_for_the_requested_cell(service, fake_db):
+    fake_db.rows = [row('casual', '10:20'), row('work', None)]
+    assert service.get(1, 'casual', '10:20')['recommendation']['cell'] == '10:20'
+    assert service.get(1, 'casual', '11:20') is None
+
+
+def test_without_location_only_default_weather_rows_are_served(service, fake_db):
+    fake_db.rows = [row('casual', '10:20'), row('work', None)]
+    assert service.get(1, 'casual') is None
+    assert service.get(1, 'work')['recommendation']['cell'] is None
+    assert service.get(1, 'work', '10:20') is None
+
+
+def test_user_rows_are_read_once_per_ttl(service, fake_db):
+    fake_db.rows = [row('casual', None)]
+    service.get(1, 'casual')
+    service.get(1, 'work')
+    assert len(fake_db.queries) == 1
+
+
+def test_invalidate_stops_serving_and_deletes_in_the_background(service, fake_db):
+    fake_db.rows = [row('casual', None)]
+    assert service.get(1, 'casual') is not None
+
+    service.invalidate(1)
+    assert service.get(1, 'casual') is None
+    flush(service)
+
+    assert any('DELETE FROM daily_recommendations' in query for query, _ in fake_db.queries)
+
+
+def test_invalidate_skips_users_with_nothing_precomputed(service, fake_db):
+    service.get(2, 'casual')
+    fake_db.queries.clear()
+
+    service.invalidate(2)
+    flush(service)
+
+    assert fake_db.queries == []
@@ -0,0 +1,24 @@
+# tests/test_geo.py
+import pytest
+
+from utils.geo import cell_center, geo_cell
+
+
+def test_nearby_coordinates_share_a_cell():
+    assert geo_cell(6.9271, 79.8612) == geo_cell(6.9012, 79.8049)
+    assert geo_cell(6.9271, 79.8612) != geo_cell(7.0012, 79.8612)
+
+
+@pytest.mark.parametrize('latitude, longitude', [(6.9271, 79.8612), (-33.8688, 151.2093), (0.0, 0.0),
+                                                 (-0.05, -0.05), (89.99, -179.99)])
+def test_cell_center_lies_in_its_cell(latitude, longitude):
+    cell = geo_cell(latitude, longitude)
+    center = cell_center(cell)
+    assert geo_cell(*center) == cell
+    assert abs(center[0] - latitude) <= 0.05 + 1e-9
+    assert abs(center[1] - longitude) <= 0.05 + 1e-9
+
+
+def test_cell_size_is_part_of_the_key():
+    assert geo_cell(6.9, 79.8, degrees=0.5) != geo_cell(6.9, 79.8, degrees=0.1)
+    assert cell_center(geo_cell(6.9, 79.8, degrees=0.5)) == (6.75, 79.75)
@@ -0,0 +1,73 @@
+# tests/test_keyword_matcher.py
+import random
+
+import pytest
+
+from services.item_features import (
+    COMFORT_SCORES, FORMALITY_KEYWORD_TABLES, get_comfort_score, get_formality_score
+)
+from services.keyword_matcher import KeywordMatcher
+
+WORDS = ['blue', 'formal', 'dress', 'dress shoes', 'shoe', 't-shirt', 'shirt', 'tank top', 'heels',
+         'hoodie', 'jeans', 'blazer', 'suit', 'sweat', 'sweatpants', 'party', 'sequin', 'x', '']
+
+
+def scan_formality(category, name):
+    """The per-keyword scan the matcher replaced (first listed keyword wins)"""
+    combined_text = f"{name.lower()} {category.lower()}"
+    for keywords in FORMALITY_KEYWORD_TABLES:
+        for keyword, score in keywords.items():
+            if keyword in combined_text:
+                return score
+    return 5
+
+
+def scan_comfort(category):
+    category_lower = category.lower()
+    for key, score in COMFORT_SCORES.items():
+        if key in category_lower:
+            return score
+    return 7
+
+
+def random_texts(count, seed=3):
+    rnd = random.Random(seed)
+    keywords = [keyword for table in FORMALITY_KEYWORD_TABLES for keyword in table] + list(COMFORT_SCORES) + WORDS
+    texts = []
+    for _ in range(count):
+        parts = rnd.sample(keywords, rnd.randint(0, 4))
+        text = rnd.choice(['', ' ', '-', '']).join(parts)
+        texts.append(text.upper() if rnd.random() < 0.2 else text)
+    return texts
+
+
+def test_formality_score_matches_keyword_scan():
+    texts = random_texts(2000)
+    for category, name in zip(texts, reversed(texts)):
+        assert get_formality_score(category, name) == scan_formality(category, name), (category, name)
+
+
+def test_comfort_score_matches_keyword_scan():
+    for category in random_texts(2000, seed=11):
+        assert get_comfort_score(category) == scan_comfort(category), category
+
+
+@pytest.mark.parametrize('text', ['dress shoes', 'sweatpants and shoes', 'shirtshirt', 'nothing here', ''])
+def test_find_all_returns_every_occurrence(text):
+    keywords = ['dress', 'dress shoes', 'shoe', 'shoes', 'sweat', 'sweatpants', 'shirt', 'tshirt']
+    matcher = KeywordMatcher((keyword, index) for index, keyword in enumerate(keywords))
+
+    expected = sorted((start, keyword) for keyword in keywords
+                      for start in range(len(text)) if text.startswith(keyword, start))
+    found = sorted((match.start, match.keyword) for match in matcher.find_all(text))
+
+    assert found == expected
+    assert matcher.matches_any(text) == bool(expected)
+
+
+def test_best_match_prefers_earliest_listed_keyword():
+    matcher = KeywordMatcher([('shoes', 'first'), ('dress', 'second'), ('dress shoes', 'third')])
+    assert matcher.best_match('Dress Shoes').payload == 'first'
+    assert matcher.best_match('a dress').payload == 'second'
+    assert matcher.best_match('jeans') is None
+    assert KeywordMatcher([]).best_match('anything') is None
@@ -0,0 +1,81 @@
+# tests/test_outfit_scoring_engine.py
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from services.outfit_rules import create_outfit_rules, extract_weather_conditions
+from services.outfit_scoring_engine import OutfitScoringEngine
+
+OCCASIONS = ['casual', 'work', 'formal', 'workout', 'datenight', 'party']
+WEATHERS = [
+    {'temperature': 12, 'condition': 'light rain'},
+    {'temperature': 27.5, 'condition': 'sunny'},
+    {'temperature': -3, 'condition': 'snow', 'windSpeed': 30},
+    {'condition': 'cloudy'}
+]
+
+
+def make_wardrobe(size, now, seed=7):
+    rnd = random.Random(seed)
+    names = ['Blue T-Shirt', 'Sequin Party Dress', 'Dress Shoes', 'Gold Heels', 'Leather Jacket', 'Yoga Pants']
+    conditions = ['sunny', 'cloudy', 'cold', 'cool', 'windy', 'rainy', 'hot', 'warm', 'mild', 'casual']
+    items = []
+    for i in range(size):
+        low = rnd.randint(-5, 25)
+        last_worn = None
+        if rnd.random() < 0.4:
+            last_worn = (now - timedelta(hours=rnd.randint(0, 120))).isoformat()
+        items.append({
+            'id': i + 1,
+            'name': rnd.choice(names),
+            'category': rnd.choice(['tops', 'bottoms', 'shoes', 'outerwear', 'dress']),
+            'color': rnd.choice(['blue', 'black', 'gold', 'silver', 'red']),
+            'last_worn': last_worn,
+            'temp_range': [low, low + rnd.randint(5, 20)],
+            'formality_score': rnd.randint(1, 10),
+            'weather_compatibility': rnd.sample(conditions, 2)
+        })
+    return items
+
+
+@pytest.fixture
+def engine():
+    return OutfitScoringEngine(create_outfit_rules(), extract_weather_conditions)
+
+
+@pytest.mark.parametrize('weather', WEATHERS)
+def test_score_occasions_matches_scalar_score_item(engine, weather):
+    now = datetime(2026, 3, 14, 9, 30)
+    items = make_wardrobe(300, now)
+    scalar = np.array([[engine.score_item(item, weather, occasion, now=now) for item in items]
+                       for occasion in OCCASIONS])
+
+    wardrobe = engine.featurize(items)
+    vectorized = engine.score_occasions(wardrobe, engine.weather_partials(wardrobe, weather), OCCASIONS, now=now)
+
+    np.testing.assert_array_equal(vectorized, scalar)
+
+
+def test_score_weathers_matches_one_weather_at_a_time(engine):
+    now = datetime(2026, 3, 14, 9, 30)
+    wardrobe = engine.featurize(make_wardrobe(200, now))
+    batched = engine.score_weathers(wardrobe, engine.weather_partials_batch(wardrobe, WEATHERS), 'work', now=now)
+
+    for row, weather in zip(batched, WEATHERS):
+        single = engine.score_occasions(wardrobe, engine.weather_partials(wardrobe, weather), ['work'], now=now)[0]
+        np.testing.assert_array_equal(row, single)
+
+
+def test_empty_wardrobe_scores_nothing(engine):
+    assert engine.score_items([], WEATHERS[0], 'casual').shape == (0,)
+
+
+def test_weather_key_separates_temperatures_within_a_bucket(engine):
+    assert engine.weather_key({'temperature': 14.6, 'condition': 'sunny'}) != \
+        engine.weather_key({'temperature': 15.4, 'condition': 'sunny'})
+    assert engine.weather_key({'temperature': 20, 'condition': 'sunny'}) != \
+        engine.weather_key({'temperature': 20, 'condition': 'rain'})
+    assert engine.weather_key({'temperature': 20, 'condition': 'sunny', 'humidity': 40}) == \
+        engine.weather_key({'temperature': 20, 'condition': 'sunny', 'humidity': 90})
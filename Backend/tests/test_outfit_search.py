@@ -0,0 +1,68 @@
+# tests/test_outfit_search.py
+import numpy as np
+import pytest
+
+from services.outfit_rules import create_color_harmony_rules, create_outfit_rules, extract_weather_conditions
+from services.outfit_scoring_engine import OutfitScoringEngine
+from services.outfit_search import OutfitSearchEngine, PairwiseScorer
+
+WARM = {'temperature': 24, 'condition': 'sunny'}
+
+
+def item(item_id, name, category, color='black'):
+    return {'id': item_id, 'name': name, 'category': category, 'color': color, 'season': 'all',
+            'temp_range': [10, 35], 'formality_score': 7, 'weather_compatibility': ['sunny']}
+
+
+@pytest.fixture
+def engine():
+    return OutfitScoringEngine(create_outfit_rules(), extract_weather_conditions)
+
+
+@pytest.fixture
+def search():
+    return OutfitSearchEngine(PairwiseScorer(create_color_harmony_rules()))
+
+
+def categories(wardrobe, outfit):
+    return sorted(wardrobe.categories[index] for index in outfit.indices)
+
+
+def best_outfit(engine, search, items, occasion, scores=None, exclude=None):
+    wardrobe = engine.featurize(items)
+    if scores is None:
+        scores = np.full(len(items), 80.0)
+    outfits = search.search(wardrobe, np.asarray(scores, dtype=np.float64), occasion, WARM, top_k=1, exclude=exclude)
+    return wardrobe, outfits[0]
+
+
+def test_party_prefers_heels_over_better_scored_shoes(engine, search):
+    items = [item(1, 'Silk blouse', 'tops'), item(2, 'Black skirt', 'bottoms'),
+             item(3, 'White sneakers', 'sneakers'), item(4, 'Gold heels', 'heels')]
+    wardrobe, outfit = best_outfit(engine, search, items, 'party', scores=[80, 80, 95, 60])
+    assert 3 in outfit.indices
+
+
+def test_party_uses_other_shoes_without_heels(engine, search):
+    items = [item(1, 'Silk blouse', 'tops'), item(2, 'Black skirt', 'bottoms'), item(3, 'Loafers', 'loafers')]
+    wardrobe, outfit = best_outfit(engine, search, items, 'party')
+    assert categories(wardrobe, outfit) == ['bottoms', 'loafers', 'tops']
+
+
+def test_excluded_heels_fall_back_to_other_shoes(engine, search):
+    items = [item(1, 'Silk blouse', 'tops'), item(2, 'Black skirt', 'bottoms'),
+             item(3, 'White sneakers', 'sneakers'), item(4, 'Gold heels', 'heels')]
+    exclude = np.array([False, False, False, True])
+    wardrobe, outfit = best_outfit(engine, search, items, 'party', exclude=exclude)
+    assert 2 in outfit.indices
+
+
+def test_only_party_replaces_separates_with_a_dress(engine, search):
+    items = [item(1, 'Silk blouse', 'tops'), item(2, 'Black skirt', 'bottoms'),
+             item(3, 'Sequin dress', 'dress'), item(4, 'Gold heels', 'heels')]
+    wardrobe, party = best_outfit(engine, search, items, 'party')
+    assert categories(wardrobe, party) == ['dress', 'heels']
+
+    for occasion in ('datenight', 'formal'):
+        wardrobe, outfit = best_outfit(engine, search, items, occasion)
+        assert categories(wardrobe, outfit) == ['bottoms', 'heels', 'tops']
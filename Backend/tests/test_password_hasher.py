@@ -0,0 +1,41 @@
+# tests/test_password_hasher.py
+import pytest
+
+pytest.importorskip('passlib')
+pytest.importorskip('bcrypt')
+
+from passlib.hash import bcrypt  # noqa: E402
+
+from utils.password_hasher import PasswordHasher, _hash_password, _verify_password  # noqa: E402
+
+
+def rounds_of(hashed):
+    return bcrypt.from_string(hashed).rounds
+
+
+def test_lower_cost_hash_is_upgraded():
+    hashed = _hash_password('secret', 4)
+    valid, new_hash = _verify_password('secret', hashed, 5)
+    assert valid
+    assert rounds_of(new_hash) == 5
+    assert bcrypt.verify('secret', new_hash)
+
+
+def test_higher_cost_hash_is_never_downgraded():
+    hashed = _hash_password('secret', 6)
+    assert _verify_password('secret', hashed, 5) == (True, None)
+
+
+def test_same_cost_hash_is_kept():
+    hashed = _hash_password('secret', 5)
+    assert _verify_password('secret', hashed, 5) == (True, None)
+
+
+def test_wrong_password_is_not_rehashed():
+    hashed = _hash_password('secret', 4)
+    assert _verify_password('wrong', hashed, 5) == (False, None)
+
+
+def test_configured_cost_is_floored_at_the_minimum():
+    assert PasswordHasher(rounds=4).rounds == 12
+    assert PasswordHasher(rounds=13).rounds == 13
@@ -0,0 +1,109 @@
+# tests/test_single_flight.py
+import asyncio
+import threading
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {'temperature': 18}
+
+    async def run():
+        return await asyncio.gather(*[flight.do('cell', fetch) for _ in range(5)])
+
+    results = asyncio.run(run())
+
+    assert results == [{'temperature': 18}] * 5
+    assert len(calls) == 1
+    assert flight.stats()['coalesced'] == 4
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_leader_error_reaches_every_follower():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        raise ValueError("upstream down")
+
+    async def run():
+        return await asyncio.gather(*[flight.do('cell', fetch) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, ValueError) and str(result) == "upstream down" for result in results)
+
+
+def test_failed_key_is_retried_by_the_next_caller():
+    flight = SingleFlight()
+    attempts = []
+
+    async def fetch():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError("first attempt fails")
+        return 'ok'
+
+    async def run():
+        with pytest.raises(ValueError):
+            await flight.do('cell', fetch)
+        return await flight.do('cell', fetch)
+
+    assert asyncio.run(run()) == 'ok'
+    assert len(attempts) == 2
+
+
+def test_cancelled_leader_fails_followers_without_cancelling_them():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(10)
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do('cell', fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do('cell', fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        with pytest.raises(RuntimeError, match='cancelled'):
+            await follower
+
+    asyncio.run(run())
+
+
+def test_followers_on_another_event_loop_get_the_result():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    async def fetch():
+        started.set()
+        await asyncio.get_running_loop().run_in_executor(None, release.wait)
+        return 'shared'
+
+    leader = threading.Thread(target=lambda: results.append(asyncio.run(flight.do('cell', fetch))))
+    leader.start()
+    started.wait(5)
+
+    async def follow():
+        task = asyncio.ensure_future(flight.do('cell', fetch))
+        await asyncio.sleep(0.01)
+        release.set()
+        return await task
+
+    results.append(asyncio.run(follow()))
+    leader.join(5)
+
+    assert results == ['shared', 'shared']
+    assert flight.stats()['coalesced'] == 1
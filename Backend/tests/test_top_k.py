@@ -0,0 +1,52 @@
+# tests/test_top_k.py
+import numpy as np
+import pytest
+
+from services.outfit_scoring_engine import top_k_indices
+
+
+def stable_top_k(scores, k, indices=None):
+    """Reference: full stable sort, best first"""
+    indices = np.arange(len(scores)) if indices is None else np.asarray(indices)
+    order = np.argsort(-scores[indices], kind='stable')
+    return indices[order][:max(k, 0)]
+
+
+@pytest.mark.parametrize('k', [0, 1, 3, 7, 10, 25])
+def test_matches_a_stable_full_sort(k):
+    rng = np.random.default_rng(1)
+    scores = rng.integers(0, 5, 10).astype(np.float64)  # many ties
+    np.testing.assert_array_equal(top_k_indices(scores, k), stable_top_k(scores, k))
+
+
+def test_ties_at_the_cut_keep_index_order():
+    scores = np.array([5.0, 7.0, 5.0, 5.0, 9.0, 5.0])
+    np.testing.assert_array_equal(top_k_indices(scores, 4), [4, 1, 0, 2])
+
+
+def test_ties_follow_the_order_of_the_given_indices():
+    scores = np.array([1.0, 3.0, 3.0, 3.0, 0.0])
+    np.testing.assert_array_equal(top_k_indices(scores, 2, np.array([3, 1, 2, 4])), [3, 1])
+
+
+def test_k_at_or_above_n_returns_everything_sorted():
+    scores = np.array([2.0, 8.0, 2.0, 5.0])
+    expected = [1, 3, 0, 2]
+    np.testing.assert_array_equal(top_k_indices(scores, 4), expected)
+    np.testing.assert_array_equal(top_k_indices(scores, 100), expected)
+
+
+def test_empty_and_non_positive_k():
+    assert len(top_k_indices(np.zeros(0), 3)) == 0
+    assert len(top_k_indices(np.ones(4), 0)) == 0
+    assert len(top_k_indices(np.ones(4), -2)) == 0
+    assert len(top_k_indices(np.ones(4), 2, np.zeros(0, dtype=np.int64))) == 0
+
+
+def test_random_subsets_match_a_stable_full_sort():
+    rng = np.random.default_rng(7)
+    for _ in range(200):
+        scores = rng.integers(0, 8, 40).astype(np.float64)
+        indices = rng.permutation(40)[:rng.integers(0, 40)]
+        k = int(rng.integers(0, 45))
+        np.testing.assert_array_equal(top_k_indices(scores, k, indices), stable_top_k(scores, k, indices))
@@ -0,0 +1,56 @@
+# tests/test_variation_engine.py
+import pytest
+
+from services.variation_engine import VariationEngine, outfit_signature
+
+SIGNATURES = [outfit_signature([index, index + 10]) for index in range(6)]
+SCORES = [90.0, 80.0, 70.0, 60.0, 50.0, 40.0]
+
+
+def serve(engine, user_id=1, occasion='casual', seed=None):
+    index = engine.choose(user_id, occasion, SIGNATURES, SCORES, seed)
+    engine.mark_served(user_id, occasion, SIGNATURES[index])
+    return index
+
+
+def test_signature_ignores_item_order_and_id_type():
+    assert outfit_signature([3, '1', 2]) == outfit_signature(['2', 3, 1])
+
+
+def test_no_outfit_repeats_within_the_window():
+    engine = VariationEngine(window=4, tie_tolerance=0)
+    assert [serve(engine) for _ in range(4)] == [0, 1, 2, 3]
+
+
+def test_oldest_outfit_leaves_the_window():
+    engine = VariationEngine(window=2, tie_tolerance=0)
+    assert [serve(engine) for _ in range(4)] == [0, 1, 2, 0]
+
+
+def test_exhausted_space_cycles_to_the_least_recently_served():
+    engine = VariationEngine(window=10, tie_tolerance=0)
+    for _ in range(len(SIGNATURES)):
+        serve(engine)
+    assert serve(engine) == 0
+    assert serve(engine) == 1
+
+
+def test_windows_are_per_user_and_occasion():
+    engine = VariationEngine(window=4, tie_tolerance=0)
+    serve(engine, user_id=1, occasion='casual')
+    assert serve(engine, user_id=2, occasion='casual') == 0
+    assert serve(engine, user_id=1, occasion='work') == 0
+
+
+def test_same_seed_picks_the_same_near_tie():
+    picks = set()
+    for _ in range(5):
+        engine = VariationEngine(window=4, tie_tolerance=25)
+        picks.add(engine.choose(1, 'casual', SIGNATURES, SCORES, seed='nonce-1'))
+    assert len(picks) == 1
+    assert picks.pop() in (0, 1, 2)
+
+
+def test_choose_needs_outfits():
+    with pytest.raises(ValueError):
+        VariationEngine().choose(1, 'casual', [], [])
@@ -0,0 +1,49 @@
+# tests/test_wardrobe_cache.py
+from services.wardrobe_cache import WardrobeCache
+
+
+class UnreachableBackend:
+    def get_version(self, user_id):
+        raise ConnectionError("version store down")
+
+    def bump_version(self, user_id):
+        raise ConnectionError("version store down")
+
+
+def test_invalidate_moves_readers_to_a_new_version():
+    cache = WardrobeCache()
+    version = cache.get_version(1)
+    cache.put(1, version, [{'id': 1}])
+    cache.put(2, cache.get_version(2), [{'id': 2}])
+    assert cache.get(1, version) == [{'id': 1}]
+
+    new_version = cache.invalidate(1)
+
+    assert new_version != version
+    assert cache.get(1, version) is None
+    assert cache.get(1, cache.get_version(1)) is None
+    assert cache.get(2, cache.get_version(2)) == [{'id': 2}]
+
+
+def test_invalidate_notifies_listeners_even_when_one_fails():
+    cache = WardrobeCache()
+    seen = []
+
+    def broken(user_id):
+        raise RuntimeError("listener bug")
+
+    cache.add_invalidation_listener(broken)
+    cache.add_invalidation_listener(seen.append)
+    cache.invalidate('7')
+
+    assert seen == [7]
+
+
+def test_unreachable_version_backend_bypasses_the_cache():
+    cache = WardrobeCache(backend=UnreachableBackend())
+    version = cache.get_version(1)
+    cache.put(1, version, [{'id': 1}])
+
+    assert version is None
+    assert cache.get(1, version) is None
+    assert cache.invalidate(1) is None
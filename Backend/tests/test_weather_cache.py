@@ -0,0 +1,112 @@
+# tests/test_weather_cache.py
+import asyncio
+import time
+
+import pytest
+
+from services.weather_cache import FRESH, STALE, WeatherCache
+from services.weather_providers import StaticWeatherProvider
+
+
+ROWS = [
+    ('10:20:current', {'temperature': 18}, 60),
+    ('10:20:forecast', {'times': [0]}, 60),
+    ('11:20:current', {'temperature': 12}, 2 * 3600),
+    ('11:20:forecast', {'times': [3600]}, 7200)
+]
+
+
+@pytest.fixture
+def shared(shared_weather_tier):
+    for key, data, age in ROWS:
+        shared_weather_tier.save(key, data, age, 6 * 3600)
+    return shared_weather_tier
+
+
+def test_preload_only_loads_rows_of_its_own_kind(shared):
+    current = WeatherCache(ttl=1800, shared=shared)
+    forecast = WeatherCache(ttl=3 * 3600, shared=shared, kind='forecast')
+
+    assert current.preload() == 2
+    assert forecast.preload() == 2
+
+    assert current.lookup('10:20:current') == ({'temperature': 18}, FRESH)
+    assert current.lookup('10:20:forecast') == (None, None)
+    assert forecast.lookup('11:20:forecast') == ({'times': [3600]}, FRESH)
+    assert forecast.lookup('11:20:current') == (None, None)
+
+
+def test_preload_keeps_the_age_of_each_row(shared):
+    current = WeatherCache(ttl=1800, shared=shared)
+    current.preload()
+    assert current.lookup('11:20:current')[1] == STALE
+
+
+def test_preload_respects_the_limit(shared):
+    current = WeatherCache(shared=shared)
+    assert current.preload(limit=1) == 1
+    assert len(current) == 1
+
+
+def test_preload_without_shared_tier_is_a_no_op():
+    assert WeatherCache().preload() == 0
+
+
+def test_service_preload_warms_both_caches_separately(make_weather_service, shared):
+    service = make_weather_service(
+        [StaticWeatherProvider({'temperature': 20})],
+        cache=WeatherCache(shared=shared),
+        forecast_cache=WeatherCache(ttl=3 * 3600, shared=shared, kind='forecast')
+    )
+    service.preload()
+
+    assert sorted(shared.preloaded_kinds) == ['current', 'forecast']
+    assert len(service.cache) == 2
+    assert len(service.forecast_cache) == 2
+    assert service.forecast_cache.lookup('10:20:current') == (None, None)
+
+
+def test_entries_go_stale_then_expire():
+    cache = WeatherCache(ttl=60, max_stale=120)
+    now = time.time()
+    cache.put('a:current', {'temperature': 1}, fetched_at=now - 30)
+    cache.put('b:current', {'temperature': 2}, fetched_at=now - 90)
+    cache.put('c:current', {'temperature': 3}, fetched_at=now - 200)
+
+    assert cache.lookup('a:current') == ({'temperature': 1}, FRESH)
+    assert cache.lookup('b:current') == ({'temperature': 2}, STALE)
+    assert cache.lookup('c:current') == (None, None)
+    assert cache.fresh_for('a:current') == pytest.approx(30, abs=1)
+    assert cache.stats()['stale_served'] == 1
+
+
+def test_least_recently_used_cells_are_evicted():
+    cache = WeatherCache(max_entries=2)
+    cache.put('a:current', {'temperature': 1})
+    cache.put('b:current', {'temperature': 2})
+    cache.lookup('a:current')
+    cache.put('c:current', {'temperature': 3})
+
+    assert cache.lookup('b:current') == (None, None)
+    assert cache.lookup('a:current')[1] == FRESH
+
+
+def test_stale_weather_is_served_while_it_refreshes(make_weather_service):
+    provider = StaticWeatherProvider({'temperature': 25}, delay=0.05, name='keyed')
+    service = make_weather_service([provider], cache=WeatherCache(ttl=60, max_stale=600))
+    key = f"{service.cell_for(1.0, 2.0)}:current"
+    service.cache.put(key, {'temperature': 10}, fetched_at=time.time() - 120)
+
+    async def run():
+        try:
+            served = await service.get_current_weather_async(1.0, 2.0)
+            await service._drain_refreshes()
+            return served
+        finally:
+            await service.aclose()
+
+    served = asyncio.run(run())
+
+    assert served['temperature'] == 10
+    assert provider.calls == 1
+    assert service.cache.lookup(key)[0]['temperature'] == 25
@@ -0,0 +1,90 @@
+# tests/test_weather_prefetcher.py
+import asyncio
+import time
+
+import numpy as np
+
+from services.weather_cache import WeatherCache
+from services.weather_forecast import FORECAST_COLUMNS, HourlyForecast
+from services.weather_prefetcher import WeatherPrefetcher
+from services.weather_providers import StaticWeatherProvider
+from utils.count_min_sketch import HeavyHitters
+
+
+def forecast():
+    start = int(time.time()) // 3600 * 3600
+    return HourlyForecast([start + 3600 * hour for hour in range(24)],
+                          {name: np.full(24, 15.0) for name in FORECAST_COLUMNS})
+
+
+def worker(make_weather_service, shared, provider):
+    """One worker process: its own local caches over the shared tier"""
+    return make_weather_service(
+        [provider],
+        cache=WeatherCache(ttl=1800, shared=shared),
+        forecast_cache=WeatherCache(ttl=3 * 3600, shared=shared, kind='forecast',
+                                    encode=HourlyForecast.to_record, decode=HourlyForecast.from_record)
+    )
+
+
+def flush_writes(service):
+    for cache in (service.cache, service.forecast_cache):
+        cache._writer.submit(lambda: None).result(timeout=5)
+
+
+def run_tick(prefetcher):
+    async def run():
+        try:
+            return await prefetcher.tick()
+        finally:
+            await prefetcher.service.aclose()
+    return asyncio.run(run())
+
+
+def test_workers_do_not_repeat_each_others_refreshes(make_weather_service, shared_weather_tier):
+    provider = StaticWeatherProvider({'temperature': 15}, forecast=forecast())
+    first = WeatherPrefetcher(worker(make_weather_service, shared_weather_tier, provider), min_hits=1, rate=100)
+    second = WeatherPrefetcher(worker(make_weather_service, shared_weather_tier, provider), min_hits=1, rate=100)
+    for prefetcher in (first, second):
+        prefetcher.record(1.0, 2.0)
+
+    assert run_tick(first) == 2
+    flush_writes(first.service)
+    calls = provider.calls
+
+    assert run_tick(second) == 0
+    assert provider.calls == calls
+    cell = second.service.cell_for(1.0, 2.0)
+    assert second.service.cache.fresh_for(f"{cell}:current") > 0
+    assert isinstance(second.service.forecast_cache.lookup(f"{cell}:forecast")[0], HourlyForecast)
+
+
+def test_shared_rows_about_to_go_stale_are_refreshed(make_weather_service, shared_weather_tier):
+    provider = StaticWeatherProvider({'temperature': 15}, forecast=forecast())
+    service = worker(make_weather_service, shared_weather_tier, provider)
+    cell = service.cell_for(1.0, 2.0)
+    shared_weather_tier.save(f"{cell}:current", {'temperature': 3}, 1790, 3600)
+    shared_weather_tier.save(f"{cell}:forecast", forecast().to_record(), 3 * 3600 - 5, 3600)
+
+    async def run():
+        try:
+            return await service.prefetch_cell(cell, lead=60)
+        finally:
+            await service.aclose()
+
+    assert asyncio.run(run()) == 2
+    assert provider.calls >= 1
+
+
+def test_heavy_hitters_keep_the_most_frequent_keys():
+    hitters = HeavyHitters(capacity=3, width=512)
+    for key, count in (('a', 50), ('b', 30), ('c', 20), ('d', 10)):
+        for _ in range(count):
+            hitters.add(key)
+    for key in range(200):
+        hitters.add(f"rare-{key}")
+
+    top = hitters.top(min_count=5)
+    assert [key for key, _ in top] == ['a', 'b', 'c']
+    assert len(hitters) == 3
+    assert hitters.total == 310
@@ -0,0 +1,60 @@
+# tests/test_weather_providers.py
+import asyncio
+import time
+
+import numpy as np
+
+from services.weather_providers import OpenMeteoProvider
+
+
+def payload(start):
+    return {
+        'utc_offset_seconds': 3600,
+        'current_weather': {'temperature': 11.6, 'windspeed': 9.0, 'weathercode': 3},
+        'hourly': {
+            'time': [start + 3600 * hour for hour in range(5)],
+            'temperature_2m': [10.0, None, 12.0, 13.0, None],
+            'apparent_temperature': [9.0, 9.5, None, 12.0, None],
+            'relativehumidity_2m': [80, 81, None, 70, None],
+            'precipitation': [0.1, None, 0.0, None, None],
+            'windspeed_10m': [5.0, 6.0, 7.0, None, None],
+            'weathercode': [3, 3, None, 61, None]
+        }
+    }
+
+
+def test_null_hourly_values_are_dropped_or_defaulted():
+    start = 1_700_000_000 // 3600 * 3600
+    forecast = OpenMeteoProvider()._forecast(payload(start), 1.0, 2.0)
+
+    assert forecast.times.tolist() == [start, start + 7200, start + 10800]
+    np.testing.assert_array_equal(forecast.columns['temperature'], [10.0, 12.0, 13.0])
+    np.testing.assert_array_equal(forecast.columns['feels_like'], [9.0, 12.0, 12.0])
+    np.testing.assert_array_equal(forecast.columns['humidity'], [80, 50, 70])
+    np.testing.assert_array_equal(forecast.columns['precipitation'], [np.float32(0.1), 0.0, 0.0])
+    np.testing.assert_array_equal(forecast.columns['windspeed'], [5.0, 7.0, 0.0])
+
+    hour = forecast.at(start + 7200 + 60)
+    assert hour['temperature'] == 12
+    assert hour['condition'] == 'Unknown'
+    # The dropped hour reads as the hour before it
+    assert forecast.at(start + 3600 + 60)['temperature'] == 10
+
+
+def test_current_conditions_survive_an_all_null_forecast():
+    class Client:
+        pass
+
+    provider = OpenMeteoProvider()
+    data = payload(int(time.time()) // 3600 * 3600)
+    data['hourly']['temperature_2m'] = [None] * 5
+
+    async def fake_fetch(client, lat, lon, timeout):
+        return data
+
+    provider._fetch = fake_fetch
+    weather = asyncio.run(provider.fetch_current(Client(), 1.0, 2.0, 1.0))
+
+    assert weather['temperature'] == 12
+    assert weather['humidity'] == 50
+    assert weather['condition'] == 'Overcast'
@@ -0,0 +1,148 @@
+# tests/test_weather_service.py
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from services.weather_cache import WeatherCache
+from services.weather_forecast import FORECAST_COLUMNS, HourlyForecast
+from services.weather_providers import StaticWeatherProvider
+
+
+def make_forecast(temperature=7.0, hours=48):
+    start = int(time.time()) // 3600 * 3600 - 2 * 3600
+    columns = {name: np.full(hours, temperature) for name in FORECAST_COLUMNS}
+    return HourlyForecast([start + 3600 * hour for hour in range(hours)], columns, source='forecast')
+
+
+def run_with(service, coroutine_fn):
+    async def run():
+        try:
+            return await coroutine_fn()
+        finally:
+            await service.aclose()
+    return asyncio.run(run())
+
+
+def fetch_current(service, lat=1.0, lon=2.0):
+    return run_with(service, lambda: service._fetch_current(lat, lon))
+
+
+def test_hedge_answers_from_the_faster_provider(monkeypatch, make_weather_service):
+    monkeypatch.setattr('services.weather_service.WEATHER_HEDGE_DEFAULT_DELAY', 0.05)
+    slow = StaticWeatherProvider({'temperature': 10}, delay=1.0, name='slow')
+    fast = StaticWeatherProvider({'temperature': 20}, delay=0.01, name='fast')
+    service = make_weather_service([slow, fast])
+
+    weather = fetch_current(service)
+
+    assert weather['api_source'] == 'fast'
+    assert service.hedged == 1
+    # The cancelled loser says nothing about the slow provider's health
+    assert service.breakers['slow'].stats()['recent_failures'] == 0
+    assert service.breakers['slow'].stats()['recent_calls'] == 0
+
+
+def test_failure_fails_over_without_waiting_for_the_hedge_delay(monkeypatch, make_weather_service):
+    monkeypatch.setattr('services.weather_service.WEATHER_HEDGE_DEFAULT_DELAY', 5.0)
+    broken = StaticWeatherProvider({'temperature': 10}, fail=True, name='broken')
+    backup = StaticWeatherProvider({'temperature': 20}, name='backup')
+    service = make_weather_service([broken, backup])
+
+    started = time.monotonic()
+    weather = fetch_current(service)
+
+    assert weather['api_source'] == 'backup'
+    assert time.monotonic() - started < 1.0
+    assert service.breakers['broken'].stats()['recent_failures'] == 1
+
+
+def test_open_breaker_skips_the_provider(make_weather_service):
+    primary = StaticWeatherProvider({'temperature': 10}, name='primary')
+    backup = StaticWeatherProvider({'temperature': 20}, name='backup')
+    service = make_weather_service([primary, backup])
+    service.breakers['primary']._open()
+
+    assert fetch_current(service)['api_source'] == 'backup'
+    assert primary.calls == 0
+
+
+def test_all_providers_failing_returns_none(make_weather_service):
+    service = make_weather_service([StaticWeatherProvider({}, fail=True, name='a'),
+                            StaticWeatherProvider({}, fail=True, name='b')])
+    assert fetch_current(service) is None
+
+
+def test_exhausted_deadline_is_not_a_provider_failure(make_weather_service):
+    provider = StaticWeatherProvider({'temperature': 20}, name='healthy')
+    service = make_weather_service([provider])
+    breaker = service.breakers['healthy']
+    breaker.open_seconds = 0
+    breaker._open()
+    assert breaker.allow()  # claims the half-open probe
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        return await service._attempt(provider, None, 1.0, 2.0, deadline=loop.time() - 0.1)
+
+    assert asyncio.run(run()) is None
+    assert provider.calls == 0
+    assert breaker.stats()['recent_failures'] == 0
+    # The probe slot is free again for a call with budget left
+    assert breaker.allow()
+
+
+@pytest.mark.parametrize('keyed, expected', [(True, 'keyed'), (False, 'forecast')])
+def test_current_conditions_follow_the_configured_provider(make_weather_service, keyed, expected):
+    providers = [StaticWeatherProvider({'temperature': 3}, name='meteo', forecast=make_forecast())]
+    if keyed:
+        providers.insert(0, StaticWeatherProvider({'temperature': 21}, name='keyed'))
+    service = make_weather_service(providers)
+
+    weather = run_with(service, lambda: service.get_current_weather_async(1.0, 2.0))
+
+    assert weather['api_source'] == expected
+
+
+def test_forecast_hits_return_the_cached_object(make_weather_service):
+    provider = StaticWeatherProvider({'temperature': 3}, name='meteo', forecast=make_forecast())
+    service = make_weather_service([provider])
+    cell = service.cell_for(1.0, 2.0)
+
+    async def twice():
+        return await service.get_forecast_async(cell), await service.get_forecast_async(cell)
+
+    first, second = run_with(service, twice)
+
+    assert isinstance(first, HourlyForecast)
+    assert second is first
+    assert provider.calls == 1
+
+
+def test_forecasts_are_serialized_only_for_the_shared_tier(make_weather_service, shared_weather_tier):
+    shared = shared_weather_tier
+
+    def forecast_cache():
+        return WeatherCache(ttl=3600, shared=shared, kind='forecast',
+                            encode=HourlyForecast.to_record, decode=HourlyForecast.from_record)
+
+    provider = StaticWeatherProvider({'temperature': 3}, name='meteo', forecast=make_forecast(9.0))
+    writer = make_weather_service([provider], forecast_cache=forecast_cache())
+    cell = writer.cell_for(1.0, 2.0)
+    run_with(writer, lambda: writer.get_forecast_async(cell))
+    writer.forecast_cache._writer.submit(lambda: None).result(timeout=5)
+
+    record = shared.rows[f"{cell}:forecast"]['data']
+    assert isinstance(record, dict) and isinstance(record['temperature'], list)
+
+    # Another worker reads the row back as an HourlyForecast, from load() and from preload()
+    reader = make_weather_service([provider], forecast_cache=forecast_cache())
+    forecast = run_with(reader, lambda: reader.get_forecast_async(cell))
+    assert isinstance(forecast, HourlyForecast)
+    assert forecast.at(time.time())['temperature'] == 9
+
+    preloaded = forecast_cache()
+    assert preloaded.preload() == 1
+    assert isinstance(preloaded.lookup(f"{cell}:forecast")[0], HourlyForecast)
+    assert provider.calls == 1
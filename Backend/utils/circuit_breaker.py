@@ -0,0 +1,109 @@
+# utils/circuit_breaker.py
+import time
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Error-rate and latency based circuit breaker for one upstream.
+
+    Over a sliding window of recent calls the breaker opens when too many fail or
+    too many are slower than `slow_call_seconds`. After `open_seconds` it lets a
+    single probe through (half-open); the probe's outcome closes or re-opens it.
+    The same window gives the latency percentiles used to time hedged requests.
+    """
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 5, error_rate: float = 0.5,
+                 slow_call_seconds: float = 2.0, slow_rate: float = 0.8, open_seconds: float = 30.0):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self._calls = deque(maxlen=window)  # (ok, latency)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may be made now (claims the probe slot when half-open)"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, ok: bool, latency: float):
+        with self._lock:
+            self._calls.append((ok, latency))
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+                if ok and latency < self.slow_call_seconds:
+                    self._state = CLOSED
+                    self._calls.clear()
+                else:
+                    self._open()
+                return
+            if self._state == CLOSED and len(self._calls) >= self.min_calls:
+                failures = sum(1 for call_ok, _ in self._calls if not call_ok)
+                slow = sum(1 for _, call_latency in self._calls if call_latency >= self.slow_call_seconds)
+                if (failures / len(self._calls) >= self.error_rate or
+                        slow / len(self._calls) >= self.slow_rate):
+                    self._open()
+
+    def release(self):
+        """An allowed call was abandoned without an outcome (e.g. a cancelled hedge loser)"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self.opened += 1
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Latency percentile of recent successful calls, None without data"""
+        with self._lock:
+            latencies = sorted(latency for ok, latency in self._calls if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(percentile / 100 * len(latencies)))]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            state = self._current_state()
+            calls = list(self._calls)
+        p95 = self.latency_percentile(95)
+        return {
+            'state': state,
+            'recent_calls': len(calls),
+            'recent_failures': sum(1 for ok, _ in calls if not ok),
+            'p95_latency': round(p95, 3) if p95 is not None else None,
+            'opened': self.opened,
+            'rejected': self.rejected
+        }
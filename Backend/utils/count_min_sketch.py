@@ -0,0 +1,99 @@
+# utils/count_min_sketch.py
+import heapq
+import hashlib
+import threading
+import numpy as np
+from typing import Dict, Hashable, List, Tuple
+
+
+class CountMinSketch:
+    """Fixed-memory frequency estimates (never under-counts, rarely over-counts).
+
+    `depth` rows of `width` counters; a key increments one counter per row and its
+    estimate is the minimum of those counters. decay() halves every counter so the
+    sketch tracks recent rather than all-time frequency.
+    """
+
+    def __init__(self, width: int = 4096, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.counts = np.zeros((depth, width), dtype=np.uint32)
+        self._rows = np.arange(depth)
+
+    def _columns(self, key: Hashable) -> np.ndarray:
+        digest = hashlib.blake2b(str(key).encode(), digest_size=8 * self.depth).digest()
+        return np.frombuffer(digest, dtype=np.uint64) % np.uint64(self.width)
+
+    def add(self, key: Hashable, count: int = 1) -> int:
+        """Count key and return its new estimate"""
+        columns = self._columns(key)
+        self.counts[self._rows, columns] += np.uint32(count)
+        return int(self.counts[self._rows, columns].min())
+
+    def estimate(self, key: Hashable) -> int:
+        return int(self.counts[self._rows, self._columns(key)].min())
+
+    def decay(self):
+        self.counts >>= 1
+
+
+class HeavyHitters:
+    """The (at most) `capacity` most frequent recent keys, counted in a CountMinSketch.
+
+    The sketch bounds memory for the long tail; only keys whose estimate beats the
+    coldest tracked key enter the candidate set. The coldest key comes from a
+    min-heap with lazy deletion: outdated (count, key) entries are skipped when they
+    surface and the heap is rebuilt once they outnumber the live ones.
+    """
+
+    def __init__(self, capacity: int = 1000, width: int = 4096, depth: int = 4):
+        self.capacity = capacity
+        self.sketch = CountMinSketch(width, depth)
+        self.candidates: Dict[Hashable, int] = {}
+        self.total = 0
+        self._heap: List[Tuple[int, Hashable]] = []
+        self._lock = threading.Lock()
+
+    def add(self, key: Hashable):
+        with self._lock:
+            self.total += 1
+            estimate = self.sketch.add(key)
+            if key not in self.candidates and len(self.candidates) >= self.capacity:
+                self._drop_outdated()
+                coldest_count, coldest = self._heap[0]
+                if estimate <= coldest_count:
+                    return
+                heapq.heappop(self._heap)
+                del self.candidates[coldest]
+            self.candidates[key] = estimate
+            heapq.heappush(self._heap, (estimate, key))
+            if len(self._heap) > 2 * self.capacity + 64:
+                self._rebuild_heap()
+
+    def _drop_outdated(self):
+        heap = self._heap
+        while heap and self.candidates.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+
+    def _rebuild_heap(self):
+        self._heap = [(count, key) for key, count in self.candidates.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, min_count: int = 1) -> List[Tuple[Hashable, int]]:
+        """Tracked keys with at least min_count recent hits, hottest first"""
+        with self._lock:
+            hot = [(key, self.sketch.estimate(key)) for key in self.candidates]
+        return sorted((item for item in hot if item[1] >= min_count), key=lambda item: -item[1])
+
+    def decay(self):
+        """Halve all counts and forget keys that have gone cold"""
+        with self._lock:
+            self.sketch.decay()
+            self.candidates = {
+                key: estimate for key, estimate in
+                ((key, self.sketch.estimate(key)) for key in self.candidates) if estimate > 0
+            }
+            self._rebuild_heap()
+
+    def __len__(self) -> int:
+        return len(self.candidates)
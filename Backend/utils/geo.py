@@ -0,0 +1,20 @@
+import os
+from typing import Tuple
+
+# ~11 km cells: users (and weather lookups) in the same cell share a forecast
+GEO_CELL_DEGREES = float(os.getenv('GEO_CELL_DEGREES', 0.1))
+
+
+def geo_cell(latitude: float, longitude: float, degrees: float = GEO_CELL_DEGREES) -> str:
+    """Stable key of the grid cell containing a coordinate"""
+    row = int((float(latitude) + 90.0) // degrees)
+    col = int((float(longitude) + 180.0) // degrees)
+    return f"{degrees:g}:{row}:{col}"
+
+
+def cell_center(cell: str) -> Tuple[float, float]:
+    """Center coordinate of a cell produced by geo_cell"""
+    degrees, row, col = cell.split(':')
+    degrees = float(degrees)
+    return (round(int(row) * degrees - 90.0 + degrees / 2, 6),
+            round(int(col) * degrees - 180.0 + degrees / 2, 6))
@@ -0,0 +1,148 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+SIZE_SAMPLE = 16
+
+
+def estimate_size(obj: Any) -> int:
+    """Rough recursive memory estimate (bytes) for cached JSON-like values.
+
+    Long sequences are extrapolated from their first SIZE_SAMPLE elements so that
+    sizing a large wardrobe stays cheap.
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += estimate_size(key) + estimate_size(value)
+    elif isinstance(obj, (list, tuple, set)):
+        values = obj if not isinstance(obj, set) else list(obj)
+        if len(values) > SIZE_SAMPLE:
+            sampled = sum(estimate_size(value) for value in values[:SIZE_SAMPLE])
+            size += sampled * len(values) // SIZE_SAMPLE
+        else:
+            for value in values:
+                size += estimate_size(value)
+    elif hasattr(obj, 'nbytes'):
+        # NumPy arrays
+        size += int(obj.nbytes)
+    elif hasattr(obj, '__dict__'):
+        size += estimate_size(vars(obj))
+    return size
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by entry count and (optionally) by memory and age"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: Optional[int] = None,
+                 size_fn: Callable[[Any], int] = estimate_size, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_fn = size_fn
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return cached value and mark it as most recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[2] is not None and entry[2] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live cached value without touching recency or hit/miss stats"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (entry[2] is not None and entry[2] <= time.monotonic()):
+                return default
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Insert or replace a value, evicting least recently used entries"""
+        size = self.size_fn(value) if self.max_bytes else 0
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._remove(key)
+            if self.max_bytes and size > self.max_bytes:
+                # Larger than the whole budget - never cache it
+                return
+            self._entries[key] = (value, size, expires_at)
+            self._total_bytes += size
+            self._evict()
+
+    def delete(self, key: Hashable) -> bool:
+        """Remove a single key"""
+        with self._lock:
+            return self._remove(key)
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every key matching predicate, returns number removed"""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Cache metrics for health/debug endpoints"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'ttl': self.ttl,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+    def _remove(self, key: Hashable) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._total_bytes -= entry[1]
+        return True
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries or
+            (self.max_bytes and self._total_bytes > self.max_bytes)
+        ):
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
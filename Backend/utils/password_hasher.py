@@ -0,0 +1,152 @@
+# utils/password_hasher.py
+import os
+import math
+import time
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+from passlib.hash import bcrypt
+
+logger = logging.getLogger(__name__)
+
+# Never hash below the cost existing passwords were created with
+BCRYPT_MIN_ROUNDS = 12
+# Cost used by every worker process; one deployment-wide setting so workers agree
+BCRYPT_ROUNDS = max(BCRYPT_MIN_ROUNDS, int(os.getenv('BCRYPT_ROUNDS', BCRYPT_MIN_ROUNDS)))
+BCRYPT_MAX_ROUNDS = int(os.getenv('BCRYPT_MAX_ROUNDS', 14))
+# Per-hash CPU time the startup calibration recommends a cost for
+BCRYPT_TARGET_SECONDS = float(os.getenv('BCRYPT_TARGET_SECONDS', 0.25))
+
+
+class HasherBusy(RuntimeError):
+    """Raised instead of queueing when the hashing pool's backlog is full"""
+
+
+# Worker-process functions (module level so they pickle by reference)
+
+def _hash_password(password: str, rounds: int) -> str:
+    return bcrypt.using(rounds=rounds).hash(password)
+
+
+def _verify_password(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    """(valid, new hash when the stored one was made with a lower cost)"""
+    if not bcrypt.verify(password, hashed):
+        return False, None
+    # Upgrade only: a lower configured cost never weakens stored hashes
+    if bcrypt.from_string(hashed).rounds < rounds:
+        return True, _hash_password(password, rounds)
+    return True, None
+
+
+def _time_hash(rounds: int) -> float:
+    started = time.perf_counter()
+    _hash_password('calibration-password', rounds)
+    return time.perf_counter() - started
+
+
+class PasswordHasher:
+    """bcrypt off the event loop: a bounded process pool with a backlog limit.
+
+    At most `max_workers` hashes run at once and `max_queue` more may wait; past
+    that, calls fail fast with HasherBusy so a login storm can't build an unbounded
+    backlog. The cost is the deployment-wide BCRYPT_ROUNDS setting (at least 12),
+    so every worker process hashes alike; verify() returns a replacement hash when
+    a stored one was made with a lower cost. calibrate() measures this hardware at
+    startup and reports the cost that would take about `target_seconds` per hash,
+    without applying it.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 64, rounds: int = BCRYPT_ROUNDS,
+                 target_seconds: float = BCRYPT_TARGET_SECONDS, min_rounds: int = BCRYPT_MIN_ROUNDS,
+                 max_rounds: int = BCRYPT_MAX_ROUNDS):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.rounds = max(min_rounds, rounds)
+        self.recommended_rounds: Optional[int] = None
+        self.target_seconds = target_seconds
+        self.min_rounds = min_rounds
+        self.max_rounds = max_rounds
+        self.calibrated_seconds: Optional[float] = None
+        self.in_flight = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # forkserver workers start clean: no model weights, threads or sockets from the app process
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload([__name__])
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            return self._pool
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self.in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise HasherBusy("Password hashing backlog is full")
+            self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor(), fn, *args)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash_password, password, self.rounds)
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new hash to store or None); the rehash happens in the same worker call"""
+        valid, new_hash = await self._run(_verify_password, password, hashed, self.rounds)
+        if new_hash is not None:
+            self.rehashed += 1
+        return valid, new_hash
+
+    async def calibrate(self) -> Optional[int]:
+        """Measure the configured cost and recommend the one closest to (not above) the target.
+
+        The recommendation is reported only; change BCRYPT_ROUNDS to apply it everywhere.
+        """
+        try:
+            # Best of two, so pool warm-up doesn't inflate the measurement
+            seconds = min([await self._run(_time_hash, self.rounds) for _ in range(2)])
+            extra = int(math.floor(math.log2(self.target_seconds / seconds))) if seconds > 0 else 0
+            self.recommended_rounds = max(self.min_rounds, min(self.max_rounds, self.rounds + extra))
+            self.calibrated_seconds = seconds
+            logger.info(f"bcrypt at {self.rounds} rounds takes ~{seconds * 1000:.0f} ms per hash")
+            if self.recommended_rounds != self.rounds:
+                logger.warning(f"BCRYPT_ROUNDS={self.recommended_rounds} would be closer to the "
+                               f"{self.target_seconds * 1000:.0f} ms target on this hardware")
+        except Exception as e:
+            logger.warning(f"bcrypt calibration failed: {e}")
+        return self.recommended_rounds
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        return {
+            'rounds': self.rounds,
+            'recommended_rounds': self.recommended_rounds,
+            'measured_hash_ms': round(self.calibrated_seconds * 1000) if self.calibrated_seconds else None,
+            'workers': self.max_workers,
+            'in_flight': self.in_flight,
+            'max_queue': self.max_queue,
+            'rejected': self.rejected,
+            'rehashed': self.rehashed
+        }
+
+
+# Global instance
+password_hasher = PasswordHasher(
+    max_workers=int(os.getenv('BCRYPT_WORKERS', max(1, min(4, (os.cpu_count() or 2) // 2)))),
+    max_queue=int(os.getenv('BCRYPT_MAX_QUEUE', 64))
+)
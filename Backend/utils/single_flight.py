@@ -0,0 +1,64 @@
+# utils/single_flight.py
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one execution.
+
+    The first caller (leader) runs the call; callers arriving while it is in flight
+    await the leader's result instead of repeating the work. In-flight results are
+    concurrent.futures.Future objects, so followers can be tasks on any event loop
+    in any thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            # Shield so a cancelled follower doesn't cancel the shared future
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            # The leader's request went away; waiting followers see an error, not a cancellation
+            future.set_exception(RuntimeError(f"single-flight leader for {key!r} was cancelled"))
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            in_flight = len(self._in_flight)
+        total = self.leaders + self.coalesced
+        return {
+            'in_flight': in_flight,
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+            'coalesced_rate': round(self.coalesced / total, 3) if total else 0.0
+        }